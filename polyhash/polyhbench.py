@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    Benchmarks of the Poly# solver.
+    bench_suite runs the solver on every input file with fixed parameters (each run in a new process) and writes
+    the time of each phase, the path finder counters, the peak memory and the score to a JSON file.
+    Two of these files (two revisions) are compared with compare_bench.
+
+    Usage:
+    # >>> from polyhbench import bench_astar, bench_suite, compare_bench
+    # >>> bench_astar('../input')
+    # >>> bench_suite('../input', 'bench.json')
+    # >>> compare_bench('baseline.json', 'bench.json')
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Any, List, Optional, Tuple, Dict, Set
+from polyhutils.arm import Trail
+from polyhutils.grid import Grid
+from polyhutils.occupancy import Occupancy
+from polyhutils.pathfinding import PathFinder, _distance, _heuristic
+from polyhutils.polyhio import input_parsing
+
+__all__ = ['bench_astar', 'bench_suite', 'compare_bench']
+
+# Parameters of the runs of bench_suite (the ones of main_model), and changes for the files having very few arms
+BENCH_PARAMETERS: Dict[str, float] = {'robot_percent': 0.1, 'task_limit': 2, 'pathfinder': 0.1}
+BENCH_OVERRIDES: Dict[str, Dict[str, float]] = {'a_': {'robot_percent': 1}, 'b_': {'robot_percent': 1}}
+
+
+def _legacy_find_path(finder: PathFinder, start: Tuple[int, int], end: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """
+    Previous implementation of PathFinder._find_path (linear scan of the open set, scores keyed by hash(tuple)).
+    Kept as the reference of the A* micro-benchmark.
+    """
+    _hash_vector_table: Dict[int, Tuple[int, int]] = dict()
+    closed_set: Set[Tuple[int, int]] = set()
+    open_set: Set[Tuple[int, int]] = {start}
+    came_from: Dict[int, int] = dict()
+    g_score: Dict[int, float] = dict()
+    f_score: Dict[int, float] = dict()
+
+    g_score[hash(start)] = 0
+    f_score[hash(start)] = _heuristic(start, end)
+    _hash_vector_table[hash(start)] = start
+
+    walkable_cells = finder.size[0]*finder.size[1] - len(finder.obstacles)
+
+    while len(open_set) > 0:
+        current: Tuple[int, int] = min(open_set, key=lambda a: f_score[hash(a)])
+
+        if current == end:
+            cell: Tuple[int, int] = current
+            path: List[Tuple[int, int]] = [cell]
+            while hash(cell) in came_from.keys():
+                cell = _hash_vector_table[came_from[hash(cell)]]
+                path.append(cell)
+            return path[::-1]
+
+        if len(closed_set) >= finder.limit * walkable_cells:
+            return []
+
+        open_set.remove(current)
+        closed_set.add(current)
+
+        for neighbour in finder.get_neighbours(current):
+            if neighbour in closed_set:
+                continue
+
+            if neighbour not in open_set:
+                open_set.add(neighbour)
+
+            if hash(neighbour) not in g_score.keys():
+                g_score[hash(neighbour)] = float('inf')
+                _hash_vector_table[hash(neighbour)] = neighbour
+
+            tentative_g_score: float = g_score[hash(current)] + _distance(current, neighbour)
+            if tentative_g_score >= g_score[hash(neighbour)]:
+                continue
+
+            came_from[hash(neighbour)] = hash(current)
+            g_score[hash(neighbour)] = tentative_g_score
+            weight: int = 2
+            if neighbour in finder.arm:
+                weight: int = 1
+            f_score[hash(neighbour)] = g_score[hash(neighbour)] + weight * _heuristic(neighbour, end)
+
+    return []
+
+
+def _astar_queries(mount_points: List[Tuple[int, int]], missions: List[List[Tuple[int, int]]],
+                   nb_queries: int, seed: int) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """Draws (mounting point, first assembly point) pairs, the searches run by the robots when choosing a task"""
+    rng: random.Random = random.Random(seed)
+    return [(rng.choice(mount_points), rng.choice(missions)[0]) for _ in range(nb_queries)]
+
+
+def bench_astar(input_dir: str = '../input', nb_queries: int = 20, limit: float = 0.1, seed: int = 0) -> None:
+    """
+    Compares the current A* implementation with the previous one on every input file.
+    Prints the time spent by both versions and how many of the returned paths are identical.
+    """
+    print('{:<28}{:>10}{:>10}{:>10}{:>12}{:>12}'.format('input', 'legacy(s)', 'heap(s)', 'speedup',
+                                                        'same path', 'same length'))
+    for name in sorted(os.listdir(input_dir)):
+        grid, tasks = input_parsing(os.path.join(input_dir, name))
+        width, height, _, step_nb, mount_points = grid
+        finder: PathFinder = PathFinder(Occupancy(width, height, mount_points), (width, height, step_nb),
+                                        limit=limit)
+
+        legacy_time: float = 0
+        heap_time: float = 0
+        same_path: int = 0
+        same_length: int = 0
+        queries = _astar_queries(mount_points, tasks[1], nb_queries, seed)
+        for start, end in queries:
+            finder.arm = Trail([start])
+
+            t0: float = perf_counter()
+            legacy_path: List[Tuple[int, int]] = _legacy_find_path(finder, start, end)
+            t1: float = perf_counter()
+            heap_path: List[Tuple[int, int]] = finder._find_path(start, end)
+            t2: float = perf_counter()
+
+            legacy_time += t1 - t0
+            heap_time += t2 - t1
+            same_path += legacy_path == heap_path
+            same_length += len(legacy_path) == len(heap_path)
+
+        print('{:<28}{:>10.3f}{:>10.3f}{:>9.1f}x{:>8}/{:<3}{:>8}/{:<3}'.format(
+            name, legacy_time, heap_time, legacy_time / heap_time if heap_time else 0,
+            same_path, len(queries), same_length, len(queries)))
+
+
+def _peak_memory() -> Optional[int]:
+    """Peak resident memory of the process in KB (None if it cannot be measured on this system)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _bench_run(grid_file: str, parameters: Dict[str, float]) -> Dict[str, Any]:
+    """Runs the solver on an input file, and returns the time of each phase and the counters of the run"""
+    t0: float = perf_counter()
+    parsed_input: Tuple[List, List] = input_parsing(grid_file)
+    t1: float = perf_counter()
+    grid: Grid = Grid(grid_file, parsed_input=parsed_input, **parameters)
+    t2: float = perf_counter()
+    for _ in range(grid.step_nb):
+        grid.move_robots()
+    t3: float = perf_counter()
+    _, score = grid.output()
+    t4: float = perf_counter()
+
+    return {'time': {'parse': t1 - t0, 'init': t2 - t1, 'moves': t3 - t2, 'output': t4 - t3, 'total': t4 - t0},
+            'astar_calls': grid.finder.nb_searches, 'expanded': grid.finder.nb_expanded,
+            'cache_hits': grid.finder.memory.hits, 'cache_misses': grid.finder.memory.misses,
+            'peak_memory_kb': _peak_memory(), 'score': score}
+
+
+def _revision() -> Optional[str]:
+    """Current git revision of the sources (None outside of a git repository)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_suite(input_dir: str = '../input', output_file: str = 'bench.json',
+                parameters: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Runs the solver on every input file of input_dir and writes the results to output_file (JSON).
+    Each run is made in a new process, so that its peak memory is its own.
+    parameters : parameters of Grid (BENCH_PARAMETERS by default, with BENCH_OVERRIDES)
+    """
+    if parameters is None:
+        parameters = dict(BENCH_PARAMETERS)
+        overrides: Dict[str, Dict[str, float]] = BENCH_OVERRIDES
+    else:
+        overrides = dict()
+    bench: Dict[str, Any] = {'revision': _revision(), 'parameters': parameters, 'overrides': overrides,
+                             'results': dict()}
+    for name in sorted(os.listdir(input_dir)):
+        run_parameters: Dict[str, float] = dict(parameters)
+        for prefix, changes in overrides.items():
+            if name.startswith(prefix):
+                run_parameters.update(changes)
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result: Dict[str, Any] = executor.submit(_bench_run, os.path.join(input_dir, name),
+                                                     run_parameters).result()
+        bench['results'][name] = result
+        print('{:<28} score = {:<10} {:.2f} s, {} A* calls, {} KB'.format(
+            name, result['score'], result['time']['total'], result['astar_calls'], result['peak_memory_kb']))
+
+    with open(output_file, 'w') as f:
+        json.dump(bench, f, indent=2)
+    return bench
+
+
+def compare_bench(baseline_file: str, bench_file: str) -> None:
+    """Prints the time and score of every input file of two results of bench_suite (baseline first)"""
+    with open(baseline_file) as f:
+        baseline: Dict[str, Any] = json.load(f)
+    with open(bench_file) as f:
+        bench: Dict[str, Any] = json.load(f)
+    if (baseline['parameters'], baseline['overrides']) != (bench['parameters'], bench['overrides']):
+        print('Warning: different parameters ({} and {})'.format(baseline['parameters'], bench['parameters']))
+
+    print('{} -> {}'.format(baseline['revision'], bench['revision']))
+    print('{:<28}{:>10}{:>10}{:>9}{:>12}{:>12}{:>9}'.format('input', 'time(s)', 'time(s)', 'speedup',
+                                                           'score', 'score', 'delta'))
+    for name, result in bench['results'].items():
+        if name not in baseline['results']:
+            continue
+        reference: Dict[str, Any] = baseline['results'][name]
+        old_time, new_time = reference['time']['total'], result['time']['total']
+        print('{:<28}{:>10.2f}{:>10.2f}{:>8.2f}x{:>12}{:>12}{:>+9}'.format(
+            name, old_time, new_time, old_time / new_time if new_time else 0, reference['score'], result['score'],
+            result['score'] - reference['score']))
+
+
+if __name__ == "__main__":
+    bench_astar()
+    bench_suite()
@@ -1,36 +1,104 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import cProfile
+import logging
+import os
+from typing import Optional, Union
+from polyhutils.checkpoint import CHECKPOINT_DIR, Checkpointer, latest_checkpoint, load_checkpoint, steps_done
 from polyhutils.grid import Grid
+from polyhutils.polyhio import CACHE_DIR
+from polyhutils.polyhlog import close_logging, configure_logging, get_logger
 
 __all__ = ['main_model']
 
+_logger = get_logger('model')
 
-def main_model(grid_file: str, drawing: bool = False, gif: bool = False):
+
+def main_model(grid_file: str, drawing: bool = False, gif: bool = False, log_level: int = logging.INFO,
+               events_file: Optional[str] = None, input_cache: Optional[str] = CACHE_DIR, gzip_output: bool = False,
+               instrument: bool = False, profile_file: Optional[str] = None, gif_file: str = '../debug/debug.gif',
+               gif_every: int = 1, gif_scale: int = 1, background_drawing: bool = True,
+               trace_file: Optional[str] = None, checkpoint_every: int = 0, checkpoint_dir: str = CHECKPOINT_DIR,
+               resume: Union[bool, str] = False):
     """
     grid_file : input file containing google_hash data
     drawing : boolean value enabling Real-time graphical display (helps debugging, but leads to long execution times)
-    gif : boolean value allowing the compiling of a GIF image at the end of the execution (short execution times)
+    gif : boolean value allowing the compiling of a GIF image at the end of the execution (short execution times),
+    the frames are drawn without any window when drawing is disabled
+    log_level : level of the printed messages (logging.DEBUG prints every move of every robot, but slows execution)
+    events_file : name of a JSON-lines file keeping every message (None to disable it)
+    input_cache : directory of the binary cache of the input files (None to disable it)
+    gzip_output : boolean value compressing the output file with gzip
+    instrument : boolean value counting and timing the expensive calls of the solver (summary logged at the end)
+    profile_file : name of the file where the cProfile statistics of the simulation are dumped (None to disable it)
+    gif_file : file of the GIF, written while the simulation runs (raw video if it ends with .y4m)
+    gif_every, gif_scale : one frame out of gif_every is written to the GIF, reduced by gif_scale
+    background_drawing : boolean value drawing the frames (display and GIF) in a separate process, the simulation
+    only sends the changes of each step
+    trace_file : name of the binary file recording every step, to look at any step afterwards (None to disable it),
+    a resumed run is recorded from the step it resumes at
+    checkpoint_every : number of steps between two checkpoints of the simulation (0 to disable them)
+    checkpoint_dir : directory of the checkpoints
+    resume : True resumes the simulation from the latest checkpoint of this input file (if any), a checkpoint file
+    name resumes from this checkpoint (fork of the run at its step)
     """
+    configure_logging(log_level, events_file=events_file)
 
-    grid: Grid = Grid(grid_file, robot_percent=0.1, task_limit=2, pathfinder=0.1)
+    parameters: dict = {'robot_percent': 0.1, 'task_limit': 2, 'pathfinder': 0.1}
+    # Name of the run in the checkpoint files
+    prefix: str = '_'.join(map(str, [os.path.splitext(os.path.basename(grid_file))[0]] + list(parameters.values())))
+    checkpoint: Optional[str] = resume if isinstance(resume, str) else \
+        latest_checkpoint(checkpoint_dir, prefix) if resume else None
+    if checkpoint is not None:
+        grid: Grid = load_checkpoint(checkpoint)
+        if trace_file is not None:
+            from polyhutils.step_trace import TraceWriter
+            grid.trace = TraceWriter(trace_file, grid)
+    else:
+        grid = Grid(grid_file, **parameters, input_cache=input_cache, trace_file=trace_file)
+    checkpoints: Optional[Checkpointer] = Checkpointer(grid, checkpoint_dir, prefix, every=checkpoint_every) \
+        if checkpoint_every > 0 else None
 
-    if drawing:
+    if drawing or gif:
         from debug_canvas import DebugCanvas
-        debug: DebugCanvas = DebugCanvas(grid, gif)
+        debug: DebugCanvas = DebugCanvas(grid, gif, headless=not drawing, gif_file=gif_file, every=gif_every,
+                                          scale=gif_scale, background=background_drawing)
+
+    if instrument:
+        from polyhutils.instrumentation import Instrumentation
+        instrumentation: Instrumentation = Instrumentation(grid_class=Grid)
+        instrumentation.enable()
+    profiler: Optional[cProfile.Profile] = cProfile.Profile() if profile_file is not None else None
+    if profiler is not None:
+        profiler.enable()
 
-    for i in range(grid.step_nb):
-        print("\n####### {} Movement #######".format(i))
+    for i in range(steps_done(grid), grid.step_nb):
+        _logger.debug('\n####### %d Movement #######', i)
 
-        if drawing:
+        if drawing or gif:
             debug.update(gif)
 
         grid.move_robots()
+        if checkpoints is not None:
+            checkpoints.step()
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(profile_file)
+    if grid.trace is not None:
+        grid.trace.close()
+    if instrument:
+        instrumentation.disable()
+        _logger.info('%s', instrumentation)
 
-    grid.compile_output('output')
+    grid.compile_output('output', compress=gzip_output)
+    # Hits and misses of the path finder memory
+    _logger.info('%s', grid.finder.memory)
+    close_logging()
 
-    if gif:
-        # compiles the GIF when we chose to save the images (in debug_canvas)
-        debug.compile_Gif()
+    if drawing or gif:
+        # finishes the GIF when we chose to save the images (in debug_canvas)
+        debug.compile_gif()
 
 
 if __name__ == "__main__":
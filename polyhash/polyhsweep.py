@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    Parameter sweep of the Poly# solver.
+    Every combination of robot_percent, task_limit and pathfinder is run on every input file, in parallel.
+    Each input file is parsed once: workers receive a pickled snapshot of the parsed inputs.
+    Every output is checked by the validator (replayed against its input file).
+    Only the best valid output of each input file is written, along with a CSV of the score, wall time
+    and validity of every configuration.
+
+    Usage:
+    # >>> from polyhsweep import main_sweep
+    # >>> main_sweep(['../input/d_tight_schedule.txt'], robot_percents=[0.1, 0.2], task_limits=[1, 2])
+"""
+
+import csv
+import itertools
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from polyhutils.grid import Grid
+from polyhutils.polyhio import CACHE_DIR, input_parsing
+from polyhutils.validator import ValidationReport, validate_output
+
+__all__ = ['main_sweep']
+
+# Parsed input files (pickled), loaded once by each worker
+_snapshots: Dict[str, bytes] = dict()
+
+
+def _load_snapshots(snapshots: Dict[str, bytes]) -> None:
+    """Worker initializer: keeps the pickled parsed inputs"""
+    global _snapshots
+    _snapshots = snapshots
+
+
+def _run_configuration(grid_file: str, robot_percent: float, task_limit: float,
+                       pathfinder: float) -> Tuple[str, Tuple[float, float, float], int, float, str, str,
+                                                   ValidationReport]:
+    """
+    Runs the solver on an input file with one configuration.
+    Returns the input file, the configuration, the score, the wall time, the output file name, its content
+    and its validation.
+    """
+    t0: float = perf_counter()
+    # Each run gets its own copy of the parsed input
+    parsed_input: Tuple[List, List] = pickle.loads(_snapshots[grid_file])
+    grid: Grid = Grid(grid_file, robot_percent=robot_percent, task_limit=task_limit, pathfinder=pathfinder,
+                      parsed_input=parsed_input)
+    for _ in range(grid.step_nb):
+        grid.move_robots()
+    txt, score = grid.output()
+    wall_time: float = perf_counter() - t0
+
+    report: ValidationReport = validate_output(pickle.loads(_snapshots[grid_file]), txt)
+    return grid_file, (robot_percent, task_limit, pathfinder), score, wall_time, \
+        grid.output_filename('output', score), txt, report
+
+
+def main_sweep(grid_files: Iterable[str], robot_percents: Iterable[float] = (0.1,), task_limits: Iterable[float] = (2,),
+               pathfinders: Iterable[float] = (0.1,), output_dir: str = '.', csv_file: str = 'sweep.csv',
+               max_workers: Optional[int] = None, input_cache: Optional[str] = CACHE_DIR) -> Dict[str, Tuple[int, Tuple[float, float, float]]]:
+    """
+    grid_files : input files containing google_hash data
+    robot_percents, task_limits, pathfinders : values of the parameters of Grid to combine
+    output_dir : directory where the best output of each input file and the CSV file are written
+    max_workers : number of processes (all the cores by default)
+    input_cache : directory of the binary cache of the input files (None to disable it)
+    Returns the best score and configuration of each input file.
+    """
+    grid_files = list(grid_files)
+    configurations: List[Tuple[float, float, float]] = list(itertools.product(robot_percents, task_limits,
+                                                                              pathfinders))
+    snapshots: Dict[str, bytes] = {grid_file: pickle.dumps(input_parsing(grid_file, input_cache),
+                                                           pickle.HIGHEST_PROTOCOL)
+                                   for grid_file in grid_files}
+
+    os.makedirs(output_dir, exist_ok=True)
+    best: Dict[str, Tuple[int, Tuple[float, float, float]]] = dict()
+    best_files: Dict[str, str] = dict()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_load_snapshots, initargs=(snapshots,)) as executor, \
+            open(os.path.join(output_dir, csv_file), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['input', 'robot_percent', 'task_limit', 'pathfinder', 'score', 'time', 'valid'])
+
+        futures = [executor.submit(_run_configuration, grid_file, *configuration)
+                   for grid_file in grid_files for configuration in configurations]
+        for future in as_completed(futures):
+            grid_file, configuration, score, wall_time, filename, txt, report = future.result()
+            # The score of the solver must be the one of the rules
+            valid: bool = report.valid and report.score == score
+            writer.writerow([os.path.basename(grid_file), *configuration, score, round(wall_time, 3), int(valid)])
+            f.flush()
+            print('{} {} : score = {} ({:.1f} s)'.format(os.path.basename(grid_file), configuration, score,
+                                                        wall_time))
+            if not valid:
+                print('    {} (score of the solver = {})'.format(report, score))
+                continue
+
+            # Only the best output of each input file is kept
+            if grid_file not in best or score > best[grid_file][0]:
+                if grid_file in best_files:
+                    os.remove(best_files[grid_file])
+                best[grid_file] = (score, configuration)
+                best_files[grid_file] = os.path.join(output_dir, filename)
+                with open(best_files[grid_file], 'w') as output:
+                    output.write(txt)
+
+    return best
+
+
+if __name__ == "__main__":
+    main_sweep(['../input/a_example.txt', '../input/d_tight_schedule.txt'], robot_percents=[0.1, 0.2, 0.5],
+               task_limits=[1, 2, 5], pathfinders=[0.1, 0.5])
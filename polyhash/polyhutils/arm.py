@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Creating the Arm object, the cells of a robotic arm from its mounting point to its gripper.
+The coordinates of the cells are packed in an array of ints (x0, y0, x1, y1...). Along with them, the arm keeps
+the index of each cell: an arm never crosses itself, so every cell appears once, and checking whether a cell
+belongs to the arm or whether a move retracts the arm costs a dictionary lookup instead of a scan of the arm.
+
+Usage:
+# >>> arm = Arm([(0, 0), (0, 1)])
+# >>> arm.push((1, 1))
+# >>> arm.is_retraction((1, 1), (0, 1))
+# True
+"""
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Union
+
+__all__ = ['Arm', 'Trail']
+
+
+def _pack(cell: Tuple[int, int]) -> int:
+    """Key of a cell in the index of an arm"""
+    return cell[0] << 32 | cell[1]
+
+
+class Arm:
+    """
+    Cells of an arm (the mounting point first, the gripper last) and index of each cell in the arm.
+    The arm is only changed at its end: the gripper moves to a new cell (push) or the arm retracts (pop).
+    """
+
+    __slots__ = ('coords', 'index')
+
+    def __init__(self, cells: Iterable[Tuple[int, int]] = ()):
+        self.coords: array = array('i')
+        self.index: Dict[int, int] = dict()
+        for cell in cells:
+            self.push(cell)
+
+    def push(self, cell: Tuple[int, int]) -> None:
+        """The gripper moves to a new cell"""
+        self.index[_pack(cell)] = len(self.coords) >> 1
+        self.coords.extend(cell)
+
+    def pop(self) -> Tuple[int, int]:
+        """The arm retracts, the cell left by the gripper is returned"""
+        coords: array = self.coords
+        cell: Tuple[int, int] = (coords[-2], coords[-1])
+        del coords[-2:]
+        del self.index[_pack(cell)]
+        return cell
+
+    def is_retraction(self, source: Tuple[int, int], cell: Tuple[int, int]) -> bool:
+        """Checks whether going from source to cell moves the gripper back to the previous cell of the arm"""
+        i: int = self.index.get(source[0] << 32 | source[1], 0)
+        return i > 0 and self.coords[2*i - 2] == cell[0] and self.coords[2*i - 1] == cell[1]
+
+    def replay(self, path: Iterable[Tuple[int, int]]) -> None:
+        """
+        Moves the arm along a path: going back to the previous cell of the arm is a retraction,
+        staying in the same cell is a wait
+        """
+        for position in path:
+            if position == self[-1]:
+                continue
+            if len(self.coords) >= 4 and position == self[-2]:
+                self.pop()
+            else:
+                self.push(position)
+
+    def copy(self) -> 'Arm':
+        arm: Arm = Arm()
+        arm.coords = self.coords[:]
+        arm.index = self.index.copy()
+        return arm
+
+    def __contains__(self, cell: Tuple[int, int]) -> bool:
+        return cell[0] << 32 | cell[1] in self.index
+
+    def __getitem__(self, i: Union[int, slice]):
+        """Cell (x, y) of the arm at a given index, or list of cells for a slice"""
+        if isinstance(i, slice):
+            return list(self)[i]
+        n: int = len(self.coords) >> 1
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError('arm index out of range')
+        return self.coords[2*i], self.coords[2*i + 1]
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        coords: Iterator[int] = iter(self.coords)
+        return zip(coords, coords)
+
+    def __len__(self) -> int:
+        return len(self.coords) >> 1
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "Arm from {} to {} ({} cells)".format(self[0], self[-1], len(self))
+
+
+class Trail:
+    """
+    Cells an arm goes through while its path to several targets is planned: the cells of the arm, then the cells of
+    the path already computed, end to end (retractions and waits included, a cell may appear several times).
+    Every cell of the trail is still held by the arm on the grid until the robot actually moves, so a cell the
+    gripper retracted from is not free: the cells of the trail may only be entered by going back along the trail.
+    """
+
+    __slots__ = ('cells', 'members', 'links')
+
+    def __init__(self, cells: Iterable[Tuple[int, int]] = ()):
+        self.cells: List[Tuple[int, int]] = []
+        self.members: Set[Tuple[int, int]] = set()
+        # Pairs of consecutive cells (cell, next cell) of the trail
+        self.links: Set[Tuple[Tuple[int, int], Tuple[int, int]]] = set()
+        self.extend(cells)
+
+    def extend(self, cells: Iterable[Tuple[int, int]]) -> None:
+        """Appends the cells of a path to the trail"""
+        for cell in cells:
+            if self.cells:
+                self.links.add((self.cells[-1], cell))
+            self.cells.append(cell)
+            self.members.add(cell)
+
+    def is_retraction(self, source: Tuple[int, int], cell: Tuple[int, int]) -> bool:
+        """Checks whether going from source to cell moves back along the trail (cell is followed by source)"""
+        return (cell, source) in self.links
+
+    def __contains__(self, cell: Tuple[int, int]) -> bool:
+        return cell in self.members
+
+    def __getitem__(self, i: Union[int, slice]):
+        return self.cells[i]
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(self.cells)
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "Trail from {} to {} ({} cells)".format(self.cells[0], self.cells[-1], len(self.cells))
+
+
+if __name__ == "__main__":
+    robot_arm: Arm = Arm([(0, 0), (0, 1)])
+    robot_arm.replay([(1, 1), (1, 2), (1, 1)])
+    print(robot_arm, list(robot_arm), robot_arm.is_retraction((1, 1), (0, 1)), (1, 2) in robot_arm)
+    robot_trail: Trail = Trail(robot_arm)
+    robot_trail.extend([(1, 1), (1, 2)])
+    print(robot_trail, robot_trail.is_retraction((1, 2), (1, 1)), robot_trail.is_retraction((0, 1), (1, 1)))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module saving the state of a simulation to a file (checkpoint) and restoring it, to resume an interrupted run or to
+fork a run at a given step and try other parameters for the remaining steps.
+A checkpoint holds the whole Grid: obstacles, robots (arms, planned paths, timers, moves), tasks (statuses,
+remaining assembly points), path finder (remaining steps) and pool of tasks, so a resumed run makes exactly the same
+choices as the original one. What is being written (trace file) and the caches derived from the rest are left out:
+distance fields (computed again when loaded), paths kept by the path finder, its incremental searches and the
+statistics of its last search (computed again when needed).
+The file is a gzip compressed pickle: a small header (input name, parameters, step), then the grid. It is written
+under a temporary name, then renamed, so an interruption never leaves a truncated checkpoint.
+
+Usage:
+# >>> checkpoints = Checkpointer(grid, '.polyhcheckpoints', 'd_0.1_2_0.1', every=1000)
+# >>> for _ in range(grid.step_nb):
+# ...     grid.move_robots()
+# ...     checkpoints.step()
+# >>> grid = load_checkpoint(latest_checkpoint('.polyhcheckpoints', 'd_0.1_2_0.1'))
+"""
+
+import contextlib
+import glob
+import gzip
+import os
+import pickle
+from typing import Dict, List, Optional
+from grid import Grid
+from polyhlog import get_logger
+
+__all__ = ['CHECKPOINT_DIR', 'steps_done', 'save_checkpoint', 'load_checkpoint', 'checkpoint_info',
+           'latest_checkpoint', 'fork', 'Checkpointer']
+
+# Default directory of the checkpoints
+CHECKPOINT_DIR: str = '.polyhcheckpoints'
+VERSION: int = 1
+
+_logger = get_logger('checkpoint')
+
+
+def steps_done(grid: Grid) -> int:
+    """Number of steps already simulated on a grid"""
+    return grid.step_nb - grid.finder.nb_movements
+
+
+def save_checkpoint(grid: Grid, file_name: str) -> None:
+    """Saves the state of the simulation of a grid"""
+    header: Dict = {'version': VERSION, 'grid': grid.grid_name, 'features': grid.features, 'step': steps_done(grid)}
+    temporary_name: str = '{}.{}.tmp'.format(file_name, os.getpid())
+    try:
+        with gzip.open(temporary_name, 'wb', compresslevel=6) as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(grid, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        # The file may not have been created (directory missing, no permission...)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temporary_name)
+        raise
+    os.replace(temporary_name, file_name)
+
+
+def checkpoint_info(file_name: str) -> Dict:
+    """Header of a checkpoint (input name, parameters and step), without loading the grid"""
+    with gzip.open(file_name, 'rb') as f:
+        header: Dict = pickle.load(f)
+    if header.get('version') != VERSION:
+        raise ValueError('{} is not a checkpoint of version {}'.format(file_name, VERSION))
+    return header
+
+
+def load_checkpoint(file_name: str) -> Grid:
+    """Restores the grid saved in a checkpoint, ready to simulate its next step"""
+    with gzip.open(file_name, 'rb') as f:
+        header: Dict = pickle.load(f)
+        if header.get('version') != VERSION:
+            raise ValueError('{} is not a checkpoint of version {}'.format(file_name, VERSION))
+        grid: Grid = pickle.load(f)
+    _logger.info('Simulation resumed at step %d from %s', header['step'], file_name)
+    return grid
+
+
+def latest_checkpoint(directory: str, prefix: str) -> Optional[str]:
+    """Checkpoint of a run (name prefix, see Checkpointer) with the most steps, None if there is none"""
+    files: List[str] = glob.glob(os.path.join(glob.escape(directory), '{}_*.ckpt'.format(glob.escape(prefix))))
+    return max(files, key=lambda name: checkpoint_info(name)['step'], default=None)
+
+
+def fork(grid: Grid, task_limit: Optional[float] = None, pathfinder: Optional[float] = None) -> Grid:
+    """
+    Changes the parameters of a restored grid for its remaining steps
+    (the number of robots cannot change once they are mounted).
+    task_limit and pathfinder are the parameters of Grid, None keeps the current value (a task_limit fraction
+    applies to the tasks remaining at the fork).
+    """
+    if task_limit is not None:
+        for robot in grid.robots:
+            robot.task_limit = int(len(grid.simulation.remaining) * task_limit) if task_limit <= 1 else task_limit
+        grid.features[1] = task_limit
+    if pathfinder is not None:
+        grid.finder.limit = pathfinder
+        grid.features[2] = pathfinder
+    return grid
+
+
+class Checkpointer:
+    """Saves a checkpoint of a grid every few steps, and keeps the last ones"""
+
+    def __init__(self, grid: Grid, directory: str = CHECKPOINT_DIR, prefix: Optional[str] = None,
+                 every: int = 1000, keep: int = 2):
+        """
+        prefix : name of the run in the checkpoint files (input name and parameters by default)
+        every : number of steps between two checkpoints
+        keep : number of checkpoints kept, the older ones are removed
+        """
+        self.grid: Grid = grid
+        self.directory: str = directory
+        self.prefix: str = prefix if prefix is not None else '_'.join(map(str, [grid.grid_name] + grid.features))
+        self.every: int = every
+        self.keep: int = keep
+        self.saved: List[str] = []
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self) -> str:
+        """Saves a checkpoint of the current step, and returns its name"""
+        file_name: str = os.path.join(self.directory, '{}_{:06d}.ckpt'.format(self.prefix, steps_done(self.grid)))
+        save_checkpoint(self.grid, file_name)
+        _logger.debug('Checkpoint %s saved', file_name)
+        self.saved.append(file_name)
+        while len(self.saved) > self.keep:
+            os.remove(self.saved.pop(0))
+        return file_name
+
+    def step(self) -> None:
+        """Called after every step, saves a checkpoint every few steps"""
+        if steps_done(self.grid) % self.every == 0:
+            self.save()
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "Checkpointer: every {} steps in {}, last: {}".format(
+            self.every, self.directory, self.saved[-1] if self.saved else None)
+
+
+if __name__ == "__main__":
+    test_grid: Grid = Grid('../../input/d_tight_schedule.txt', robot_percent=0.1, task_limit=2, pathfinder=0.1)
+    checkpoints: Checkpointer = Checkpointer(test_grid, every=50)
+    for _ in range(test_grid.step_nb):
+        test_grid.move_robots()
+        checkpoints.step()
+    print(checkpoints, test_grid.output()[1])
+    # The run is forked at the first checkpoint kept, with another limit of the path finder
+    resumed: Grid = fork(load_checkpoint(checkpoints.saved[0]), pathfinder=0.5)
+    for _ in range(steps_done(resumed), resumed.step_nb):
+        resumed.move_robots()
+    print(resumed.output()[1])
@@ -11,151 +11,133 @@
  assembly point(s) reached = green
  arm and gripper = black line and black square
 
+ The frames can be drawn in a separate process (background=True): the simulation only computes what changed at
+ each step (SceneTracker) and puts it in a bounded queue, the process draws and encodes the frames.
+
  """
 
 
-import tkinter as tk
-from PIL import ImageTk, Image, ImageDraw
+import multiprocessing
+from typing import Optional, Tuple
+import numpy as np
+from PIL import Image
 from grid import Grid
-from task import Task
-from robot import Robot
+from frame_encoder import FrameEncoder, open_encoder
+from raster import Delta, Rasterizer, SceneTracker
+
+
+class Display:
+    """Window (unless headless) and file (when encoder is given) showing the frames"""
+
+    def __init__(self, width: int, height: int, headless: bool, encoder: Optional[FrameEncoder]):
+        self.headless: bool = headless
+        self.encoder: Optional[FrameEncoder] = encoder
+        if not headless:
+            import tkinter as tk
+            from PIL import ImageTk
+            self.photo_image = ImageTk.PhotoImage
+            # tkinter main class
+            self.master: tk.Tk = tk.Tk()
+            self.master.title('Affichage en temps réel')
+            # the debug image will be drawn on a label
+            self.label: tk.Label = tk.Label(self.master, width=width, height=height)
+            # resize the label and make the TK windows (always) topmost
+            self.label.pack()
+            self.master.attributes('-topmost', 'true')
+
+    def show(self, frame: np.ndarray, saved: bool) -> None:
+        if not self.headless:
+            # Create a new Photoimage from the frame
+            self.PhotoImage = self.photo_image(Image.fromarray(frame))
+            # Update the image
+            self.label.configure(image=self.PhotoImage)
+            self.label.update()
+
+        # To write the frame to the animated GIF
+        if saved and self.encoder is not None:
+            self.encoder.write(frame)
+
+    def close(self) -> None:
+        if self.encoder is not None:
+            self.encoder.close()
+
+
+def _render(layout: Tuple, cells_size: int, headless: bool, gif_file: Optional[str], every: int, scale: int,
+            queue: multiprocessing.Queue) -> None:
+    """Drawing process: applies the deltas of the queue (step, delta, saved) until None is received"""
+    raster: Rasterizer = Rasterizer(*layout, cell_size=cells_size)
+    display: Display = Display(raster.frame.shape[1], raster.frame.shape[0], headless,
+                               open_encoder(gif_file, every, scale) if gif_file is not None else None)
+    try:
+        for delta, saved in iter(queue.get, None):
+            display.show(raster.apply(delta), saved)
+    finally:
+        display.close()
 
 
 class DebugCanvas:
 
-    final_images = []
-
-    def __init__(self, grid: Grid, gif, cells_size: int = 10):
+    def __init__(self, grid: Grid, gif, cells_size: int = 10, headless: bool = False,
+                 gif_file: str = '../debug/debug.gif', every: int = 1, scale: int = 1, background: bool = False,
+                 queue_size: int = 64):
+        """
+        The frames are drawn by a Rasterizer (NumPy array, only the cells which changed are redrawn).
+        headless : boolean value disabling the tkinter window (frames are only drawn for the GIF)
+        gif_file : file where the frames are written as they are drawn (animated GIF, or raw video if it ends
+        with .y4m)
+        every, scale : one frame out of every is written to gif_file, reduced by scale
+        background : boolean value drawing (and encoding) the frames in another process
+        queue_size : number of steps the drawing process may be late (the simulation waits beyond it)
+        """
         self.cpt: int = 0
         self.grid: Grid = grid
-        # tkinter main class
-        self.master: tk.Tk = tk.Tk()
-        self.master.title('Affichage en temps réel')
+        self.tracker: SceneTracker = SceneTracker(grid)
+        self.headless: bool = headless
+        self.every: int = every
         # a few parameters
         self.cell_size: int = cells_size
         self.width: int = cells_size * grid.width
         self.height: int = cells_size * grid.height
-        # the debug image will be drawn on a label
-        self.label: tk.Label = tk.Label(self.master, width=self.width, height=self.height)
-        #  a new PIL image of the right size. We'll draw on that one
-        self.img = Image.new("RGB", (self.width, self.height))
-        # the PIL class for drawing on PIL images
-        self.draw = ImageDraw.Draw(self.img)
-        # resize the label and make the TK windows (always) topmost
-        self.label.pack()
-        self.master.attributes('-topmost', 'true')
-
-        # To speed up things, we draw the grid and other stuffs once for all
-        # draw all the cells
-        self.img.paste((255, 255, 255), [0, 0, self.img.size[0], self.img.size[1]])
-        for y in range(self.grid.height):
-            for x in range(self.grid.width):
-                self.draw.rectangle([x * self.cell_size, y * self.cell_size, x * self.cell_size + self.cell_size,
-                                     y * self.cell_size + self.cell_size], outline='grey')
-
-        # then assembly points
-        task: Task
-        all_tasks = Task.remaining + Task.current + Task.performed  # pas d'attribut grid.tasks dans notre programme
-        for task in all_tasks:
-            for pt in task.path:
-                fill_c = 'yellow'
-                self.draw.rectangle([pt[0] * self.cell_size + 1, pt[1] * self.cell_size + 1,
-                                     pt[0] * self.cell_size + self.cell_size - 1,
-                                     pt[1] * self.cell_size + self.cell_size - 1], fill=fill_c)
-
-        # then mount points
-        for pt in self.grid.mount_points:
-            self.draw.ellipse([pt[0] * self.cell_size, pt[1] * self.cell_size, pt[0] * self.cell_size + self.cell_size,
-                               pt[1] * self.cell_size + self.cell_size], fill=(105, 123, 241))
+        # Frames are encoded as soon as they are drawn, none of them is kept in memory
+        gif_file = gif_file if gif else None
+        self.process: Optional[multiprocessing.Process] = None
+        self.display: Optional[Display] = None
+        if background:
+            self.queue: multiprocessing.Queue = multiprocessing.Queue(queue_size)
+            self.process = multiprocessing.Process(target=_render, args=(
+                self.tracker.layout(), cells_size, headless, gif_file, every, scale, self.queue), daemon=True)
+            self.process.start()
+        else:
+            self.raster: Rasterizer = Rasterizer(*self.tracker.layout(), cell_size=cells_size)
+            self.display = Display(self.width, self.height, headless,
+                                            open_encoder(gif_file, every, scale) if gif else None)
         self.update(gif)
 
     def update(self, gif):
         """To update the graphical display to each new movement"""
-        # cpt is just an index used when saving the debug frames (to create a gif for example)
+        # cpt is just an index used to sample the frames of the gif
         self.cpt += 1
-        # Copy the pre-rendred image on a new image
-        img = self.img.copy()
-        self.draw = ImageDraw.Draw(img)
-
-        # debug : draw blocked cells in grey
-        for pt in self.grid:
-            if pt not in self.grid.mount_points:
-                x = pt[0]
-                y = pt[1]
-                self.draw.rectangle([x * self.cell_size, y * self.cell_size, x * self.cell_size + self.cell_size,
-                                     y * self.cell_size + self.cell_size], fill=(185, 116, 85))
-
-        # then assembly points (color depends on their state)
-        task: Task
-        # non-reached targetpoint colored in red
-        # reached targetpoint colored in green
-        for task in Task.current:
-            for pt in task.path:
-                if pt in task.target_points:
-                    fill_c = (255, 0, 0)
-                else:
-                    fill_c = (47, 147, 0)
-                self.draw.rectangle([pt[0] * self.cell_size + 1, pt[1] * self.cell_size + 1,
-                                     pt[0] * self.cell_size + self.cell_size - 1,
-                                     pt[1] * self.cell_size + self.cell_size - 1], fill=fill_c)
-
-        # reached assemblypoints colored in green (fixing issue when task has a single assembly point)
-        for task in Task.performed:
-            for pt in task.path:
-                self.draw.rectangle([pt[0] * self.cell_size + 1, pt[1] * self.cell_size + 1,
-                                     pt[0] * self.cell_size + self.cell_size - 1,
-                                     pt[1] * self.cell_size + self.cell_size - 1], fill=(47, 147, 0))
-
-        robot: Robot
-        # arms mount points in  dark blue
-        for robot in self.grid.robots:
-            pt = robot.arm[0]
-            self.draw.ellipse([pt[0] * self.cell_size, pt[1] * self.cell_size, pt[0] * self.cell_size + self.cell_size,
-                               pt[1] * self.cell_size + self.cell_size], fill=(20, 43, 188))
-
-        # draw the arm (black lines)
-        for robot in self.grid.robots:
-            first: bool = True
-            previous = None
-            for pt in Robot.arms[robot.id]:  # arm.history:
-                if first:
-                    first = False
-                else:
-                    self.draw.line([self.cell_size / 2 + previous[0] * self.cell_size,
-                                    self.cell_size / 2 + previous[1] * self.cell_size,
-                                    self.cell_size / 2 + pt[0] * self.cell_size,
-                                    self.cell_size / 2 + pt[1] * self.cell_size], fill='black',
-                                   width=self.cell_size // 3)
-                previous = pt
-            # draw gripper (black square)
-            pt = robot.arm[-1]
-            if len(Robot.arms[robot.id]) > 0:
-                self.draw.line([self.cell_size / 2 + previous[0] * self.cell_size,
-                                self.cell_size / 2 + previous[1] * self.cell_size,
-                                self.cell_size / 2 + pt[0] * self.cell_size,
-                                self.cell_size / 2 + pt[1] * self.cell_size], fill='black', width=self.cell_size // 3)
-            self.draw.rectangle(
-                [pt[0] * self.cell_size + 1, pt[1] * self.cell_size + 1, pt[0] * self.cell_size + self.cell_size - 1,
-                 pt[1] * self.cell_size + self.cell_size - 1], fill='black', width=self.cell_size // 3)
-
-        # ----------------------------------- end of drawing --------------------------------------#
-
-        # We need to flip the image horizontally because because axis are not the same in my arrays and in images
-        img = img.transpose(Image.FLIP_TOP_BOTTOM)
-        # Create a new Photoimage from the PIL image
-        self.PhotoImage = ImageTk.PhotoImage(img)
-        # Update the image
-        self.label.configure(image=self.PhotoImage)
-        self.label.update()
-
-        # To save the image and then create an animated GIF (for fast executions)
-        if gif:
-            img.save("../debug/images/{:4d} Movement.jpg".format(self.cpt-1))
-            DebugCanvas.final_images.append(img)
+        saved: bool = bool(gif) and (self.cpt - 1) % self.every == 0
+        if self.headless and not saved:
+            return
+        # Only the changes since the previous frame are computed here
+        delta: Delta = self.tracker.delta()
+        if self.process is not None:
+            self.queue.put((delta, saved))
+        else:
+            # The frame is already flipped (y axis upwards)
+            self.display.show(self.raster.apply(delta), saved)
 
     def compile_gif(self):
-        """To create an animated GIF from images saved with every movement (for fast executions)
-        file saved in "debug" directory """
-        DebugCanvas.final_images[0].save("../debug/debug.gif", save_all=True,
-                                         append_images=DebugCanvas.final_images[1:],
-                                         optimize=False, duration=200, loop=0)
+        """To finish the animated GIF (or video) written with the movements, in "debug" directory by default"""
+        self.close()
+
+    def close(self):
+        """Stops the display (waits for the drawing process to draw the remaining frames)"""
+        if self.process is not None:
+            self.queue.put(None)
+            self.process.join()
+            self.process = None
+        elif self.display is not None:
+            self.display.close()
+            self.display = None
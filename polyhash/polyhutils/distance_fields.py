@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Creating the DistanceFields object: obstacle-aware distances on the grid.
+A breadth-first search is run from each source (mounting points, then assembly points) with the
+mounting points as walls, and the resulting distance fields are stored in a single NumPy array.
+The number of fields is bounded by a memory cap: distances to points without a field fall back
+to the manhattan distance.
+
+Usage:
+# >>> fields = DistanceFields(5, 4, [(1, 1)], [(0, 1), (2, 1)])
+# >>> fields.distance((0, 1), (2, 1))
+# 4
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from distances import manhattan
+
+__all__ = ['DistanceFields']
+
+# Value of the cells which cannot be reached from the source of a field
+UNREACHABLE: int = -1
+
+
+def _bfs_fields(walls: np.ndarray, width: int, height: int, sources: List[int]) -> np.ndarray:
+    """
+    Computes the distance fields of several sources at once, one row per source.
+    Walls get a distance (they may be the end of a path) but the search never goes through them.
+    """
+    n: int = width * height
+    fields: np.ndarray = np.full((len(sources), n), UNREACHABLE, dtype=np.int16)
+    flat: np.ndarray = fields.reshape(-1)
+    # Scratch array used to remove duplicates from the frontier without sorting it
+    owner: np.ndarray = np.empty(flat.size, dtype=np.int32)
+    # Positions in the flattened array: row * n + cell
+    frontier: np.ndarray = np.arange(len(sources), dtype=np.int64) * n + np.asarray(sources, dtype=np.int64)
+    flat[frontier] = 0
+
+    level: int = 0
+    while frontier.size:
+        level += 1
+        if level > np.iinfo(fields.dtype).max:
+            # Only happens with walls forming a maze: distances no longer fit on 16 bits
+            fields = fields.astype(np.int32)
+            flat = fields.reshape(-1)
+        cells: np.ndarray = frontier % n
+        x: np.ndarray = cells % width
+        following: np.ndarray = np.concatenate((frontier[x > 0] - 1, frontier[x < width - 1] + 1,
+                                                frontier[cells >= width] - width,
+                                                frontier[cells < n - width] + width))
+        following = following[flat[following] == UNREACHABLE]
+        # A cell reached several times keeps its last occurrence only
+        order: np.ndarray = np.arange(following.size, dtype=np.int32)
+        owner[following] = order
+        following = following[owner[following] == order]
+        flat[following] = level
+        frontier = following[~walls[following % n]]
+
+    return fields
+
+
+class DistanceFields:
+    """
+    Distance fields computed from a list of sources.
+    Distances are symmetric, so a distance is known as soon as one of its two points is a source.
+    """
+
+    def __init__(self, width: int, height: int, walls: Iterable[Tuple[int, int]], sources: Iterable[Tuple[int, int]],
+                 memory_cap: float = 256, batch_size: int = 64):
+        """
+        walls : cells which cannot be crossed (the mounting points)
+        sources : points from which fields are computed, by order of priority (duplicates are ignored)
+        memory_cap : maximum size of the fields, in MB
+        batch_size : number of searches run together
+        """
+        self.width: int = width
+        self.height: int = height
+        self.walls: List[Tuple[int, int]] = list(walls)
+        self.batch_size: int = batch_size
+
+        # Keeping as many sources as the memory cap allows
+        nb_fields: int = int(memory_cap * 2**20) // (width * height * np.dtype(np.int16).itemsize)
+        self.rows: Dict[Tuple[int, int], int] = dict()
+        for point in sources:
+            if len(self.rows) >= nb_fields:
+                break
+            if point not in self.rows:
+                self.rows[point] = len(self.rows)
+
+        self.fields: np.ndarray = self._compute_fields()
+
+    def _compute_fields(self) -> np.ndarray:
+        """Runs the searches from the sources kept, by batches, and returns their fields (one row per source)"""
+        width, height = self.width, self.height
+        wall_mask: np.ndarray = np.zeros(width * height, dtype=bool)
+        for x, y in self.walls:
+            wall_mask[y * width + x] = True
+
+        ids: List[int] = [y * width + x for x, y in self.rows]
+        fields: np.ndarray = np.empty((len(ids), width * height), dtype=np.int16)
+        for i in range(0, len(ids), self.batch_size):
+            batch: np.ndarray = _bfs_fields(wall_mask, width, height, ids[i:i + self.batch_size])
+            if batch.dtype != fields.dtype:
+                fields = fields.astype(batch.dtype)
+            fields[i:i + self.batch_size] = batch
+        return fields
+
+    def __getstate__(self) -> Dict:
+        """State saved in a checkpoint: the fields are left out, they are computed again when loaded"""
+        state: Dict = self.__dict__.copy()
+        del state['fields']
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self.fields = self._compute_fields()
+
+    def field(self, point: Tuple[int, int]) -> Optional[np.ndarray]:
+        """Returns the distance field of a point (distances of every cell to the point), if it was computed"""
+        row: Optional[int] = self.rows.get(point)
+        return None if row is None else self.fields[row]
+
+    def distance(self, a: Tuple[int, int], b: Tuple[int, int]) -> Optional[int]:
+        """
+        Returns the length of the shortest path between two points avoiding the walls,
+        None if b cannot be reached from a, or the manhattan distance if no field is known.
+        """
+        row: Optional[int] = self.rows.get(b)
+        cell: Tuple[int, int] = a
+        if row is None:
+            row = self.rows.get(a)
+            cell = b
+            if row is None:
+                return manhattan(a, b)
+
+        dist: int = int(self.fields[row, cell[1] * self.width + cell[0]])
+        return None if dist == UNREACHABLE else dist
+
+    def distances(self, point: Tuple[int, int], xs: np.ndarray, ys: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of distance(point, (x, y)) for several points, rows being the rows of their fields
+        (-1 without field). Unreachable points get UNREACHABLE.
+        """
+        cells: np.ndarray = ys * self.width + xs
+        dist: np.ndarray = np.abs(xs - point[0]) + np.abs(ys - point[1])
+        known: np.ndarray = rows >= 0
+        dist[known] = self.fields[rows[known], point[1] * self.width + point[0]]
+        row: Optional[int] = self.rows.get(point)
+        if row is not None:
+            dist[~known] = self.fields[row, cells[~known]]
+        return dist
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "{} distance fields of {}x{} cells ({:.1f} MB)".format(len(self.rows), self.width, self.height,
+                                                                      self.fields.nbytes / 2**20)
+
+
+if __name__ == "__main__":
+    fields: DistanceFields = DistanceFields(5, 4, [(1, 1)], [(0, 1), (2, 1)])
+    print(fields, fields.distance((0, 1), (2, 1)))
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module writing the frames of the debug display to a file as soon as they are drawn, so that recording a
+simulation takes the same memory whatever its number of steps.
+Two formats are available, chosen from the extension of the file:
+- animated GIF: every frame only stores the rectangle of pixels which changed since the previous frame (the LZW
+compression of this rectangle is done by Pillow), and identical frames are merged by lengthening the delay,
+- Y4M (raw YUV 4:4:4 video, readable by ffmpeg, vlc or mpv): frames are written as they are.
+Frames can be sampled (one frame kept every N steps) and downscaled (one pixel kept every N pixels, which keeps the
+colors of the display).
+
+Usage:
+# >>> with open_encoder('debug.gif', every=10, scale=2) as encoder:
+# ...     for step in range(step_nb):
+# ...         if encoder.keeps(step):
+# ...             encoder.write(raster.render())
+"""
+
+import struct
+from io import BytesIO
+from typing import BinaryIO, Optional, Tuple
+import numpy as np
+
+__all__ = ['FrameEncoder', 'GifEncoder', 'Y4mEncoder', 'open_encoder']
+
+
+class FrameEncoder:
+    """Base class of the encoders: sampling and downscaling of the frames"""
+
+    def __init__(self, file_name: str, every: int = 1, scale: int = 1):
+        """
+        every : one step out of every is kept
+        scale : the frames are reduced by this factor in both directions
+        """
+        if every < 1 or scale < 1:
+            raise ValueError('every and scale must be positive')
+        self.file_name: str = file_name
+        self.every: int = every
+        self.scale: int = scale
+        self.frames: int = 0
+        self.f: BinaryIO = open(file_name, 'wb')
+
+    def keeps(self, step: int) -> bool:
+        """Checks whether the frame of a step is written (the frame does not need to be drawn otherwise)"""
+        return step % self.every == 0
+
+    def write(self, frame: np.ndarray) -> None:
+        """Writes a frame, (height, width, 3) array of uint8"""
+        if self.scale > 1:
+            frame = frame[::self.scale, ::self.scale]
+        self._write(np.ascontiguousarray(frame))
+        self.frames += 1
+
+    def _write(self, frame: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        if not self.f.closed:
+            self.f.close()
+
+    def __enter__(self) -> 'FrameEncoder':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "{}: {} frames written to {} (1 step out of {}, scale 1/{})".format(
+            type(self).__name__, self.frames, self.file_name, self.every, self.scale)
+
+
+def _gif_image(image: np.ndarray) -> Tuple[bytes, int, bytes]:
+    """
+    Encodes an image with Pillow as a single frame GIF, and returns its color table, the flags of its image
+    descriptor (size of the color table, interlacing) and its LZW compressed data (minimum code size, then
+    data sub-blocks)
+    """
+    from PIL import Image
+    packed: np.ndarray = (image[..., 0].astype(np.uint32) << 16) | (image[..., 1].astype(np.uint32) << 8) | \
+        image[..., 2]
+    colors, indices = np.unique(packed, return_inverse=True)
+    if len(colors) <= 256:
+        picture = Image.fromarray(indices.reshape(packed.shape).astype(np.uint8), 'P')
+        palette: np.ndarray = np.stack([colors >> 16, (colors >> 8) & 255, colors & 255], axis=1).astype(np.uint8)
+        picture.putpalette(palette.tobytes())
+    else:
+        picture = Image.fromarray(image).quantize(256)
+    buffer: BytesIO = BytesIO()
+    picture.save(buffer, format='GIF', optimize=False, interlace=False)
+    data: bytes = buffer.getvalue()
+
+    # Header and logical screen descriptor, global color table of the single frame
+    flags: int = data[10]
+    position: int = 13
+    table: bytes = b''
+    bits: int = flags & 7
+    if flags & 0x80:
+        table = data[position:position + 3 * 2**(bits + 1)]
+        position += len(table)
+    while data[position] != 0x2C:
+        # Extension: label, then sub-blocks
+        position += 2
+        while data[position]:
+            position += data[position] + 1
+        position += 1
+    flags = data[position + 9]
+    position += 10
+    if flags & 0x80:
+        bits = flags & 7
+        table = data[position:position + 3 * 2**(bits + 1)]
+        position += len(table)
+    start: int = position
+    position += 1
+    while data[position]:
+        position += data[position] + 1
+    return table, 0x80 | (flags & 0x40) | bits, data[start:position + 1]
+
+
+class GifEncoder(FrameEncoder):
+    """Animated GIF written frame by frame (the previous frame is kept to find the pixels which changed)"""
+
+    def __init__(self, file_name: str, every: int = 1, scale: int = 1, duration: int = 200, loop: int = 0):
+        """
+        duration : display time of a frame, in milliseconds
+        loop : number of loops of the animation (0 loops forever)
+        """
+        super().__init__(file_name, every, scale)
+        self.delay: int = max(duration // 10, 1)
+        self.loop: int = loop
+        self.previous: Optional[np.ndarray] = None
+        # Last frame, written when the next different frame (or the end of the file) comes: (descriptor, delay)
+        self._pending: Optional[Tuple[bytes, int]] = None
+
+    def _write(self, frame: np.ndarray) -> None:
+        height, width = frame.shape[:2]
+        if self.previous is None:
+            # Header, logical screen descriptor without global color table, infinite loop extension
+            self.f.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0x70, 0, 0))
+            self.f.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', self.loop) + b'\x00')
+            left, top, right, bottom = 0, 0, width, height
+        else:
+            changed: np.ndarray = np.any(frame != self.previous, axis=2)
+            rows: np.ndarray = np.flatnonzero(changed.any(axis=1))
+            if len(rows) == 0:
+                descriptor, delay = self._pending
+                self._pending = (descriptor, delay + self.delay)
+                return
+            columns: np.ndarray = np.flatnonzero(changed.any(axis=0))
+            left, top, right, bottom = columns[0], rows[0], columns[-1] + 1, rows[-1] + 1
+        self._flush()
+        table, flags, data = _gif_image(frame[top:bottom, left:right])
+        self._pending = (struct.pack('<BHHHHB', 0x2C, left, top, right - left, bottom - top, flags) +
+                         table + data, self.delay)
+        self.previous = frame.copy()
+
+    def _flush(self) -> None:
+        """Writes the pending frame, after its graphic control extension (delay, frame kept under the next one)"""
+        if self._pending is not None:
+            descriptor, delay = self._pending
+            self.f.write(struct.pack('<BBBBHBB', 0x21, 0xF9, 4, 0x04, min(delay, 0xFFFF), 0, 0))
+            self.f.write(descriptor)
+            self._pending = None
+
+    def close(self) -> None:
+        if not self.f.closed:
+            self._flush()
+            if self.previous is not None:
+                self.f.write(b'\x3b')
+        super().close()
+
+
+class Y4mEncoder(FrameEncoder):
+    """Raw video in the YUV4MPEG2 format, without chroma subsampling"""
+
+    def __init__(self, file_name: str, every: int = 1, scale: int = 1, fps: int = 5):
+        super().__init__(file_name, every, scale)
+        self.fps: int = fps
+        self.size: Optional[Tuple[int, int]] = None
+
+    def _write(self, frame: np.ndarray) -> None:
+        if self.size is None:
+            self.size = frame.shape[:2]
+            self.f.write('YUV4MPEG2 W{} H{} F{}:1 Ip A1:1 C444\n'.format(
+                frame.shape[1], frame.shape[0], self.fps).encode('ascii'))
+        elif frame.shape[:2] != self.size:
+            raise ValueError('frame of size {} in a video of size {}'.format(frame.shape[:2], self.size))
+        rgb: np.ndarray = frame.astype(np.float32)
+        r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+        planes: np.ndarray = np.stack([0.299 * r + 0.587 * g + 0.114 * b,
+                                       128 - 0.168736 * r - 0.331264 * g + 0.5 * b,
+                                       128 + 0.5 * r - 0.418688 * g - 0.081312 * b])
+        self.f.write(b'FRAME\n')
+        self.f.write(np.clip(np.rint(planes), 0, 255).astype(np.uint8).tobytes())
+
+
+def open_encoder(file_name: str, every: int = 1, scale: int = 1, **kwargs) -> FrameEncoder:
+    """Returns the encoder of a file from its extension (.y4m for a raw video, GIF otherwise)"""
+    if file_name.endswith('.y4m'):
+        return Y4mEncoder(file_name, every, scale, **kwargs)
+    return GifEncoder(file_name, every, scale, **kwargs)
+
+
+if __name__ == "__main__":
+    test_frame: np.ndarray = np.full((40, 60, 3), 255, dtype=np.uint8)
+    with open_encoder('test.gif', scale=2) as test_encoder:
+        for i in range(10):
+            test_frame[10:20, 5 * i:5 * i + 5] = (255, 0, 0)
+            test_encoder.write(test_frame)
+    print(test_encoder)
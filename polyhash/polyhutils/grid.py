@@ -4,69 +4,134 @@
 Creating the grid object from the information of the input file
 """
 
-from typing import List, Dict, Tuple, Set
+from typing import BinaryIO, List, Dict, Tuple, Set, Callable, Optional
 from robot import Robot
-from task import Task
+from task import Task, TaskPool
+from task_index import TaskIndex
+from simulation import Simulation
 from pathfinding import PathFinder
-from polyhio import input_parsing
+from reservations import ReservationTable
+from polyhio import input_parsing, open_output, write_moves
 from distances import manhattan
+from occupancy import ObstacleTracker
+from polyhlog import get_logger
+import contextlib
+import io
+import os
 import re
 
 
 __all__ = ['Grid']
 
+_logger = get_logger('grid')
 
-class Grid(set):
+
+class Grid(ObstacleTracker):
     """
     Set of points which constitute the obstacles
     Type : Set[Tuple[int,int]]
-    This object inherits the set object.
+    This object inherits the ObstacleTracker object (reference counted set of cells stored as a bytearray).
     """
 
-    def __init__(self, grid_file_name: str, robot_percent=1, task_limit=1, pathfinder=0.5):
-        """Grid initialisation"""
+    def __init__(self, grid_file_name: str, robot_percent=1, task_limit=1, pathfinder=0.5,
+                 distance_fields: bool = False, fields_memory: float = 256, nearest_tasks: int = 0,
+                 simulation: Optional[Simulation] = None, parsed_input: Optional[Tuple[List, List]] = None,
+                 planner: str = 'static', input_cache: Optional[str] = None, trace_file: Optional[str] = None):
+        """
+        Grid initialisation
+        simulation : state of the run (robots and tasks), a new one is created by default
+        parsed_input : result of input_parsing(grid_file_name), to avoid reading the file again
+        distance_fields : precomputes obstacle-aware distances (BFS from the mounting and assembly points)
+        used to sort the mounting points and to rank the tasks, instead of the manhattan distance.
+        fields_memory : memory cap of the distance fields, in MB
+        nearest_tasks : if not 0, robots first consider this number of tasks closest to their gripper,
+        found with a spatial index, before considering all the remaining tasks.
+        planner : 'static' (the planned paths of the other arms are obstacles, default), 'spacetime' (approximate
+        space-time search: the other arms reserve the cells of their planned paths, and a cell may be entered from
+        the step it is free for good, the gaps between two reservations are not used; it scores lower than 'static'
+        on d and e, see reservations)
+        input_cache : directory of the binary cache of the input files, None to always parse the input file
+        trace_file : binary file recording every step (moves, task events and periodic keyframes of the arms),
+        readable with step_trace.TraceReader; None to disable it
+        """
+        if planner not in ('static', 'spacetime'):
+            raise ValueError('planner \"{}\" not in {}'.format(planner, ['static', 'spacetime']))
 
-        set.__init__(self)
         # Keeping file name in memory for output
         pattern: str = r'/._'
         self.grid_name: str = re.findall(pattern, grid_file_name)[0][1]
         self.features: List = [robot_percent, task_limit, pathfinder]
 
+        self.simulation: Simulation = simulation if simulation is not None else Simulation()
+
         # Getting information of the grid
-        grid, tasks = input_parsing(grid_file_name)
+        grid, tasks = parsed_input if parsed_input is not None else input_parsing(grid_file_name, input_cache)
 
-        self.width, self.height = grid[0], grid[1]
+        ObstacleTracker.__init__(self, grid[0], grid[1])
         self.nb_robots: int = int(grid[2] * robot_percent)  # Maximum number of robots on the Grid
         self.step_nb: int = grid[3]  # maximum number of steps
         self.missions: List[List[Tuple[int, int]]] = tasks[1]  # list of missions (a mission = list of several points)
         self.scores_missions: List[int] = tasks[0]  # list of mission scores (in the same order as self.missions)
         self.mount_points: List[Tuple[int, int]] = grid[4]  # list containing the coordinates of the mounting points
 
-        print("Global tasks score: ", (sum(self.scores_missions)))
+        _logger.info('Global tasks score: %d', sum(self.scores_missions))
 
         # We add the coordinates of the mounting points as obstacles
         for point in self.mount_points:
             self.add(point)
 
-        print("Grid of {}x{}".format(self.width, self.height))
-        print("{} tasks, {} robots & {} mounting points.".format(len(self.missions), self.nb_robots,
-                                                                 len(self.mount_points)))
-        print('Possible mounting points: ', self.mount_points)
+        _logger.info('Grid of %dx%d', self.width, self.height)
+        _logger.info('%d tasks, %d robots & %d mounting points.', len(self.missions), self.nb_robots,
+                     len(self.mount_points))
+        _logger.debug('Possible mounting points: %s', self.mount_points)
 
-        self.finder = PathFinder(self, (self.width, self.height, self.step_nb), limit=pathfinder)
+        # Distances used to choose the tasks
+        self.fields = None
+        self.distance: Callable[[Tuple[int, int], Tuple[int, int]], Optional[int]] = manhattan
+        if distance_fields:
+            from distance_fields import DistanceFields
+            # Mounting points first, then the first assembly point of each task, then the other ones
+            sources: List[Tuple[int, int]] = self.mount_points + [mission[0] for mission in self.missions] + \
+                [point for mission in self.missions for point in mission[1:]]
+            self.fields = DistanceFields(self.width, self.height, self.mount_points, sources, fields_memory)
+            self.distance = self.fields.distance
+            _logger.info('%s', self.fields)
+
+        # The path finder shares the obstacles and is notified of their changes
+        self.pop_changes()
+        reservations: Optional[ReservationTable] = None
+        if planner == 'spacetime':
+            reservations = ReservationTable(self.width, self.height, self.mount_points)
+        self.finder = PathFinder(self, (self.width, self.height, self.step_nb), limit=pathfinder,
+                                 reservations=reservations)
 
         # Tasks initialisation
         for i in range(len(self.scores_missions)):
-            Task(self.missions[i], self.scores_missions[i])
+            Task(self.missions[i], self.scores_missions[i], self.simulation)
+        self.simulation.pool = TaskPool(self.simulation.registry.tasks, self.fields)
+        if nearest_tasks:
+            self.simulation.index = TaskIndex(self.width, self.height, self.simulation.remaining)
 
         # Robots initialisation
         self.sort_mount_points()
         self.robots: List = []
         for i in range(self.nb_robots):
-            self.robots.append(Robot(tuple(self.mount_points[i]), self.finder, self.height, self.width, task_limit=task_limit))
+            self.robots.append(Robot(tuple(self.mount_points[i]), self.finder, self.height, self.width, self.simulation,
+                                     task_limit=task_limit, nearest_tasks=nearest_tasks))
             # Update the obstacles
             self.update_obstacles()
 
+        self.trace = None
+        if trace_file is not None:
+            from step_trace import TraceWriter
+            self.trace = TraceWriter(trace_file, self)
+
+    def __getstate__(self) -> Dict:
+        """State saved in a checkpoint: everything but the trace being written"""
+        state: Dict = self.__dict__.copy()
+        state['trace'] = None
+        return state
+
     def sort_mount_points(self) -> None:
         """
         Chooses the mounting points closest to the task to be carried out in order to optimize the robot's path.
@@ -76,9 +141,11 @@ class Grid(set):
         mount_points_value: List[int] = [0] * len(self.mount_points)
 
         # Calculating, for every task, which is the closest mounting point to their first assembly point
-        for i, task in enumerate(Task.remaining):
-            distances: List[Tuple[Tuple, int]] = [(mp, manhattan(mp, task.path[0])) for mp in self.mount_points]
-            distances.sort(key=lambda a: a[1])
+        for i, task in enumerate(self.simulation.remaining):
+            distances: List[Tuple[Tuple, Optional[int]]] = [(mp, self.distance(mp, task.path[0]))
+                                                            for mp in self.mount_points]
+            # Unreachable points come last
+            distances.sort(key=lambda a: a[1] if a[1] is not None else float('inf'))
             closest_mp: Tuple[int, int] = distances[0][0]  # closest mounting point to the 1st assembly pt of the task
             # counting for each mounting point the number of occurrences as the closest point to a task
             mount_points_value[self.mount_points.index(closest_mp)] += 1   
@@ -107,46 +174,77 @@ class Grid(set):
         # Decreasing the number of movements left
         self.finder.nb_movements -= 1
 
+        if self.trace is not None:
+            self.trace.record()
+
     def update_obstacles(self) -> None:
         """
-        Retrieves the positions of the arms in order to fill the obstacles for the next_round.
+        Applies the cells claimed and released by the robots since the last update
+        (their planned path and their arm are obstacles), then notifies the path finder of the changed cells.
         """
-        # One movement has passed so we have to update obstacles
-        self.clear()  # The set of obstacles is reset
-        self.update(self.mount_points)
         for robot in self.robots:
-            # adding points currently in the planned path of each robot or in their arm
-            for obstacles in robot.planned_path + robot.arm[1:]:
-                if obstacles not in self:
-                    self.add(obstacles)
+            claimed, released = robot.pop_obstacle_changes()
+            # Claims first: a released cell may have been claimed since the last update
+            self.claim(claimed)
+            self.release(released)
 
-        self.finder.update_obstacles(self)
+        self.finder.update_obstacles(self.pop_changes())
 
-    def compile_output(self, filename: str) -> None:
-        """Compiles the output file"""
+    def write_output(self, f: BinaryIO) -> int:
+        """
+        Writes the output to a binary file, robot after robot (the moves of each robot are written by blocks).
+        Returns the final score, computed along the way.
+        """
         final_score: int = 0
         # Number of robotic arms used
         active_robots: List[Robot] = [robot for robot in self.robots if len(robot.tasks_performed) > 0]
-        txt: str = str(len(active_robots))
+        f.write(str(len(active_robots)).encode())
         for r in active_robots:
-            # Mounting point of the arm
-            txt += '\n' + str(r.arm[0][0]) + ' ' + str(r.arm[0][1]) + ' '
-            # Number of tasks, number of movements
-            txt += str(len(r.tasks_performed)) + ' ' + str(len(Robot.memory_paths[r.id])) + '\n'
+            moves: bytearray = self.simulation.memory_paths[r.id]
+            # Mounting point of the arm, number of tasks, number of movements
+            f.write('\n{} {} {} {}\n'.format(r.arm[0][0], r.arm[0][1], len(r.tasks_performed), len(moves)).encode())
             # Tasks performed
-            txt += ' '.join([str(t.id) for t in r.tasks_performed])
+            f.write(' '.join([str(t.id) for t in r.tasks_performed]).encode())
 
             for t in r.tasks_performed:
                 final_score += t.score
 
-            txt += '\n' + str(" ".join(Robot.memory_paths[r.id]))
+            f.write(b'\n')
+            write_moves(f, moves)
+
+        return final_score
+
+    def output(self) -> Tuple[str, int]:
+        """Returns the content of the output file and the final score"""
+        buffer: io.BytesIO = io.BytesIO()
+        final_score: int = self.write_output(buffer)
+        return buffer.getvalue().decode('ascii'), final_score
 
+    def output_filename(self, filename: str, score: int) -> str:
+        """Returns the name of the output file"""
         # We decided to hardcode the simulation parameters in the file name.
-        filename = "{}_{}_{}_{}_{}_{}.txt".format(self.grid_name, *self.features, filename, final_score)
-        with open(filename, 'w') as f:
-            f.write(txt)
+        return "{}_{}_{}_{}_{}_{}.txt".format(self.grid_name, *self.features, filename, score)
+
+    def compile_output(self, filename: str, compress: bool = False) -> str:
+        """
+        Compiles the output file (gzip compressed if compress is True) and returns its name.
+        The file is written under a temporary name, then renamed once the score is known.
+        """
+        extension: str = '.gz' if compress else ''
+        temporary_name: str = '{}.{}.tmp'.format(self.output_filename(filename, 'partial'), os.getpid())
+        try:
+            with open_output(temporary_name, compress) as f:
+                final_score: int = self.write_output(f)
+        except BaseException:
+            # The file may not have been created (directory missing, no permission...)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temporary_name)
+            raise
+        output_name: str = self.output_filename(filename, final_score) + extension
+        os.replace(temporary_name, output_name)
 
-        print('Score = ', final_score)
+        _logger.info('Score = %d', final_score)
+        return output_name
 
 
 if __name__ == '__main__':
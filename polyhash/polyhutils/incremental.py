@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Creating the IncrementalSearch object, used by the incremental planner (D* Lite).
+A search belongs to a robot and a target: it goes backwards, from the target, and keeps its tree (g and rhs values
+of the cells, distances to the target) between two queries. When some cells of the obstacles change, when the arm
+moves or when the gripper starts from another cell, only the part of the tree depending on them is repaired, so that
+the cost of re-planning depends on the size of the change rather than on the size of the grid.
+
+Usage:
+# >>> search = IncrementalSearch(Occupancy(3, 3), (3, 3), [(0, 0)], (2, 2))
+# >>> search.compute(100)
+# [(0, 0), (1, 0), (2, 0), (2, 1), (2, 2)]
+"""
+
+from heapq import heappush, heappop
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from occupancy import Occupancy
+
+__all__ = ['IncrementalSearch']
+
+_INFINITY: float = float('inf')
+
+
+class IncrementalSearch:
+    """
+    Shortest paths from the cells of the grid to a target, kept up to date when the obstacles change.
+    Cells are identified by their flat index (y * width + x). The arm is part of the search: its cells can only
+    be entered by retracting (moving back along the arm, or along the trail given by the path finder).
+    """
+
+    def __init__(self, obstacles: Occupancy, size: Tuple[int, int], arm: List[Tuple[int, int]],
+                 target: Tuple[int, int]):
+        """
+        obstacles : occupancy of the grid, shared (the search must be told about its changes with update)
+        size : width and height of the grid
+        """
+        self.cells: bytearray = obstacles.cells
+        self.width, self.height = size
+        self.goal: int = target[1] * self.width + target[0]
+        # Cells of the arm, and moves (source, cell) going back along the arm (the only way to enter its cells)
+        cells: List[int] = [y * self.width + x for x, y in arm]
+        self.arm: Set[int] = set(cells)
+        self.retractions: Set[Tuple[int, int]] = set(zip(cells[1:], cells[:-1]))
+        self.start: int = cells[-1]
+        # Sum of the heuristic moves of the start, added to the keys instead of computing them again
+        self.km: int = 0
+        self.g: Dict[int, float] = dict()
+        self.rhs: Dict[int, float] = {self.goal: 0}
+        # Keys of the open cells, and heap of (key, cell) in which outdated entries are skipped
+        self.open: Dict[int, Tuple[float, float]] = dict()
+        self.heap: List[Tuple[Tuple[float, float], int]] = []
+        self._push(self.goal)
+        # Number of changes of the obstacles log already taken into account (see PathFinder)
+        self.seen: int = 0
+        self.expanded: int = 0
+
+    def _distance(self, a: int, b: int) -> int:
+        """Manhattan distance between two cells (consistent heuristic, so repaired paths stay the shortest ones)"""
+        return abs(a % self.width - b % self.width) + abs(a // self.width - b // self.width)
+
+    def _key(self, cell: int) -> Tuple[float, float]:
+        """Priority of a cell: estimated length of the path from the start through it, then distance to the target"""
+        g: float = min(self.g.get(cell, _INFINITY), self.rhs.get(cell, _INFINITY))
+        return g + self._distance(self.start, cell) + self.km, g
+
+    def _push(self, cell: int) -> None:
+        key: Tuple[float, float] = self._key(cell)
+        self.open[cell] = key
+        heappush(self.heap, (key, cell))
+
+    def _neighbours(self, cell: int) -> List[int]:
+        """Returns the cells sharing a side with a cell"""
+        x: int = cell % self.width
+        neighbours: List[int] = []
+        if x > 0:
+            neighbours.append(cell - 1)
+        if x < self.width - 1:
+            neighbours.append(cell + 1)
+        if cell >= self.width:
+            neighbours.append(cell - self.width)
+        if cell < (self.height - 1) * self.width:
+            neighbours.append(cell + self.width)
+        return neighbours
+
+    def _can_move(self, source: int, cell: int) -> bool:
+        """Checks whether the gripper can go from source to cell (cells of the arm: only by retracting)"""
+        if cell in self.arm:
+            return (source, cell) in self.retractions
+        return self.cells[cell] == 0
+
+    def _update_vertex(self, cell: int) -> None:
+        """Recomputes the rhs value of a cell from its neighbours and puts it in the open list if inconsistent"""
+        if cell != self.goal:
+            g: Dict[int, float] = self.g
+            rhs: float = _INFINITY
+            # A cell nobody can enter does not need its distance to the target (the start is on the arm)
+            if cell in self.arm or self.cells[cell] == 0:
+                for following in self._neighbours(cell):
+                    value: float = g.get(following, _INFINITY) + 1
+                    if value < rhs and self._can_move(cell, following):
+                        rhs = value
+            if rhs == _INFINITY:
+                self.rhs.pop(cell, None)
+            else:
+                self.rhs[cell] = rhs
+
+        self.open.pop(cell, None)
+        if self.g.get(cell, _INFINITY) != self.rhs.get(cell, _INFINITY):
+            self._push(cell)
+
+    def _changed(self, cells: Iterable[int]) -> None:
+        """Repairs the moves into and out of cells whose state changed"""
+        g: Dict[int, float] = self.g
+        for cell in cells:
+            neighbours: List[int] = self._neighbours(cell)
+            # Cells far from the tree cannot change it
+            if cell in g or cell in self.rhs or any(neighbour in g for neighbour in neighbours):
+                self._update_vertex(cell)
+                for neighbour in neighbours:
+                    self._update_vertex(neighbour)
+
+    def update(self, changes: Iterable[Tuple[int, int]]) -> None:
+        """Takes into account the cells whose state changed (the tree is repaired at the next computation)"""
+        self._changed({y * self.width + x for x, y in changes})
+
+    def move(self, arm: Iterable[Tuple[int, int]]) -> None:
+        """
+        Takes into account the new arm (or trail) of the robot: the gripper is the new start, and the cells
+        joining or leaving the arm, or whose retraction moves changed, are repaired at the next computation
+        """
+        cells: List[int] = [y * self.width + x for x, y in arm]
+        retractions: Set[Tuple[int, int]] = set(zip(cells[1:], cells[:-1]))
+        changed: Set[int] = self.arm.symmetric_difference(cells)
+        for pair in retractions.symmetric_difference(self.retractions):
+            changed.update(pair)
+        self.arm = set(cells)
+        self.retractions = retractions
+        if cells[-1] != self.start:
+            self.km += self._distance(self.start, cells[-1])
+            self.start = cells[-1]
+        self._changed(changed)
+
+    def compute(self, max_expanded: float) -> Optional[List[Tuple[int, int]]]:
+        """
+        Repairs the tree until the shortest path from the start is known, and returns it (start included).
+        An empty list is returned if there is no path, None if more than max_expanded cells had to be expanded
+        (the tree is then only partly repaired).
+        """
+        g: Dict[int, float] = self.g
+        rhs: Dict[int, float] = self.rhs
+        start: int = self.start
+        expanded: int = 0
+        while self.heap:
+            key, cell = self.heap[0]
+            if self.open.get(cell) != key:
+                # Outdated entry
+                heappop(self.heap)
+                continue
+            # The start does not need to be expanded once its distance is known (rhs), as A* stops on the target
+            if key >= self._key(start) and rhs.get(start, _INFINITY) <= g.get(start, _INFINITY):
+                break
+            heappop(self.heap)
+            current_key: Tuple[float, float] = self._key(cell)
+            if key < current_key:
+                # The start moved since the cell was pushed
+                self.open[cell] = current_key
+                heappush(self.heap, (current_key, cell))
+                continue
+            if expanded >= max_expanded:
+                self.open[cell] = key
+                heappush(self.heap, (key, cell))
+                self.expanded += expanded
+                return None
+
+            del self.open[cell]
+            expanded += 1
+            if g.get(cell, _INFINITY) > rhs.get(cell, _INFINITY):
+                g[cell] = rhs[cell]
+            else:
+                g.pop(cell, None)
+                self._update_vertex(cell)
+            for neighbour in self._neighbours(cell):
+                self._update_vertex(neighbour)
+
+        self.expanded += expanded
+        if rhs.get(start, _INFINITY) == _INFINITY:
+            return []
+        return self._retrace()
+
+    def _retrace(self) -> List[Tuple[int, int]]:
+        """
+        Goes from the start to the target, following the neighbours having the lowest g value.
+        Among equally short paths, the cells of the arm come first: the arm retracts rather than going around.
+        """
+        g: Dict[int, float] = self.g
+        cell: int = self.start
+        path: List[Tuple[int, int]] = [(cell % self.width, cell // self.width)]
+        while cell != self.goal:
+            cell = min((following for following in self._neighbours(cell) if self._can_move(cell, following)),
+                       key=lambda following: (g.get(following, _INFINITY), following not in self.arm))
+            path.append((cell % self.width, cell // self.width))
+        return path
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "IncrementalSearch from {} to {}: {} cells, {} expanded".format(
+            (self.start % self.width, self.start // self.width), (self.goal % self.width, self.goal // self.width),
+            len(self.g), self.expanded)
+
+
+if __name__ == "__main__":
+    obs: Occupancy = Occupancy(3, 3)
+    search: IncrementalSearch = IncrementalSearch(obs, (3, 3), [(0, 0)], (2, 2))
+    print(search.compute(100))
+    # A wall appears on the path: only the cells depending on it are updated
+    obs.add((1, 0))
+    search.update([(1, 0)])
+    print(search.compute(100), search)
+    # The gripper moved: the same search is reused from the new start
+    search.move([(0, 0), (0, 1)])
+    print(search.compute(100), search)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module measuring where the solver spends its time.
+Instrumentation wraps the expensive methods (path finding, obstacle updates, task choice and ranking) while it is
+enabled: every call is counted and timed, and the time spent in each method is kept per simulation step.
+The methods are replaced on their class only between enable() and disable(), so the solver runs its original
+code (at no cost) the rest of the time.
+profile_simulation runs a whole simulation under cProfile and dumps the statistics (.prof file, readable by
+pstats, snakeviz or flameprof to draw a flame graph).
+
+Usage:
+# >>> with Instrumentation() as instrumentation:
+# ...     grid = Grid('../../input/d_tight_schedule.txt', robot_percent=0.1)
+# ...     for _ in range(grid.step_nb):
+# ...         grid.move_robots()
+# >>> print(instrumentation)
+"""
+
+import cProfile
+import pstats
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+from grid import Grid
+from pathfinding import PathFinder
+from robot import Robot
+from task import TaskPool
+
+__all__ = ['Histogram', 'CallStats', 'Instrumentation', 'profile_simulation']
+
+# Searches of the path finder (static, space-time and incremental planners)
+SEARCHES: Tuple[str, ...] = ('_find_path', '_find_timed_path', '_find_incremental_path')
+# Instrumented methods: (class, name of the method), the methods of Grid are added to them
+TARGETS: List[Tuple[type, str]] = [(PathFinder, 'path')] + [(PathFinder, name) for name in SEARCHES] + \
+                                  [(Robot, 'get_task'), (TaskPool, 'rank')]
+
+
+class Histogram:
+    """Histogram with power of two buckets: bucket i counts the values v such that 2**(i-1) <= v < 2**i"""
+
+    def __init__(self):
+        self.buckets: List[int] = []
+
+    def add(self, value: int) -> None:
+        i: int = int(value).bit_length()
+        if i >= len(self.buckets):
+            self.buckets.extend([0] * (i + 1 - len(self.buckets)))
+        self.buckets[i] += 1
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return ', '.join('<{}: {}'.format(2**i, count) for i, count in enumerate(self.buckets) if count)
+
+
+class CallStats:
+    """Number of calls and time spent in a method, in total and for each step of the simulation"""
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.calls: int = 0
+        self.time: float = 0
+        self.max_time: float = 0
+        self.step_time: Dict[int, float] = dict()
+        self.step_calls: Dict[int, int] = dict()
+        # Only for the searches of the path finder: number of cells expanded by each call
+        self.expanded: Histogram = Histogram()
+
+    def add(self, duration: float, step: int) -> None:
+        self.calls += 1
+        self.time += duration
+        if duration > self.max_time:
+            self.max_time = duration
+        self.step_time[step] = self.step_time.get(step, 0) + duration
+        self.step_calls[step] = self.step_calls.get(step, 0) + 1
+
+    def step_histogram(self) -> Histogram:
+        """Histogram of the time spent in the method per step, in microseconds"""
+        histogram: Histogram = Histogram()
+        for duration in self.step_time.values():
+            histogram.add(duration * 1e6)
+        return histogram
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        text: str = "{}: {} calls, {:.3f} s (max {:.2f} ms), over {} steps".format(
+            self.name, self.calls, self.time, self.max_time * 1e3, len(self.step_time))
+        if self.calls:
+            text += "\n    time per step (us) {}".format(self.step_histogram())
+        if self.expanded.buckets:
+            text += "\n    cells expanded per call {}".format(self.expanded)
+        return text
+
+
+class Instrumentation:
+    """
+    Counts and times the calls of the TARGETS methods and of Grid.update_obstacles (time includes the nested
+    instrumented calls), and the time of each step (Grid.move_robots).
+    """
+
+    def __init__(self, targets: Optional[List[Tuple[type, str]]] = None, grid_class: type = Grid):
+        """
+        grid_class : class of the instrumented grid (the Grid class imported through the polyhutils package
+        when the solver is run from polyhmodel)
+        """
+        self.grid_class: type = grid_class
+        self.targets: List[Tuple[type, str]] = (TARGETS if targets is None else targets) + \
+            [(grid_class, 'update_obstacles')]
+        self.stats: Dict[str, CallStats] = {'{}.{}'.format(cls.__name__, name): CallStats(
+            '{}.{}'.format(cls.__name__, name)) for cls, name in self.targets}
+        self.steps: CallStats = CallStats('Grid.move_robots')
+        self.step: int = 0
+        self.originals: List[Tuple[type, str, Callable]] = []
+
+    def _wrap(self, function: Callable, stats: CallStats) -> Callable:
+        """Returns the instrumented version of a method"""
+        instrumentation: Instrumentation = self
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            t0: float = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.add(perf_counter() - t0, instrumentation.step)
+        return wrapper
+
+    def _wrap_search(self, function: Callable, stats: CallStats) -> Callable:
+        """Returns the instrumented version of a search of the path finder, which also records the cells it expanded"""
+        instrumentation: Instrumentation = self
+
+        @wraps(function)
+        def wrapper(finder: PathFinder, *args, **kwargs):
+            expanded: int = finder.nb_expanded
+            t0: float = perf_counter()
+            try:
+                return function(finder, *args, **kwargs)
+            finally:
+                stats.add(perf_counter() - t0, instrumentation.step)
+                if finder.last_search is not None:
+                    stats.expanded.add(len(finder.last_search[0]))
+                elif finder.searches is not None:
+                    # Incremental searches count the cells they expand themselves
+                    stats.expanded.add(finder.nb_expanded - expanded)
+        return wrapper
+
+    def _wrap_step(self, function: Callable) -> Callable:
+        """Returns the instrumented version of Grid.move_robots, which counts the steps"""
+        instrumentation: Instrumentation = self
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            t0: float = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                instrumentation.steps.add(perf_counter() - t0, instrumentation.step)
+                instrumentation.step += 1
+        return wrapper
+
+    def enable(self) -> None:
+        """Replaces the methods by their instrumented version"""
+        if self.originals:
+            return
+        for cls, name in self.targets:
+            function: Callable = cls.__dict__[name]
+            self.originals.append((cls, name, function))
+            stats: CallStats = self.stats['{}.{}'.format(cls.__name__, name)]
+            wrap = self._wrap_search if cls is PathFinder and name in SEARCHES else self._wrap
+            setattr(cls, name, wrap(function, stats))
+        function = self.grid_class.__dict__['move_robots']
+        self.originals.append((self.grid_class, 'move_robots', function))
+        self.grid_class.move_robots = self._wrap_step(function)
+
+    def disable(self) -> None:
+        """Restores the original methods"""
+        for cls, name, function in reversed(self.originals):
+            setattr(cls, name, function)
+        self.originals = []
+
+    def __enter__(self) -> 'Instrumentation':
+        self.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.disable()
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return '\n'.join([str(self.steps)] + [str(stats) for stats in self.stats.values()])
+
+
+def profile_simulation(grid_file: str, profile_file: str = 'solver.prof', **parameters) -> pstats.Stats:
+    """
+    Runs a whole simulation (Grid creation and moves) under cProfile, and dumps the statistics to profile_file.
+    parameters : parameters of Grid
+    """
+    profiler: cProfile.Profile = cProfile.Profile()
+    profiler.enable()
+    grid: Grid = Grid(grid_file, **parameters)
+    for _ in range(grid.step_nb):
+        grid.move_robots()
+    profiler.disable()
+    profiler.dump_stats(profile_file)
+    return pstats.Stats(profile_file)
+
+
+if __name__ == "__main__":
+    with Instrumentation() as instrumentation:
+        test_grid: Grid = Grid('../../input/d_tight_schedule.txt', robot_percent=0.1, task_limit=2, pathfinder=0.1)
+        for _ in range(test_grid.step_nb):
+            test_grid.move_robots()
+    print(instrumentation)
+    profile_simulation('../../input/d_tight_schedule.txt', robot_percent=0.1, task_limit=2,
+                       pathfinder=0.1).sort_stats('tottime').print_stats(5)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Creating the Occupancy object: a set of cells of the grid stored as a bytearray.
+Each cell (x, y) of a width x height grid owns the byte y * width + x, so a membership test
+is an index lookup instead of hashing a tuple.
+The ObstacleTracker object adds a reference count per cell, so that obstacles can be updated incrementally.
+"""
+
+from array import array
+from typing import Iterable, Iterator, List, Set, Tuple
+
+__all__ = ['Occupancy', 'ObstacleTracker']
+
+
+class Occupancy:
+    """
+    Set of points of a width x height grid.
+    Type : Set[Tuple[int,int]]
+    It offers the usual set methods (add, discard, update, clear, copy, in, len, iteration).
+    """
+
+    __hash__ = None
+
+    def __init__(self, width: int, height: int, cells: Iterable[Tuple[int, int]] = ()):
+        """Occupancy initialisation, every cell is free except the given ones"""
+        self.width: int = width
+        self.height: int = height
+        # One byte per cell, 1 when the cell is occupied
+        self.cells: bytearray = bytearray(width * height)
+        self._len: int = 0
+        self.update(cells)
+
+    def index(self, cell: Tuple[int, int]) -> int:
+        """Returns the flat index of a cell"""
+        return cell[1] * self.width + cell[0]
+
+    def add(self, cell: Tuple[int, int]) -> None:
+        """Marks a cell as occupied"""
+        i: int = cell[1] * self.width + cell[0]
+        if not self.cells[i]:
+            self.cells[i] = 1
+            self._len += 1
+
+    def discard(self, cell: Tuple[int, int]) -> None:
+        """Marks a cell as free"""
+        i: int = cell[1] * self.width + cell[0]
+        if self.cells[i]:
+            self.cells[i] = 0
+            self._len -= 1
+
+    def update(self, cells: Iterable[Tuple[int, int]]) -> None:
+        """Marks all the given cells as occupied"""
+        for cell in cells:
+            self.add(cell)
+
+    def clear(self) -> None:
+        """Every cell becomes free"""
+        self.cells[:] = bytes(len(self.cells))
+        self._len = 0
+
+    def copy(self) -> 'Occupancy':
+        """Returns an independent copy (always a plain Occupancy object)"""
+        other: Occupancy = Occupancy.__new__(Occupancy)
+        other.width, other.height = self.width, self.height
+        other.cells = bytearray(self.cells)
+        other._len = self._len
+        return other
+
+    def __contains__(self, cell: Tuple[int, int]) -> bool:
+        return 0 <= cell[0] < self.width and 0 <= cell[1] < self.height \
+            and self.cells[cell[1] * self.width + cell[0]] != 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        """Yields the occupied cells, row by row"""
+        find = self.cells.find
+        i: int = find(1)
+        while i != -1:
+            yield i % self.width, i // self.width
+            i = find(1, i + 1)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Occupancy):
+            return self.width == other.width and self.cells == other.cells
+        if isinstance(other, (set, frozenset)):
+            return len(other) == self._len and all(cell in self for cell in other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return "Occupancy({}x{}, {} cells)".format(self.width, self.height, self._len)
+
+
+class ObstacleTracker(Occupancy):
+    """
+    Occupancy whose cells are reference counted: a cell is occupied as long as at least one claim on it remains.
+    Cells are claimed and released incrementally, and the cells which became occupied or free are
+    kept until they are collected with pop_changes().
+    """
+
+    def __init__(self, width: int, height: int, cells: Iterable[Tuple[int, int]] = ()):
+        """Tracker initialisation, the given cells are claimed once"""
+        self.counts: array = array('I', [0]) * (width * height)
+        self._changes: Set[int] = set()
+        Occupancy.__init__(self, width, height, cells)
+
+    def claim(self, cells: Iterable[Tuple[int, int]]) -> None:
+        """Adds one reference to each given cell (a cell may be given several times)"""
+        counts, mask, changes, width = self.counts, self.cells, self._changes, self.width
+        for cell in cells:
+            i: int = cell[1] * width + cell[0]
+            counts[i] += 1
+            if counts[i] == 1:
+                mask[i] = 1
+                self._len += 1
+                if i in changes:
+                    changes.remove(i)
+                else:
+                    changes.add(i)
+
+    def release(self, cells: Iterable[Tuple[int, int]]) -> None:
+        """Removes one reference from each given cell, the cell becomes free when no reference is left"""
+        counts, mask, changes, width = self.counts, self.cells, self._changes, self.width
+        for cell in cells:
+            i: int = cell[1] * width + cell[0]
+            counts[i] -= 1
+            if counts[i] == 0:
+                mask[i] = 0
+                self._len -= 1
+                if i in changes:
+                    changes.remove(i)
+                else:
+                    changes.add(i)
+
+    def pop_changes(self) -> List[Tuple[int, int]]:
+        """Returns the cells whose state changed since the last call"""
+        changes: List[Tuple[int, int]] = [(i % self.width, i // self.width) for i in self._changes]
+        self._changes.clear()
+        return changes
+
+    def add(self, cell: Tuple[int, int]) -> None:
+        """Claims a free cell (set semantics: an occupied cell is left untouched)"""
+        if cell not in self:
+            self.claim([cell])
+
+    def discard(self, cell: Tuple[int, int]) -> None:
+        """Releases every reference of a cell"""
+        i: int = cell[1] * self.width + cell[0]
+        if self.counts[i]:
+            self.release([cell] * self.counts[i])
+
+    def clear(self) -> None:
+        """Every cell becomes free"""
+        self._changes.symmetric_difference_update(i for i, count in enumerate(self.counts) if count)
+        self.counts = array('I', [0]) * (self.width * self.height)
+        Occupancy.clear(self)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Creating the PathCache object, the memory of the PathFinder.
+Computed paths (or failures) are kept in a bounded LRU cache keyed by (mounting point, targets), one entry per key.
+The result of the searches only depends on the gripper and on the state of the cells they expanded and of their
+neighbours (region): every entry keeps the state of its region, and of the part of the arm going through it, and is
+used only if they did not change. A cell which changed and came back to its former state (an arm going by) does
+not invalidate the entry.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+__all__ = ['PathCache']
+
+
+def _search_holds(expanded: int, aborted: bool, threshold: float) -> bool:
+    """
+    Checks that a search which expanded a given number of cells stops at the same point
+    with a new maximum number of expanded cells (it depends on the number of walkable cells).
+    """
+    if aborted:
+        return expanded >= threshold and (expanded == 0 or expanded - 1 < threshold)
+    return expanded == 0 or expanded - 1 < threshold
+
+
+class PathCache:
+    """
+    LRU cache of the paths computed by the PathFinder.
+    Regions are arrays of flat indexes (y * width + x), their state is the bytes of the occupancy at these indexes.
+    """
+
+    def __init__(self, width: int, size: int = 64):
+        """Cache initialisation with the width of the grid and the maximal number of entries"""
+        self.width: int = width
+        self.size: int = size
+        # key -> (path, searches, region, state of the region, part of the arm in the region),
+        # searches being (expanded cells count, aborted) pairs, region the sorted flat indexes of the cells
+        self.entries: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def _arm_part(self, arm: Sequence[Tuple[int, int]], region: np.ndarray) -> Tuple:
+        """
+        Part of the arm the searches depend on: the gripper, the cells of the arm in the region, and the pairs of
+        consecutive cells of the arm in the region (they tell which moves are retractions)
+        """
+        width: int = self.width
+        cells: np.ndarray = np.array([y * width + x for x, y in arm], dtype=np.int64)
+        inside: np.ndarray = np.zeros(len(cells), dtype=bool)
+        if len(region):
+            inside = region[np.minimum(np.searchsorted(region, cells), len(region) - 1)] == cells
+        links: np.ndarray = np.stack([cells[:-1], cells[1:]], axis=1)[inside[:-1] & inside[1:]]
+        return int(cells[-1]), frozenset(cells[inside].tolist()), frozenset(map(tuple, links.tolist()))
+
+    def get(self, key: Hashable, arm: Sequence[Tuple[int, int]], threshold: float,
+            cells: bytearray) -> Optional[List[Tuple[int, int]]]:
+        """
+        Returns the cached path (an empty list for a failure) or None if there is no valid entry.
+        arm : current arm of the robot
+        threshold is the maximum number of cells a search may currently expand.
+        cells : current occupancy of the grid (one byte per cell)
+        """
+        entry = self.entries.get(key)
+        if entry is None or not all(_search_holds(expanded, aborted, threshold) for expanded, aborted in entry[1]) \
+                or np.frombuffer(cells, dtype=np.uint8)[entry[2]].tobytes() != entry[3] \
+                or self._arm_part(arm, entry[2]) != entry[4]:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, arm: Sequence[Tuple[int, int]], path: List[Tuple[int, int]],
+            searches: List[Tuple[int, bool]], expanded_cells: Iterable[Tuple[int, int]], cells: bytearray) -> None:
+        """
+        Stores the result of a path computation along with the state of the cells its searches depended on
+        (expanded cells and their neighbours)
+        """
+        if key in self.entries:
+            del self.entries[key]
+        elif len(self.entries) >= self.size:
+            # The least recently used entry is evicted
+            self.entries.popitem(last=False)
+
+        width: int = self.width
+        expanded: np.ndarray = np.array([y * width + x for x, y in expanded_cells], dtype=np.int64)
+        # Neighbours are taken without boundary checks on the sides: a few more cells only make the check stricter
+        region: np.ndarray = np.unique(np.concatenate([expanded, expanded - 1, expanded + 1,
+                                                       expanded - width, expanded + width]))
+        region = region[(region >= 0) & (region < len(cells))].astype(np.int32)
+        state: bytes = np.frombuffer(cells, dtype=np.uint8)[region].tobytes()
+        self.entries[key] = (path, searches, region, state, self._arm_part(arm, region))
+
+    def clear(self) -> None:
+        """Removes every entry (counters are kept)"""
+        self.entries.clear()
+
+    def __getstate__(self) -> Dict:
+        """State saved in a checkpoint: the entries are left out (a search gives the same result), not the counters"""
+        state: Dict = self.__dict__.copy()
+        state['entries'] = OrderedDict()
+        return state
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "PathCache: {} hits, {} misses, {}/{} entries".format(self.hits, self.misses,
+                                                                    len(self.entries), self.size)
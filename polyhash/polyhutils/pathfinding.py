@@ -1,11 +1,24 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # Largely inspired by https://github.com/hbock-42/Pathfinder-AStar/
-from typing import List, Tuple, Set, Dict
+from collections import OrderedDict
+from heapq import heappush, heappop
+from typing import Iterable, List, Tuple, Set, Dict, Optional
+from arm import Trail
+from occupancy import Occupancy
+from path_cache import PathCache
+from incremental import IncrementalSearch
+from reservations import ReservationTable, INFINITY
+from polyhlog import get_logger
 
 
 __all__ = ['PathFinder']
 
+_logger = get_logger('pathfinding')
+
+# States of the cells during an A* search
+_NEW, _OPEN, _CLOSED = 0, 1, 2
+
 
 def _distance(start: Tuple[int, int], target: Tuple[int, int]) -> int:
     """Computes the distance between two points using the Manhattan distance"""
@@ -17,40 +30,19 @@ def _heuristic(start: Tuple[int, int], target: Tuple[int, int]) -> int:
     return _distance(start, target)
 
 
-def _get_node_with_best_f_score(open_set: Set[Tuple[int, int]], f_score: Dict[int, float]) -> Tuple[int, int]:
-    """Returns the cell having the lowest score"""
-    return min(open_set, key=lambda a: f_score[hash(a)])
-
-
-def _is_sublist_in_list(array: List, subarray: List) -> bool:
-    """
-    Checks if a list is contained in another.
-    Exemple:
-    >>> _is_sublist_in_list([1, 2, 3, 4, 5, 6, 7], [3, 4, 5])
-    True
-    >>> _is_sublist_in_list([1, 2, 3, 4, 5, 6, 7], [4, 3])
-    False
-    """
-    for i in range(len(array) - len(subarray) + 1):
-        if subarray == [array[z] for z in range(i, i + len(subarray))]:
-            return True
-    return False
-
-
-def _is_wall(obstacles, arm, parent: Tuple[int, int], cell: Tuple[int, int]) -> bool:
+def _is_wall(obstacles: Occupancy, arm: Trail, parent: Tuple[int, int], cell: Tuple[int, int]) -> bool:
     """
     Checks whether a given cell is a wall or not.
     If it is defined as a wall, it may as well be its own arm.
     If so, The movement may be allowed if it has retracted enough : retracting is allowed, but
-    crossing its own arm is definitely not. This is where we used _is_sublist_in_list
+    crossing its own arm is definitely not (the consecutive cells of the trail tell both apart).
+    The cell must be inside the grid: the obstacles are read directly from the occupancy bytes.
     """
-    # print(arm, cell, parent)
     if cell in arm:
-        # If the parent is not in the arm, then it is a wall
-        piece_of_arm = [cell, parent]
-        return not _is_sublist_in_list(arm, piece_of_arm)
+        # If the parent does not follow the cell in the trail, then it is a wall
+        return not arm.is_retraction(parent, cell)
 
-    return cell in obstacles
+    return obstacles.cells[cell[1] * obstacles.width + cell[0]] != 0
 
 
 def _is_inside(size: Tuple[int, int], cell: Tuple[int, int]) -> bool:
@@ -63,21 +55,38 @@ def _is_inside(size: Tuple[int, int], cell: Tuple[int, int]) -> bool:
     return True
 
 
-def _check_neighbours(obstacles, size, arm: List[Tuple[int, int]], cell: Tuple[int, int], neigh: List) -> List:
+def _check_neighbours(obstacles: Occupancy, size, arm: Trail, cell: Tuple[int, int],
+                      neigh: List) -> List:
     """Uses previous functions to determine if a neighbour is walkable."""
     return [n for n in neigh if _is_inside(size, n) and not _is_wall(obstacles, arm, cell, n)]
 
 
-def _retrace_path(current, came_from, _hash_vector_table) -> List[Tuple[int, int]]:
+def _retrace_path(goal: int, origin: int, came_from: List[int], width: int) -> List[Tuple[int, int]]:
     """
-    Returns the actual path to follow. It starts from the end, and goes back up according to the relative parents.
+    Returns the actual path to follow. It starts from the end, and goes back up according to the relative parents
+    (cells are given by their flat index).
+    """
+    cell: int = goal
+    path: List[Tuple[int, int]] = [(goal % width, goal // width)]
+    while cell != origin:
+        cell = came_from[cell]
+        path.append((cell % width, cell // width))
+
+    return path[::-1]
+
+
+def _retrace_timed_path(current: Tuple[int, int], came_from: Dict[Tuple[int, int], Tuple[int, int]],
+                        arrival: Dict[Tuple[int, int], int]) -> List[Tuple[int, int]]:
+    """
+    Same as _retrace_path for the space-time search: the arm waits in a cell (the cell is repeated)
+    until the following cell is free.
     """
     cell: Tuple[int, int] = current
     path: List[Tuple[int, int]] = [cell]
-    while hash(cell) in came_from.keys():
-        parent_hash: str = came_from[hash(cell)]
-        cell: Tuple[int, int] = _hash_vector_table[parent_hash]
-        path.append(cell)
+    while cell in came_from:
+        parent: Tuple[int, int] = came_from[cell]
+        path.extend([parent] * (arrival[cell] - arrival[parent]))
+        cell = parent
 
     return path[::-1]
 
@@ -88,48 +97,117 @@ class PathFinder:
     a given grid to another.
     """
 
-    def __init__(self, obstacles: Set[Tuple[int, int]], size: Tuple[int, int, int], limit=1):
+    def __init__(self, obstacles: Occupancy, size: Tuple[int, int, int], limit=1, memory_size: int = 64,
+                 reservations: Optional[ReservationTable] = None, incremental: bool = False):
         """
         Only the grid is needed as a parameter.
+        The obstacles are shared with the grid: they are not copied.
+        memory_size is the maximum number of results kept in memory (one per mounting point and targets).
+        reservations : if given, paths are searched over space and time (space-time mode): the planned paths of
+        the other arms are not obstacles, a cell may be entered once the table says it is free.
+        incremental : if True, the searches of the last memory_size (robot, target) pairs are kept and repaired when
+        the obstacles or the arm change (D* Lite) instead of being computed again. Grid does not offer this mode:
+        it finds shortest paths instead of the paths of the weighted A*, and scores lower than the static mode on
+        every bundled input (e_dense_workspace: 815089 against 954278), while being slower on c_few_arms.
         """
-        self.obstacles: Set[Tuple[int, int]] = obstacles.copy()
+        self.obstacles: Occupancy = obstacles
         self.size: Tuple[int, int] = size[:2]
-        self.arm: List[Tuple[int, int]] = []
+        self.arm: Trail = Trail()
         self.nb_movements: int = size[2]
-        self.memory: List = []
+        self.memory: PathCache = PathCache(self.size[0], memory_size)
         self.limit: float = limit
-
-    def path(self, arm: List[Tuple[int, int]], targets: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        self.reservations: Optional[ReservationTable] = reservations
+        # Incremental mode: searches by (mounting point, target), and log of the changed cells they have not seen yet
+        self.searches: Optional[OrderedDict] = OrderedDict() if incremental else None
+        self.memory_size: int = memory_size
+        self.changes: List[Tuple[int, int]] = []
+        # Cells expanded by the last A* search, and whether it was stopped by the limit
+        self.last_search: Optional[Tuple[Set[Tuple[int, int]], bool]] = None
+        # Number of searches run (memory misses) and of cells they expanded
+        self.nb_searches: int = 0
+        self.nb_expanded: int = 0
+
+    def path(self, arm: Iterable[Tuple[int, int]], targets: List[Tuple[int, int]],
+             start_time: int = 0) -> List[Tuple[int, int]]:
         """
         Returns the list of coordinates linking start to target
+        start_time : step at which the first move of the path is made (only used in space-time mode)
+        From the second target on, the path already computed is part of the arm (see Trail): the cells it goes
+        through are still held by the arm on the grid.
         """
-        # Checking the memory
-        selection = [m for m in self.memory if m[0] == arm and m[1] == targets]
-        if selection:
-            print('PATHFINDER: Used memory')
-            return selection[0][2]
-
-        self.arm: List[Tuple[int, int]] = arm
+        # Checking the memory (space-time paths depend on the time, incremental searches are their own memory)
+        arm = tuple(arm)
+        key: Tuple[Tuple[int, int], Tuple] = (arm[0], tuple(targets))
+        max_expanded: float = self.limit * (self.size[0]*self.size[1] - len(self.obstacles))
+        use_memory: bool = self.reservations is None and self.searches is None
+        memorised: Optional[List[Tuple[int, int]]] = None
+        if use_memory:
+            memorised = self.memory.get(key, arm, max_expanded, self.obstacles.cells)
+        if memorised is not None:
+            _logger.debug('PATHFINDER: Used memory')
+            # The number of movements left may have decreased since the path was computed
+            return memorised.copy() if len(memorised) <= self.nb_movements else []
+
+        searches: List[Tuple[int, bool]] = []
+        expanded: Set[Tuple[int, int]] = set()
         computed_path: List = []
+        self.arm = Trail(arm)
         for target in targets:
-            self.arm: List[Tuple[int, int]] = arm + computed_path
-            current_path: List[Tuple] = self.find_path(arm + computed_path, target)
+            self.last_search = None
+            current_path: List[Tuple] = self.find_path(self.arm, target, start_time + len(computed_path))
             computed_path += current_path
+            self.arm.extend(current_path)
+
+            if self.last_search is not None:
+                searches.append((len(self.last_search[0]), self.last_search[1]))
+                expanded |= self.last_search[0]
+                self.nb_searches += 1
+                self.nb_expanded += len(self.last_search[0])
 
             if len(computed_path) > self.nb_movements or current_path == []:
-                return []
+                computed_path = []
+                break
 
-        self.memory.append([arm, targets, computed_path])
+        if use_memory:
+            self.memory.put(key, arm, computed_path.copy(), searches, expanded, self.obstacles.cells)
 
         return computed_path
 
-    def update_obstacles(self, obstacles: Set[Tuple[int, int]]) -> None:
-        """Resets the obstacles variables according to the value of obstacles"""
-        if self.obstacles != obstacles:
-            self.obstacles: Set[Tuple[int, int]] = obstacles.copy()
-            self.memory: List = []
-
-    def find_path(self, arm: List[Tuple[int, int]], target: Tuple[int, int]) -> List[Tuple[int, int]]:
+    def __getstate__(self) -> Dict:
+        """
+        State saved in a checkpoint: the cells expanded by the last search and the incremental searches (with the
+        log of changes they have not seen) are left out, the searches are started again when next used
+        """
+        state: Dict = self.__dict__.copy()
+        state['last_search'] = None
+        if self.searches is not None:
+            state['searches'] = OrderedDict()
+            state['changes'] = []
+        return state
+
+    def update_obstacles(self, changes: List[Tuple[int, int]]) -> None:
+        """
+        Takes into account the cells of the obstacles whose state changed (the memory checks the cells its paths
+        depend on when they are looked up, so only the incremental mode needs them).
+        In incremental mode, the changes are logged and given to each search when it is used again.
+        """
+        if self.searches is not None:
+            self.changes += changes
+            if len(self.changes) > self.size[0] * self.size[1]:
+                self._trim_changes()
+
+    def _trim_changes(self) -> None:
+        """Forgets the changes seen by every search, the searches being too far behind are dropped"""
+        limit: int = len(self.changes) - self.size[0] * self.size[1] // 2
+        for key in [key for key, search in self.searches.items() if search.seen < limit]:
+            del self.searches[key]
+        seen: int = min((search.seen for search in self.searches.values()), default=len(self.changes))
+        del self.changes[:seen]
+        for search in self.searches.values():
+            search.seen -= seen
+
+    def find_path(self, arm: Trail, target: Tuple[int, int],
+                  start_time: int = 0) -> List[Tuple[int, int]]:
         """
         Returns the path from the end of the arm to the target.
         If there isn't any path, an empty list is returned.
@@ -139,84 +217,220 @@ class PathFinder:
         if start == target:
             return [start]
 
-        path = self._find_path(start, target)
+        if self.reservations is not None:
+            path = self._find_timed_path(start, target, start_time)
+        elif self.searches is not None:
+            path = self._find_incremental_path(start, target)
+        else:
+            path = self._find_path(start, target)
 
         return path[1:]
 
     def _find_path(self, start: Tuple[int, int], end: Tuple[int, int]) -> List[Tuple[int, int]]:
         """
         Actual implementation of the A* algorithm.
+        Cells are identified by their flat index (y * width + x): their state, parent and scores are kept in lists
+        covering the grid.
+        Open cells are grouped in buckets sharing the same f score, and a binary heap holds the f scores
+        of the buckets (emptied buckets are only dropped when they reach the top of the heap).
+        The next cell is the first cell of the open set belonging to the best bucket: ties are thus broken
+        in the iteration order of the open set, exactly as a linear min() over the open set would do. This order
+        depends on the hashes of the (x, y) tuples, which is why the open set and the buckets hold tuples.
         """
-        # Initiating the various variables needed
-        # Hash table is used to create a correspondence between two hashes.
-        # Rather than storing tuples, we store their hash representation.
-        _hash_vector_table: Dict[int, Tuple[int, int]] = dict()
-
-        closed_set: Set[Tuple[int, int]] = set()
+        width, height = self.size
+        obstacles: bytearray = self.obstacles.cells
+        # Cells of the trail, and pairs of consecutive cells (cell, next cell) of the trail
+        trail: Set[int] = {y*width + x for x, y in self.arm.members}
+        links: Set[Tuple[int, int]] = {(a[1]*width + a[0], b[1]*width + b[0]) for a, b in self.arm.links}
+        end_x, end_y = end
+        goal: int = end_y*width + end_x
+        origin: int = start[1]*width + start[0]
+
+        # State (_NEW, _OPEN or _CLOSED), parent, g & f scores of each cell
+        state: bytearray = bytearray(width*height)
+        came_from: List[int] = [0] * (width*height)
+        g_score: List[int] = [0] * (width*height)
+        f_score: List[int] = [0] * (width*height)
+        closed: List[int] = []
         open_set: Set[Tuple[int, int]] = {start}
+        state[origin] = _OPEN
+        f_score[origin] = _heuristic(start, end)
 
-        # Dictionary linking cells to their parents.
-        came_from: Dict[int, int] = dict()
-
-        # Dictionaries storing g & f scores of each cell
-        g_score: Dict[int, float] = dict()
-        f_score: Dict[int, float] = dict()
-
-        g_score[hash(start)] = 0
-        f_score[hash(start)] = _heuristic(start, end)
-
-        _hash_vector_table[hash(start)] = start
+        # Open cells grouped by f score, and heap of the f scores having a bucket
+        buckets: Dict[int, Set[Tuple[int, int]]] = {f_score[origin]: {start}}
+        f_heap: List[int] = [f_score[origin]]
 
         # Computing number of walkable cells
-        walkable_cells = self.size[0]*self.size[1] - len(self.obstacles)
+        walkable_cells = width*height - len(self.obstacles)
 
         while len(open_set) > 0:
             # We always get the cell having the lowest score overall
-            current: Tuple[int, int] = _get_node_with_best_f_score(open_set, f_score)
-
-            if current == end:
+            best_bucket: Set[Tuple[int, int]] = buckets[f_heap[0]]
+            while not best_bucket:
+                del buckets[heappop(f_heap)]
+                best_bucket = buckets[f_heap[0]]
+            current: Tuple[int, int] = next(filter(best_bucket.__contains__, open_set))
+            x, y = current
+            cell: int = y*width + x
+
+            if cell == goal:
                 # Path found, we retrace our steps
-                # percentage = len(closed_set) * 100 / walkable_cells
-                # if percentage > 10:
-                #     print('Examined {} percent of the map.'.format(round(percentage, 2)))
-                return _retrace_path(current, came_from, _hash_vector_table)
+                self.last_search = ({(c % width, c // width) for c in closed}, False)
+                return _retrace_path(goal, origin, came_from, width)
 
             # Stopping condition: if more than self.limit % cells have been explored.
-            if len(closed_set) >= self.limit * walkable_cells:
+            if len(closed) >= self.limit * walkable_cells:
+                self.last_search = ({(c % width, c // width) for c in closed}, True)
                 return []
 
             open_set.remove(current)
-            closed_set.add(current)
+            best_bucket.remove(current)
+            state[cell] = _CLOSED
+            closed.append(cell)
+
+            tentative_g_score: int = g_score[cell] + 1
+            # Same order as get_neighbours: the order in which cells are opened changes the order of the open set
+            for neighbour, nx, ny in ((cell - 1, x - 1, y), (cell + 1, x + 1, y),
+                                      (cell + width, x, y + 1), (cell - width, x, y - 1)):
+                # If the neighbour is outside of the grid or considered as closed, we skip the next part
+                if not (0 <= nx < width and 0 <= ny < height) or state[neighbour] == _CLOSED:
+                    continue
 
-            for neighbour in self.get_neighbours(current):
-                # If the neighbour is considered as closed, we skip the next part
-                if neighbour in closed_set:
+                # The trail may only be entered by retracting, and its weight is lower: we first go down the arm.
+                if neighbour in trail:
+                    if (neighbour, cell) not in links:
+                        continue
+                    weight: int = 1
+                elif obstacles[neighbour]:
+                    continue
+                else:
+                    weight = 2
+
+                if state[neighbour] == _NEW:
+                    state[neighbour] = _OPEN
+                    open_set.add((nx, ny))
+                elif tentative_g_score >= g_score[neighbour]:
+                    # If it is more expensive to go to that cell from the current one than before, we continue.
                     continue
+                else:
+                    # The cell leaves its former bucket
+                    buckets[f_score[neighbour]].remove((nx, ny))
 
-                if neighbour not in open_set:
-                    open_set.add(neighbour)
+                # If it cheaper to go to that cell from the current one, we update both scores.
+                came_from[neighbour] = cell
+                g_score[neighbour] = tentative_g_score
+                f: int = tentative_g_score + weight * (abs(nx - end_x) + abs(ny - end_y))
+                f_score[neighbour] = f
+
+                bucket: Optional[Set[Tuple[int, int]]] = buckets.get(f)
+                if bucket is None:
+                    buckets[f] = {(nx, ny)}
+                    heappush(f_heap, f)
+                else:
+                    bucket.add((nx, ny))
+
+        self.last_search = ({(c % width, c // width) for c in closed}, False)
+        return []
 
-                # If it has not been explored yet, we had it to the tables.
-                if hash(neighbour) not in g_score.keys():
-                    g_score[hash(neighbour)] = float('inf')
-                    _hash_vector_table[hash(neighbour)] = neighbour
+    def _find_timed_path(self, start: Tuple[int, int], end: Tuple[int, int],
+                         start_time: int) -> List[Tuple[int, int]]:
+        """
+        Space-time version of the A* algorithm, against the reservation table.
+        The score of a cell is the earliest step the gripper can reach it: a cell held by another arm can be entered
+        from the step it is free for good, the arm waiting in its current cell until then.
+        Since a free cell stays free, reaching a cell earlier is never worse, and keeping the earliest arrival
+        in each cell is enough: this is not a full search over (x, y, t), a cell free between two reservations
+        is not used (see ReservationTable).
+        """
+        width, height = self.size
+        free_from = self.reservations.free_from
+        arm: Trail = self.arm
+        closed_set: Set[Tuple[int, int]] = set()
+        came_from: Dict[Tuple[int, int], Tuple[int, int]] = dict()
+        # Number of steps needed to reach each cell
+        arrival: Dict[Tuple[int, int], int] = {start: 0}
+        # Heap of (f score, insertion order, cell), outdated entries are skipped
+        counter: int = 0
+        open_heap: List[Tuple[int, int, Tuple[int, int]]] = [(_heuristic(start, end), counter, start)]
+
+        walkable_cells = width*height - len(self.obstacles)
+
+        while open_heap:
+            current: Tuple[int, int] = heappop(open_heap)[2]
+            if current in closed_set:
+                continue
+
+            if current == end:
+                self.last_search = (closed_set, False)
+                return _retrace_timed_path(current, came_from, arrival)
 
-                # If it is more expensive to go to that cell from the current one than before, we continue.
-                tentative_g_score: float = g_score[hash(current)] + _distance(current, neighbour)
-                if tentative_g_score >= g_score[hash(neighbour)]:
+            if len(closed_set) >= self.limit * walkable_cells:
+                self.last_search = (closed_set, True)
+                return []
+
+            closed_set.add(current)
+
+            x, y = current
+            for neighbour in ((x - 1, y), (x + 1, y), (x, y + 1), (x, y - 1)):
+                if neighbour in closed_set or not (0 <= neighbour[0] < width and 0 <= neighbour[1] < height):
                     continue
 
-                # If it cheaper to go to that cell from the current one, we update both scores.
-                came_from[hash(neighbour)] = hash(current)
-                g_score[hash(neighbour)] = tentative_g_score
-                weight: int = 2
+                if neighbour in arm:
+                    # Retracting is allowed, crossing its own arm is not
+                    if not arm.is_retraction(current, neighbour):
+                        continue
+                    step: int = arrival[current] + 1
+                else:
+                    free: int = free_from[neighbour[1]*width + neighbour[0]]
+                    if free >= INFINITY:
+                        continue
+                    # The move to the cell reached in step steps is made at start_time + step - 1
+                    step = max(arrival[current] + 1, free - start_time + 1)
+
+                if step >= arrival.get(neighbour, INFINITY):
+                    continue
+
+                came_from[neighbour] = current
+                arrival[neighbour] = step
                 # If the neighbour is the arm, the weight is lower. this way, we first go down the arm.
-                if neighbour in self.arm:
-                    weight: int = 1
-                f_score[hash(neighbour)] = g_score[hash(neighbour)] + weight * _heuristic(neighbour, end)
+                weight: int = 1 if neighbour in arm else 2
+                counter += 1
+                heappush(open_heap, (step + weight * _heuristic(neighbour, end), counter, neighbour))
 
+        self.last_search = (closed_set, False)
         return []
 
+    def _find_incremental_path(self, start: Tuple[int, int], end: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """
+        Incremental version of the A* algorithm: the search of a robot (identified by its mounting point) towards
+        a target is reused, and only repaired according to the obstacles which changed and the moves of the arm
+        since it was last used.
+        The limit applies to each call: a search stopped by the limit is dropped, not resumed by the next call.
+        """
+        key: Tuple[Tuple[int, int], Tuple[int, int]] = (self.arm[0], end)
+        search: Optional[IncrementalSearch] = self.searches.get(key)
+        if search is None:
+            search = IncrementalSearch(self.obstacles, self.size, self.arm, end)
+            self.searches[key] = search
+            if len(self.searches) > self.memory_size:
+                # The least recently used search is dropped
+                self.searches.popitem(last=False)
+        else:
+            self.searches.move_to_end(key)
+            search.move(self.arm)
+            search.update(self.changes[search.seen:])
+        search.seen = len(self.changes)
+
+        walkable_cells = self.size[0]*self.size[1] - len(self.obstacles)
+        expanded: int = search.expanded
+        path: Optional[List[Tuple[int, int]]] = search.compute(self.limit * walkable_cells)
+        self.nb_searches += 1
+        self.nb_expanded += search.expanded - expanded
+        if path is None:
+            del self.searches[key]
+            return []
+        return path
+
     def get_neighbours(self, cell: Tuple[int, int]) -> List[Tuple[int, int]]:
         """
         Returns the four neighbours of any given cell
@@ -227,7 +441,7 @@ class PathFinder:
 
 
 if __name__ == "__main__":
-    obs: Set = set()
+    obs: Occupancy = Occupancy(3, 3)
     finder: PathFinder = PathFinder(obs, (3, 3, 100))
 
     robot_arm: List[Tuple[int, int]] = [(0, 1), (0, 2)]
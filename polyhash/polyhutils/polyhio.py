@@ -4,44 +4,115 @@
 """
     Module handling inputs & outputs.
     Works on ASCII files.
+    The input file is read in one pass into an array of integers. Optionally, this array is kept in a
+    binary cache (.npz file), used again as long as the input file has the same modification time or content.
+    Output files are written as a stream (optionally compressed with gzip), moves being written by blocks.
 
     Usage:
     # >>> from polyhash import input_parsing
     # >>> grid, tasks = input_parsing('../../input/a_example.txt')
+    # >>> grid, tasks = input_parsing('../../input/a_example.txt', cache_dir=CACHE_DIR)
 """
 
-from typing import List, Tuple
+import gzip
+import hashlib
+import os
+from typing import BinaryIO, List, Optional, Tuple
+import numpy as np
 
-__all__ = ['input_parsing']  # add to this list all importable symbols
+__all__ = ['input_parsing', 'CACHE_DIR', 'open_output', 'write_moves']  # add to this list all importable symbols
 
+# Default directory of the binary cache of the input files
+CACHE_DIR: str = '.polyhcache'
 
-def input_parsing(data) -> Tuple[List, List]:
-    """Extracting all useful information for initializing the grid from a given input file (.txt)"""
-    with open(data, 'r') as f:
-        text_input: List[List[str]] = []
-        for line in f:
-            # Reading the file line by line
-            # We remove '\n' and we split according to spaces
-            line = line.replace('\n', '').split(' ')
-            text_input.append(line)
-        # turning all values into integer type
-        text_input: List[List[int]] = [[int(j) for j in i] for i in text_input]
+
+def _cache_file(data: str, cache_dir: str) -> str:
+    """Name of the cache of an input file (input files having the same name in different folders do not collide)"""
+    path_hash: str = hashlib.sha1(os.path.abspath(data).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, '{}.{}.npz'.format(os.path.basename(data), path_hash))
+
+
+def _cached_tokens(data: str, cache_dir: str) -> np.ndarray:
+    """
+    Returns the integers of an input file, from the cache if it is still valid.
+    The cache is valid if the modification time and the size of the file did not change, or else if
+    the hash of its content did not change.
+    """
+    stat: os.stat_result = os.stat(data)
+    cache_file: str = _cache_file(data, cache_dir)
+    cached_digest: Optional[np.ndarray] = None
+    if os.path.exists(cache_file):
+        with np.load(cache_file) as cached:
+            if cached['mtime'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+                return cached['tokens']
+            cached_digest, cached_tokens = cached['digest'], cached['tokens']
+
+    with open(data, 'rb') as f:
+        content: bytes = f.read()
+    digest: np.ndarray = np.frombuffer(hashlib.sha1(content).digest(), dtype=np.uint8)
+    if cached_digest is not None and np.array_equal(cached_digest, digest):
+        tokens: np.ndarray = cached_tokens
+    else:
+        tokens = np.fromstring(content, dtype=np.int64, sep=' ')
+
+    # Writing to a temporary file first: a concurrent run never reads a partial cache
+    os.makedirs(cache_dir, exist_ok=True)
+    temporary_file: str = '{}.{}.tmp'.format(cache_file, os.getpid())
+    with open(temporary_file, 'wb') as f:
+        np.savez(f, tokens=tokens, mtime=stat.st_mtime_ns, size=stat.st_size, digest=digest)
+    os.replace(temporary_file, cache_file)
+    return tokens
+
+
+def input_parsing(data, cache_dir: Optional[str] = None) -> Tuple[List, List]:
+    """
+    Extracting all useful information for initializing the grid from a given input file (.txt)
+    cache_dir : directory of the binary cache of the input files (CACHE_DIR for instance), None to disable it
+    """
+    if cache_dir is None:
+        # Every integer of the file at once (any whitespace separates them)
+        tokens: np.ndarray = np.fromfile(data, dtype=np.int64, sep=' ')
+    else:
+        tokens = _cached_tokens(data, cache_dir)
+    values: List[int] = tokens.tolist()
 
     # Collecting various information contained in the file
-    width, height, arms_nb, mount_points_nb, task_nb, step_nb = text_input[0]
-    mount_points: List = text_input[1:mount_points_nb+1]
-    mount_points: List = [tuple(a) for a in mount_points]
-    scores = [text_input[i][0] for i in range(mount_points_nb+1, len(text_input)-1, 2)]
+    width, height, arms_nb, mount_points_nb, task_nb, step_nb = values[:6]
+    i: int = 6
+    mount_points: List = list(zip(values[i:i + 2*mount_points_nb:2], values[i + 1:i + 2*mount_points_nb:2]))
+    i += 2 * mount_points_nb
 
-    # Creating a list of tuple assembly points
+    # Each task: its score, its number of assembly points and their coordinates
+    scores: List[int] = []
     assembly_points: List = []
-    for a in text_input[mount_points_nb+2:len(text_input):2]:
-        pts: List[Tuple[int, int]] = [(a[i], a[i+1]) for i in range(0, len(a) - 1, 2)]
-        assembly_points.append(pts)
+    for _ in range(task_nb):
+        score, points_nb = values[i:i + 2]
+        scores.append(score)
+        assembly_points.append(list(zip(values[i + 2:i + 2 + 2*points_nb:2], values[i + 3:i + 2 + 2*points_nb:2])))
+        i += 2 + 2 * points_nb
+    if i != len(values):
+        raise ValueError('{}: {} integers read, {} expected'.format(data, len(values), i))
 
     return [width, height, arms_nb, step_nb, mount_points], [scores, assembly_points]
 
 
+def open_output(file_name: str, compress: bool = False) -> BinaryIO:
+    """Opens an output file for writing (bytes), compressed with gzip if compress is True"""
+    if compress:
+        return gzip.open(file_name, 'wb')
+    return open(file_name, 'wb', buffering=1 << 16)
+
+
+def write_moves(f: BinaryIO, moves: bytes, block: int = 1 << 16) -> None:
+    """Writes moves (one byte each) separated by spaces, block moves at a time"""
+    for i in range(0, len(moves), block):
+        chunk: bytes = moves[i:i + block]
+        text: bytearray = bytearray(b' ') * (2 * len(chunk))
+        text[::2] = chunk
+        # The last move of the file is not followed by a space
+        f.write(text if i + block < len(moves) else text[:-1])
+
+
 if __name__ == "__main__":
     grid, tasks = input_parsing("../../input/a_example.txt")
     print(grid, tasks)
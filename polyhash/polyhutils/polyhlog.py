@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    Module handling the logs of the solver.
+    Every module logs through a child of the 'polyhash' logger with lazy formatting
+    (_logger.debug("Robot %d is moving in %s", robot_id, position)): nothing is formatted for disabled levels.
+    Logs are off until configure_logging() is called. Messages can also be kept as a JSON-lines event log,
+    written by blocks and without formatting the messages.
+
+    Usage:
+    # >>> from polyhlog import configure_logging
+    # >>> configure_logging(logging.INFO, events_file='events.jsonl')
+"""
+
+import json
+import logging
+import sys
+from typing import IO, List, Optional
+
+__all__ = ['configure_logging', 'close_logging', 'get_logger', 'JsonLinesHandler']
+
+LOGGER_NAME: str = 'polyhash'
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Returns the logger of a module of the solver"""
+    return logging.getLogger('{}.{}'.format(LOGGER_NAME, name))
+
+
+class JsonLinesHandler(logging.Handler):
+    """
+    Handler writing each record as a JSON object (one per line): time, level, logger, message template and arguments.
+    Messages are not formatted, and records are written by blocks of capacity lines.
+    """
+
+    def __init__(self, filename: str, capacity: int = 10000):
+        logging.Handler.__init__(self)
+        self.file: IO = open(filename, 'w')
+        self.capacity: int = capacity
+        self.buffer: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.buffer.append(json.dumps({'time': record.created, 'level': record.levelname,
+                                       'logger': record.name, 'msg': record.msg, 'args': record.args},
+                                      default=str))
+        if len(self.buffer) >= self.capacity:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.file.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+        logging.Handler.close(self)
+
+
+def close_logging() -> None:
+    """Closes the handlers of the solver logs (the event log is written) and disables the logs"""
+    logger: logging.Logger = logging.getLogger(LOGGER_NAME)
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+        handler.close()
+    logger.setLevel(logging.CRITICAL + 1)
+
+
+def configure_logging(level: Optional[int] = logging.INFO, stream: Optional[IO] = None,
+                      events_file: Optional[str] = None, events_level: int = logging.DEBUG,
+                      capacity: int = 10000) -> None:
+    """
+    level : level of the printed messages (logging.DEBUG shows every move of every robot), None to print nothing
+    stream : where messages are printed (sys.stdout by default)
+    events_file : name of the JSON-lines event log, None to disable it
+    events_level : level of the records kept in the event log
+    capacity : number of records kept in memory before being written to the event log
+    Previous handlers are closed, so this function can be called again to change the configuration.
+    """
+    close_logging()
+    logger: logging.Logger = logging.getLogger(LOGGER_NAME)
+    # Messages are not passed to the root logger
+    logger.propagate = False
+
+    levels: List[int] = []
+    if level is not None:
+        handler: logging.Handler = logging.StreamHandler(stream if stream is not None else sys.stdout)
+        handler.setLevel(level)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        levels.append(level)
+    if events_file is not None:
+        handler = JsonLinesHandler(events_file, capacity)
+        handler.setLevel(events_level)
+        logger.addHandler(handler)
+        levels.append(events_level)
+
+    # The logger drops the records no handler wants before they are created
+    logger.setLevel(min(levels) if levels else logging.CRITICAL + 1)
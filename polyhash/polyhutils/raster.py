@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module drawing the state of a simulation into a NumPy RGB array, without any window (headless).
+Every cell of the grid is drawn from a small tile, chosen by a code: the background of the cell (empty, assembly
+point, obstacle, mount point...) and the parts of an arm going through it (links to the neighbour cells of the arm,
+gripper). The tiles are computed once, and the code of every cell is kept between two frames.
+The SceneTracker follows the simulation and returns what changed since its previous call (a small delta, which can
+be sent to another process):
+- cells whose obstacle state changed (comparison of the obstacle bytearray of the grid with its previous copy),
+- end of the arms which changed (arms only change at their end, so only the end of each arm is compared),
+- new state of the tasks which changed (reached points, tasks completed or given up).
+The Rasterizer applies the deltas: it only recomputes the codes of the cells they touch, and only the cells whose
+code really changed are painted, with a single vectorized assignment.
+
+Display:
+mount points = light blue, mount points with an arm = dark blue,
+assembly points = yellow (red for the current tasks, green once reached),
+obstacles = brown, arm and gripper = black lines and black square
+
+Usage:
+# >>> tracker = SceneTracker(grid)
+# >>> raster = Rasterizer(*tracker.layout(), cell_size=10)
+# >>> frame = raster.apply(tracker.delta())  # (height * cell_size, width * cell_size, 3) array of uint8
+"""
+
+from itertools import islice
+from typing import Dict, List, Tuple, TYPE_CHECKING
+import numpy as np
+from task import NA, ACTIVE, DONE
+
+if TYPE_CHECKING:
+    from grid import Grid
+
+__all__ = ['SceneTracker', 'Rasterizer']
+
+# Background of the cells, by increasing priority
+EMPTY, ASSEMBLY, REACHED, TARGET, OBSTACLE, MOUNT, USED_MOUNT = range(7)
+COLORS: Tuple[Tuple[int, int, int], ...] = ((255, 255, 255), (255, 255, 0), (47, 147, 0), (255, 0, 0),
+                                            (185, 116, 85), (105, 123, 241), (20, 43, 188))
+GRID_COLOR: Tuple[int, int, int] = (128, 128, 128)
+
+# Arm layer: links of a cell to the previous and next cells of its arm, gripper, mount point of an arm
+RIGHT, UP, LEFT, DOWN, GRIPPER, BASE = 1, 2, 4, 8, 16, 32
+_LINKS: Dict[Tuple[int, int], int] = {(1, 0): RIGHT, (0, 1): UP, (-1, 0): LEFT, (0, -1): DOWN}
+# Number of arm variants of a tile (links and gripper)
+_VARIANTS: int = 32
+
+# Changes of a scene: cells whose obstacle state changed, changed end of the arms (index of the arm, index of the
+# first cell which changed, coordinates from this cell), new state of the tasks (id, status, remaining points)
+Delta = Tuple[np.ndarray, List[Tuple[int, int, np.ndarray]], List[Tuple[int, int, int]]]
+
+
+def _tiles(cell_size: int) -> np.ndarray:
+    """
+    Returns the tile of every code (background * _VARIANTS + arm variant), in image coordinates
+    (the first row of a tile is the top of the cell, i.e. its highest y).
+    """
+    c: int = cell_size
+    tiles: np.ndarray = np.empty((len(COLORS) * _VARIANTS, c, c, 3), dtype=np.uint8)
+    centers: np.ndarray = np.arange(c) + 0.5 - c / 2
+    disk: np.ndarray = centers[:, None]**2 + centers[None, :]**2 <= (c / 2)**2
+    width: int = max(c // 3, 1)
+    low: int = (c - width) // 2
+    high: int = low + width
+    for background, color in enumerate(COLORS):
+        tile: np.ndarray = np.empty((c, c, 3), dtype=np.uint8)
+        tile[:] = COLORS[EMPTY]
+        tile[0, :] = GRID_COLOR
+        tile[:, 0] = GRID_COLOR
+        if background in (MOUNT, USED_MOUNT):
+            tile[disk] = color
+        elif background == OBSTACLE:
+            tile[:] = color
+        elif background != EMPTY:
+            tile[1:, 1:] = color
+        for variant in range(_VARIANTS):
+            arm: np.ndarray = tiles[background * _VARIANTS + variant]
+            arm[:] = tile
+            if variant & (RIGHT | UP | LEFT | DOWN):
+                arm[low:high, low:high] = 0
+            if variant & RIGHT:
+                arm[low:high, low:] = 0
+            if variant & LEFT:
+                arm[low:high, :high] = 0
+            if variant & UP:
+                arm[:high, low:high] = 0
+            if variant & DOWN:
+                arm[low:, low:high] = 0
+            if variant & GRIPPER:
+                arm[1:, 1:] = 0
+    return tiles
+
+
+class SceneTracker:
+    """Follows the obstacles, the arms and the tasks of a simulation, and returns their changes"""
+
+    def __init__(self, grid: 'Grid'):
+        self.grid: 'Grid' = grid
+        # State returned by the previous delta
+        self.obstacles: np.ndarray = np.zeros(grid.width * grid.height, dtype=bool)
+        self.arms: List[np.ndarray] = []
+        self.tasks: Dict[int, int] = dict()
+        self.done: int = 0
+
+    def layout(self) -> Tuple[int, int, List[Tuple[int, int]], List[List[Tuple[int, int]]]]:
+        """Parts of the scene which never change: size of the grid, mount points, assembly points of the tasks"""
+        return self.grid.width, self.grid.height, list(self.grid.mount_points), \
+            [task.path for task in self.grid.simulation.registry.tasks]
+
+    def _arms(self) -> List[Tuple[int, int, np.ndarray]]:
+        changes: List[Tuple[int, int, np.ndarray]] = []
+        for i, arm in enumerate(self.grid.simulation.arms):
+            if i == len(self.arms):
+                self.arms.append(np.zeros(0, dtype=np.int32))
+            previous: np.ndarray = self.arms[i]
+            coords: np.ndarray = np.frombuffer(arm.coords, dtype=np.int32) if len(arm.coords) else \
+                np.zeros(0, dtype=np.int32)
+            n: int = min(len(previous), len(coords))
+            if len(previous) == len(coords) and np.array_equal(previous, coords):
+                continue
+            different: np.ndarray = np.flatnonzero(previous[:n] != coords[:n])
+            first: int = (different[0] if len(different) else n) // 2
+            self.arms[i] = coords.copy()
+            changes.append((i, first, self.arms[i][2 * first:]))
+        return changes
+
+    def _tasks(self) -> List[Tuple[int, int, int]]:
+        registry = self.grid.simulation.registry
+        changes: List[Tuple[int, int, int]] = []
+        for task in islice(registry.of_status(DONE), self.done, None):
+            self.tasks.pop(task.id, None)
+            changes.append((task.id, DONE, 0))
+            self.done += 1
+        for task in registry.of_status(ACTIVE):
+            remaining: int = len(task.target_points)
+            if self.tasks.get(task.id) != remaining:
+                self.tasks[task.id] = remaining
+                changes.append((task.id, ACTIVE, remaining))
+        for task_id in [task_id for task_id in self.tasks if registry.status[task_id] != ACTIVE]:
+            del self.tasks[task_id]
+            changes.append((task_id, NA, 0))
+        return changes
+
+    def delta(self) -> Delta:
+        """Changes of the scene since the previous call (everything on the first call)"""
+        obstacles: np.ndarray = np.frombuffer(self.grid.cells, dtype=np.uint8) != 0
+        changed: np.ndarray = np.flatnonzero(obstacles != self.obstacles).astype(np.int32)
+        self.obstacles = obstacles
+        return changed, self._arms(), self._tasks()
+
+
+class Rasterizer:
+    """RGB frame of a scene, updated cell by cell from the deltas of a SceneTracker"""
+
+    def __init__(self, width: int, height: int, mount_points: List[Tuple[int, int]],
+                 paths: List[List[Tuple[int, int]]], cell_size: int = 10):
+        """Parameters returned by SceneTracker.layout, then size of a cell in pixels"""
+        self.cell_size: int = cell_size
+        self.width: int = width
+        self.height: int = height
+        size: int = width * height
+        self.frame: np.ndarray = np.empty((height * cell_size, width * cell_size, 3), dtype=np.uint8)
+        # Cells (rows from the top of the image) and pixels of each cell
+        self._view: np.ndarray = self.frame.reshape(height, cell_size, width, cell_size, 3)
+        self._tiles: np.ndarray = _tiles(cell_size)
+        self.codes: np.ndarray = np.full(size, -1, dtype=np.int16)
+
+        # Layers, one value per cell (index y * width + x)
+        self.mounts: np.ndarray = np.zeros(size, dtype=bool)
+        for x, y in mount_points:
+            self.mounts[y * width + x] = True
+        self.paths: List[List[int]] = [[y * width + x for x, y in path] for path in paths]
+        self.assembly: np.ndarray = np.zeros(size, dtype=bool)
+        for path in self.paths:
+            self.assembly[path] = True
+        self.obstacles: np.ndarray = np.zeros(size, dtype=bool)
+        self.links: np.ndarray = np.zeros(size, dtype=np.uint8)
+        # Number of tasks having reached / still targeting each assembly point
+        self.reached: np.ndarray = np.zeros(size, dtype=np.int32)
+        self.targets: np.ndarray = np.zeros(size, dtype=np.int32)
+
+        # Scene drawn in the current frame: coordinates of every arm, (status, remaining points) of the tasks
+        self.arms: List[np.ndarray] = []
+        self.tasks: Dict[int, Tuple[int, int]] = dict()
+        self._dirty: List[np.ndarray] = [np.arange(size)]
+        self.frames: int = 0
+        self.painted: int = 0
+
+    def _task(self, task_id: int, sign: int, status: int, remaining: int) -> None:
+        """Adds (sign = 1) or removes (sign = -1) the assembly points of a task to the layers"""
+        cells: List[int] = self.paths[task_id]
+        nb_reached: int = len(cells) - remaining if status == ACTIVE else len(cells)
+        for i, cell in enumerate(cells):
+            if i < nb_reached:
+                self.reached[cell] += sign
+            else:
+                self.targets[cell] += sign
+        self._dirty.append(np.array(cells))
+
+    def _replace_arm(self, i: int, first: int, end: np.ndarray) -> int:
+        """
+        Replaces the end of an arm from its cell first and clears the links of the replaced cells.
+        Returns the index of the first cell whose links change (the cell before first gets new links).
+        """
+        while i >= len(self.arms):
+            self.arms.append(np.zeros(0, dtype=np.int32))
+        start: int = max(first - 1, 0)
+        old: np.ndarray = self.arms[i][2 * start:]
+        cleared: np.ndarray = old[1::2] * self.width + old[0::2]
+        self.links[cleared] = 0
+        self._dirty.append(cleared)
+        self.arms[i] = np.concatenate((self.arms[i][:2 * first], end))
+        return start
+
+    def _link_arm(self, i: int, start: int) -> None:
+        """Sets the links of the cells of an arm from its cell start"""
+        coords: np.ndarray = self.arms[i]
+        if len(coords) == 0:
+            return
+        xs: np.ndarray = coords[2 * start::2]
+        ys: np.ndarray = coords[2 * start + 1::2]
+        links: np.ndarray = np.zeros(len(xs), dtype=np.uint8)
+        # Link towards the previous cell of the arm
+        if start > 0:
+            links[0] |= _LINKS[(coords[2 * start - 2] - xs[0], coords[2 * start - 1] - ys[0])]
+        for (dx, dy), link in _LINKS.items():
+            # link towards the next cell of the arm, and the opposite link from the next cell
+            forward: np.ndarray = (xs[1:] - xs[:-1] == dx) & (ys[1:] - ys[:-1] == dy)
+            links[:-1][forward] |= link
+            links[1:][forward] |= _LINKS[(-dx, -dy)]
+        links[-1] |= GRIPPER
+        if start == 0:
+            links[0] |= BASE
+        cells: np.ndarray = ys * self.width + xs
+        self.links[cells] = links
+        self._dirty.append(cells)
+
+    def apply(self, delta: Delta) -> np.ndarray:
+        """Paints the cells changed by a delta, and returns the frame (rows from the top)"""
+        obstacles, arms, tasks = delta
+        self.obstacles[obstacles] ^= True
+        self._dirty.append(obstacles)
+        for task_id, status, remaining in tasks:
+            previous = self.tasks.pop(task_id, None)
+            if previous is not None:
+                self._task(task_id, -1, *previous)
+            if status != NA:
+                self._task(task_id, 1, status, remaining)
+                self.tasks[task_id] = (status, remaining)
+        # Cells freed by an arm may be taken by another one: every link is cleared before the new ones are set
+        starts: List[Tuple[int, int]] = [(i, self._replace_arm(i, first, end)) for i, first, end in arms]
+        for i, start in starts:
+            self._link_arm(i, start)
+        return self._paint()
+
+    def _paint(self) -> np.ndarray:
+        dirty: np.ndarray = np.unique(np.concatenate(self._dirty))
+        self._dirty = []
+        links: np.ndarray = self.links[dirty]
+        background: np.ndarray = np.select(
+            [links & BASE != 0, self.mounts[dirty], self.reached[dirty] > 0, self.targets[dirty] > 0,
+             self.obstacles[dirty], self.assembly[dirty]],
+            [USED_MOUNT, MOUNT, REACHED, TARGET, OBSTACLE, ASSEMBLY], EMPTY)
+        codes: np.ndarray = (background * _VARIANTS + (links & (_VARIANTS - 1))).astype(np.int16)
+        changed: np.ndarray = codes != self.codes[dirty]
+        cells: np.ndarray = dirty[changed]
+        self.codes[cells] = codes[changed]
+        # The image is flipped: y grows upwards
+        self._view[self.height - 1 - cells // self.width, :, cells % self.width] = self._tiles[codes[changed]]
+        self.frames += 1
+        self.painted = len(cells)
+        return self.frame
+
+    def image(self):
+        """PIL image of the current frame"""
+        from PIL import Image
+        return Image.fromarray(self.frame)
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "Rasterizer: {}x{} pixels, {} frames, {} cells painted in the last one".format(
+            self.frame.shape[1], self.frame.shape[0], self.frames, self.painted)
+
+
+if __name__ == "__main__":
+    from grid import Grid
+    test_grid: Grid = Grid('../../input/a_example.txt', robot_percent=1, task_limit=2, pathfinder=0.1)
+    tracker: SceneTracker = SceneTracker(test_grid)
+    raster: Rasterizer = Rasterizer(*tracker.layout(), cell_size=10)
+    raster.apply(tracker.delta())
+    for _ in range(test_grid.step_nb):
+        test_grid.move_robots()
+        raster.apply(tracker.delta())
+        print(raster)
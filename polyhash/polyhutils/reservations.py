@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Creating the ReservationTable object, used by the space-time planner.
+Every robot reserves the cells its arm will occupy while following its planned path: a cell is held from
+the step the gripper enters it until the step the arm retracts from it (forever if the arm is still on the
+cell at the end of the path). For each cell, the table only keeps the step from which it is free for good (end
+of its last reservation), so that the other robots can plan around where the arms will be instead of where they
+are now.
+This is an approximation of a search over (x, y, t): a cell is never entered before its last reservation ends, even
+if it is free for a while before (an arm could go through it and retract before the next arm comes). The arm being
+planned holds every cell it enters until it retracts from it, which the search does not know yet, so using such a
+gap would require searching over the retractions as well; the gaps between the reservations of a cell are lost. With
+robot_percent 0.1, task_limit 2 and pathfinder 0.1, the space-time planner scores 294004 on d_tight_schedule (341800
+with the static planner) and 900072 on e_dense_workspace (954278), the same on c_few_arms (255568) and a little more
+on b_single_arm (1070059 against 1069989, robot_percent 1) and f_decentralized (703350 against 689437). It is
+therefore not the default planner.
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+__all__ = ['ReservationTable', 'INFINITY']
+
+# Release step of the cells held until further notice (mounting points, cells of the arms at the end of their path)
+INFINITY: int = 2**62
+
+
+class ReservationTable:
+    """
+    Cells reserved by the robots, stored as the step from which each cell is free (0 if it is not reserved).
+    """
+
+    def __init__(self, width: int, height: int, walls: Iterable[Tuple[int, int]] = ()):
+        """Table initialisation, walls (the mounting points) are never free"""
+        self.width: int = width
+        self.height: int = height
+        self.free_from: array = array('q', [0]) * (width * height)
+        self.walls: bytearray = bytearray(width * height)
+        for x, y in walls:
+            self.walls[y * width + x] = 1
+            self.free_from[y * width + x] = INFINITY
+        # cell -> robot id -> release step, and robot id -> cells it holds
+        self.holders: Dict[int, Dict[int, int]] = dict()
+        self.reserved: Dict[int, List[int]] = dict()
+
+    def reserve(self, owner: int, arm: List[Tuple[int, int]], path: List[Tuple[int, int]], start: int) -> None:
+        """
+        Replaces the reservations of a robot by the cells of its arm and of its planned path.
+        start is the step at which the first position of the path is reached.
+        """
+        self.cancel(owner)
+
+        # The arm is replayed along the path: moving back to the previous cell of the arm is a retraction,
+        # staying in the same cell is a wait
+        width: int = self.width
+        stack: List[Tuple[int, int]] = list(arm)
+        release: Dict[int, int] = {y * width + x: INFINITY for x, y in stack}
+        for step, position in enumerate(path, start):
+            if position == stack[-1]:
+                continue
+            if len(stack) >= 2 and position == stack[-2]:
+                # Another arm may enter the cell from the next step on (robots move one after the other)
+                cell: Tuple[int, int] = stack.pop()
+                release[cell[1] * width + cell[0]] = step + 1
+            else:
+                stack.append(position)
+                release[position[1] * width + position[0]] = INFINITY
+
+        holders: Dict[int, Dict[int, int]] = self.holders
+        free_from: array = self.free_from
+        for i, end in release.items():
+            holders.setdefault(i, dict())[owner] = end
+            if end > free_from[i]:
+                free_from[i] = end
+        self.reserved[owner] = list(release)
+
+    def cancel(self, owner: int) -> None:
+        """Removes every reservation of a robot"""
+        holders: Dict[int, Dict[int, int]] = self.holders
+        for i in self.reserved.pop(owner, ()):
+            cell_holders: Dict[int, int] = holders[i]
+            end: int = cell_holders.pop(owner)
+            if not cell_holders:
+                del holders[i]
+            if end == self.free_from[i] and not self.walls[i]:
+                self.free_from[i] = max(cell_holders.values(), default=0)
+
+    def is_free(self, cell: Tuple[int, int], step: int) -> bool:
+        """Checks whether a cell can be entered at a given step (and kept afterwards)"""
+        return self.free_from[cell[1] * self.width + cell[0]] <= step
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "ReservationTable: {} robots holding {} cells".format(len(self.reserved), len(self.holders))
+
+
+if __name__ == "__main__":
+    table: ReservationTable = ReservationTable(4, 1, [(0, 0)])
+    # The arm mounted in (0, 0) goes to (2, 0) and comes back to (1, 0) at step 3
+    table.reserve(0, [(0, 0)], [(1, 0), (2, 0), (1, 0)], 1)
+    print(table, table.is_free((2, 0), 3), table.is_free((2, 0), 4))
@@ -5,99 +5,102 @@ Creating the Robot class defined by a position and an id (order of creation).
 This object has a method to move. A sub-method has also been added in order to keep
 track of the path covered by each robot.
 """
+from __future__ import annotations
 from polyhio import input_parsing
-from task import Task
-from typing import Tuple, List, Optional
+from task import Task, NA
+from typing import Tuple, List, Optional, TYPE_CHECKING
+import numpy as np
 from pathfinding import PathFinder
+from arm import Arm
+from polyhlog import get_logger
+
+if TYPE_CHECKING:
+    from simulation import Simulation
 
 __all__ = ['Robot']
 
+_logger = get_logger('robot')
+
 
 class Robot:
 
-    nb_robots: int = 0
-    arms: List[List[Tuple]] = []
-    next_position: List[Optional[Tuple]] = []
-    memory_paths: List[List[str]] = []
-    tasks: List[Task] = []
+    __slots__ = ('simulation', 'arm', 'id', 'tasks_performed', 'finder', 'planned_path', 'claimed', 'released',
+                 'g_height', 'g_width', 'max_wait_time', 'current_max_wait_time', 'wait_time', 'blocked_time',
+                 'nearest_tasks', 'task_limit', 'task')
 
-    def __init__(self, position: Tuple, finder: PathFinder, g_height: int, g_width: int, task_limit: float = 1.0):
+    def __init__(self, position: Tuple, finder: PathFinder, g_height: int, g_width: int, simulation: Simulation,
+                 task_limit: float = 1.0, nearest_tasks: int = 0):
         """
-        Defining a robot by its position and id.
+        Defining a robot by its position and id (order of creation in its simulation).
+        nearest_tasks : if not 0, the robot first looks for a task among this number of tasks closest to its gripper
+        (using the spatial index of the simulation), before considering all the remaining tasks.
         """
-        self.arm: List[Tuple[int, int]] = [position]
-        self.id: int = Robot.nb_robots
+        self.simulation: Simulation = simulation
+        self.arm: Arm = Arm([position])
+        self.id: int = simulation.nb_robots
         self.tasks_performed = []
         self.finder = finder
         self.planned_path = []
+        # Obstacle cells (planned path and arm) claimed and released since the last update of the grid
+        self.claimed: List[Tuple[int, int]] = []
+        self.released: List[Tuple[int, int]] = []
         self.g_height = g_height
         self.g_width = g_width
 
-        Robot.nb_robots += 1
-        Robot.arms.append([position])
-        Robot.next_position.append(None)
-        Robot.memory_paths.append([])
+        simulation.nb_robots += 1
+        simulation.arms.append(self.arm)
+        simulation.next_position.append(None)
+        simulation.memory_paths.append(bytearray())
 
         # Creating an internal timer to optimize global execution time
         self.max_wait_time: int = int(self.finder.nb_movements * 25/1000)
         self.current_max_wait_time: int = 1
         self.wait_time: int = 0
+        # Space-time mode: number of steps spent waiting for a cell still held by another arm
+        self.blocked_time: int = 0
+
+        self.nearest_tasks: int = nearest_tasks
 
         # Setting the number of tasks to inspect before giving up
         if task_limit <= 1:
-            self.task_limit = int(len(Task.remaining)*task_limit)
+            self.task_limit = int(len(simulation.remaining)*task_limit)
         else:
             self.task_limit = task_limit
 
         # Getting a task
         self.task: Optional[Task] = None
         self.get_task()
-        Robot.tasks.append(self.task)
+        simulation.tasks.append(self.task)
 
-        print(self)
+        _logger.debug('%s', self)
 
     def get_task(self) -> None:
         """
         Assigns a new task to a robot. Tasks with the best ratio always come first
         """
 
-        print("There are {} tasks left".format(len(Task.remaining)))
-        # Computing the ratios for each task
-        for task in Task.remaining:
-            task.compute_ratio([self.arm[0], self.arm[-1]], self.g_height, self.g_width, ratio_type='ratio')
-
-        # Sorting remaining tasks
-        possible_tasks: List[Task] = Task.remaining.copy()
-        possible_tasks.sort(key=lambda x: x.ratio, reverse=True)
-
+        simulation: Simulation = self.simulation
+        _logger.debug('There are %d tasks left', len(simulation.remaining))
         found_task: bool = False
-        for task in possible_tasks[:self.task_limit]:
-            # Computing the path from the robot head to the last assembly point of the task
-            computed_path: List[Tuple[int, int]] = self.finder.path(self.arm, task.target_points)
-
-            if computed_path:
-                # I we have found a viable path, we take it
-                self.task = task
-                self.task.change_status('active')  # we change the status of the task to 'active'
-                self.planned_path = computed_path 
-
-                # Internal timer is reset
-                self.current_max_wait_time = 1
-                self.wait_time = 0
-
-                found_task = True
-                break
-            else:
-                # print('Can\'t choose task {}.'.format(task.id))
-                pass
+        if self.nearest_tasks and simulation.index is not None:
+            # The tasks closest to the gripper are considered first
+            nearest: List[Task] = simulation.index.nearest(self.arm[-1], self.nearest_tasks)
+            nearest_ids: np.ndarray = np.array([task.id for task in nearest], dtype=np.int64)
+            found_task = self.try_tasks(simulation.pool.rank(nearest_ids, self.arm[-1], self.task_limit,
+                                                       ratio_type='ratio'))
+
+        if not found_task:
+            # Ranking the remaining tasks by ratio (all at once), unreachable tasks are discarded
+            found_task = self.try_tasks(simulation.pool.rank(simulation.registry.ids(NA), self.arm[-1],
+                                                             self.task_limit, ratio_type='ratio'))
 
         if found_task:
             # Next part of the task-taking process
-            print("Robot {} is choosing task {}".format(self.id, self.task.id))
+            _logger.debug('Robot %d is choosing task %d', self.id, self.task.id)
             # we check that the following task is not already completed
             # with the current position of the robot if it does the task is validated
             if len(self.task.path) == 1 and self.arm[-1] == self.task.path[0]:
-                print('No movement required !')
+                _logger.debug('No movement required !')
                 self.task.next_position(self.arm[-1])
                 if self.task.status == 'done':
                     # The task is done so we take a new one
@@ -105,7 +108,7 @@ class Robot:
                     self.get_task()
 
         else:
-            print('Robot {} can\'t do any task'.format(self.id))
+            _logger.debug('Robot %d can\'t do any task', self.id)
             # No task was found. Internal timer is increased so that we wait longer before trying to get another task
             new_max_wait_time = min(2 * self.current_max_wait_time, self.max_wait_time)
             if new_max_wait_time != self.current_max_wait_time:
@@ -114,6 +117,31 @@ class Robot:
 
             self.task = None
 
+    def try_tasks(self, possible_tasks: List[Task]) -> bool:
+        """
+        Takes the first task of the list that can be reached (the path is computed). Returns whether a task was taken.
+        """
+        for task in possible_tasks:
+            # Computing the path from the robot head to the last assembly point of the task
+            computed_path: List[Tuple[int, int]] = self.finder.path(self.arm, task.target_points, self.time())
+
+            if computed_path:
+                # I we have found a viable path, we take it
+                self.task = task
+                self.task.change_status('active')  # we change the status of the task to 'active'
+                self.set_planned_path(computed_path)
+
+                # Internal timer is reset
+                self.current_max_wait_time = 1
+                self.wait_time = 0
+
+                return True
+            else:
+                # print('Can\'t choose task {}.'.format(task.id))
+                pass
+
+        return False
+
     def compute_next_position(self, position: Optional[Tuple[int, int]] = None) -> List[Tuple[int, int]]:
         # If no position is provided
         if position is None and self.task is None:
@@ -129,26 +157,34 @@ class Robot:
         """
         # We retract if we are supposed to wait
         if self.wait_time > 0:
-            print('Waiting time = {} / {}'.format(self.wait_time, self.current_max_wait_time))
+            _logger.debug('Waiting time = %d / %d', self.wait_time, self.current_max_wait_time)
             self.wait_time -= 1
-            self.planned_path = self.arm[::-1][1:]
+            self.set_planned_path(self.arm[::-1][1:])
 
         if not self.planned_path:
             # If there is no more planned path we compute a new one
-            self.planned_path = self.compute_next_position()
+            self.set_planned_path(self.compute_next_position())
 
         # We get the next position
         next_pos: Tuple[int, int] = self.planned_path[0]
         self.planned_path.pop(0)
+        if self.finder.reservations is None:
+            self.released.append(next_pos)
+        elif next_pos not in self.arm and next_pos in self.finder.obstacles:
+            # Space-time mode: the cell is still held by an arm which was delayed
+            next_pos = self.wait_for(next_pos)
+        else:
+            self.blocked_time = 0
 
         self.add_to_memory_path(next_pos)
-        print("Robot {} is moving in {}".format(self.id, next_pos))
+        _logger.debug('Robot %d is moving in %s', self.id, next_pos)
 
         # If robot needs to retract
         if [next_pos] == self.retract() and len(self.arm) > 1:
-            self.arm.pop(-1)
+            self.released.append(self.arm.pop())
         elif next_pos != self.arm[-1]:
-            self.arm.append(next_pos)
+            self.arm.push(next_pos)
+            self.claimed.append(next_pos)
 
         # Updating task (next position to be reached, status...)
         if self.task is not None:
@@ -159,8 +195,48 @@ class Robot:
         elif self.wait_time <= 0:
             self.get_task()
 
-        # We update the global variable of Robot
-        Robot.arms[self.id] = self.arm
+        # We update the arms of the simulation
+        self.simulation.arms[self.id] = self.arm
+
+    def set_planned_path(self, path: List[Tuple[int, int]]) -> None:
+        """
+        Replaces the planned path, the cells of both paths are recorded as released and claimed obstacles.
+        In space-time mode, the cells of the arm along the path are reserved instead.
+        """
+        if self.finder.reservations is None:
+            self.released += self.planned_path
+            self.claimed += path
+        else:
+            self.finder.reservations.reserve(self.id, self.arm, path, self.time())
+        self.planned_path = path
+
+    def wait_for(self, cell: Tuple[int, int]) -> Tuple[int, int]:
+        """
+        Space-time mode: the arm waits one step for a cell held by another arm (the planned path is delayed).
+        If it has waited for too long, the other arm may be waiting for this one: the task is given up
+        and a new one is chosen at the end of the move.
+        Returns the position of the gripper for this step.
+        """
+        self.blocked_time += 1
+        if self.blocked_time > self.max_wait_time and self.task is not None:
+            _logger.debug('Robot %d gives up task %d', self.id, self.task.id)
+            self.task.change_status('na')
+            self.task = None
+            self.blocked_time = 0
+            self.set_planned_path([self.arm[-1]])
+        else:
+            self.set_planned_path([self.arm[-1], cell] + self.planned_path)
+        return self.planned_path.pop(0)
+
+    def time(self) -> int:
+        """Returns the step of the next move of the robot (every robot moves once per step)"""
+        return len(self.simulation.memory_paths[self.id])
+
+    def pop_obstacle_changes(self) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """Returns the obstacle cells claimed and released since the last call"""
+        changes = self.claimed, self.released
+        self.claimed, self.released = [], []
+        return changes
 
     def retract(self) -> List[Tuple[int, int]]:
         """Returns the new position of the robot arm when retracting"""
@@ -171,7 +247,8 @@ class Robot:
 
     def add_to_memory_path(self, new_position: Tuple[int, int]) -> None:
         """
-        Memorises the path traveled by the robot in a global variable (used to compile the output file)
+        Memorises the path traveled by the robot in the simulation (used to compile the output file).
+        Moves are stored as the byte of their letter.
         """
         position: Tuple[int, int] = self.arm[-1]
         if new_position[0] > position[0]:
@@ -187,7 +264,7 @@ class Robot:
         else:
             raise Exception('The requested position cannot be reached in one move!')
 
-        Robot.memory_paths[self.id].append(next_move)
+        self.simulation.memory_paths[self.id].append(ord(next_move))
 
     def __str__(self) -> str:
         """str representation of the object for debugging purposes"""
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Creating the Simulation object: the state of one run of the solver.
+The Grid, its robots and its tasks are bound to a Simulation instead of sharing class attributes,
+so that several simulations can run back-to-back (or concurrently) in the same process.
+
+Usage:
+# >>> first = Grid('../input/a_example.txt')
+# >>> second = Grid('../input/a_example.txt')  # a new Simulation, first is left untouched
+"""
+
+from __future__ import annotations
+from typing import List, Optional, Tuple, ValuesView, TYPE_CHECKING
+from task import ACTIVE, DONE, NA, Task, TaskPool, TaskRegistry
+
+if TYPE_CHECKING:
+    from arm import Arm
+    from task_index import TaskIndex
+
+__all__ = ['Simulation']
+
+
+class Simulation:
+    """
+    State shared by the Grid, the robots and the tasks of one run
+    (previously the class attributes of Robot, Task and DebugCanvas).
+    """
+
+    def __init__(self):
+        # Tasks: status of every task, arrays used to rank them and optional spatial index
+        self.registry: TaskRegistry = TaskRegistry()
+        self.pool: Optional[TaskPool] = None
+        self.index: Optional[TaskIndex] = None
+
+        # Robots: arms, next positions, moves and current task of each robot, indexed by robot id
+        self.nb_robots: int = 0
+        self.arms: List[Arm] = []
+        self.next_position: List[Optional[Tuple]] = []
+        self.memory_paths: List[bytearray] = []
+        self.tasks: List[Optional[Task]] = []
+
+    @property
+    def remaining(self) -> ValuesView[Task]:
+        """Tasks which are not assigned to any robot"""
+        return self.registry.of_status(NA)
+
+    @property
+    def current(self) -> ValuesView[Task]:
+        """Tasks being performed by a robot"""
+        return self.registry.of_status(ACTIVE)
+
+    @property
+    def performed(self) -> ValuesView[Task]:
+        """Completed tasks"""
+        return self.registry.of_status(DONE)
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "Simulation: {} robots, {} tasks ({} remaining, {} current, {} performed)".format(
+            self.nb_robots, len(self.registry), len(self.remaining), len(self.current), len(self.performed))
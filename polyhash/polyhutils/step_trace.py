@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module recording a simulation step by step in a compact binary file (trace), and reading it back.
+The trace is only appended to while the simulation runs:
+- a header (size of the grid, number of robots and tasks, first step, mount point of every robot): a run resumed from
+a checkpoint is traced from the step of the checkpoint, steps keep their number in the whole simulation,
+- one record per step: the move of every robot (one byte, its letter) and the tasks which changed status
+(task, new status, robot),
+- every keyframes steps, a keyframe: the status of every task and the cells of every arm after the step,
+- when the trace is closed, an index (position of every step and keyframe in the file) and a footer pointing to it.
+Every record starts with its tag and its size, so an interrupted trace (without index) can still be read.
+
+The reader maps the file in memory: the state of the arms at any step is rebuilt from the closest keyframe before
+it, replaying at most keyframes steps.
+
+Usage:
+# >>> grid = Grid('../../input/d_tight_schedule.txt', robot_percent=0.1, trace_file='d_trace.bin')
+# >>> for _ in range(grid.step_nb):
+# ...     grid.move_robots()
+# >>> grid.trace.close()
+# >>> with TraceReader('d_trace.bin') as trace:
+# ...     arms = trace.arms(150)
+"""
+
+import mmap
+import struct
+from typing import Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+import numpy as np
+from arm import Arm
+from task import DONE
+
+if TYPE_CHECKING:
+    from grid import Grid
+
+__all__ = ['TraceWriter', 'TraceReader']
+
+MAGIC: bytes = b'PHTR'
+INDEX_MAGIC: bytes = b'PHTX'
+VERSION: int = 2
+# magic, version, width, height, number of robots, number of tasks, keyframe interval, step before the first record
+_HEADER: struct.Struct = struct.Struct('<4sHIIIIII')
+# tag, size of the record
+_RECORD: struct.Struct = struct.Struct('<cI')
+# task, new status, robot (NO_ROBOT if unknown)
+_EVENT: struct.Struct = struct.Struct('<IBH')
+# position of the index, magic
+_FOOTER: struct.Struct = struct.Struct('<Q4s')
+STEP, KEYFRAME, INDEX = b'S', b'K', b'X'
+NO_ROBOT: int = 0xFFFF
+
+# Move of the gripper (dx, dy) for each instruction
+_MOVES: Dict[int, Tuple[int, int]] = {ord('R'): (1, 0), ord('L'): (-1, 0), ord('U'): (0, 1), ord('D'): (0, -1)}
+
+
+class TraceWriter:
+    """Appends the steps of the simulation of a grid to a trace file (called at the end of Grid.move_robots)"""
+
+    def __init__(self, file_name: str, grid: 'Grid', keyframes: int = 1000):
+        """keyframes : number of steps between two keyframes"""
+        self.file_name: str = file_name
+        self.grid: 'Grid' = grid
+        self.keyframes: int = keyframes
+        # Steps already simulated (checkpoint.steps_done): the grid may have been restored from a checkpoint
+        self.first_step: int = grid.step_nb - grid.finder.nb_movements
+        self.step: int = self.first_step
+        simulation = grid.simulation
+        self.status: np.ndarray = np.frombuffer(simulation.registry.status, dtype=np.uint8).copy()
+        # Robot performing each current task
+        self.owners: Dict[int, int] = dict()
+        self.step_offsets: List[int] = []
+        self.keyframe_steps: List[int] = []
+        self.keyframe_offsets: List[int] = []
+
+        self.f = open(file_name, 'wb')
+        self.f.write(_HEADER.pack(MAGIC, VERSION, grid.width, grid.height, simulation.nb_robots,
+                                  len(simulation.registry), keyframes, self.first_step))
+        self.f.write(np.array([arm[0] for arm in simulation.arms], dtype=np.int32).tobytes())
+        self._keyframe()
+
+    def _record(self, tag: bytes, payload: bytes) -> int:
+        """Appends a record and returns its position"""
+        offset: int = self.f.tell()
+        self.f.write(_RECORD.pack(tag, len(payload)))
+        self.f.write(payload)
+        return offset
+
+    def _keyframe(self) -> None:
+        simulation = self.grid.simulation
+        parts: List[bytes] = [struct.pack('<I', self.step), bytes(simulation.registry.status)]
+        for arm in simulation.arms:
+            parts.append(struct.pack('<I', len(arm)))
+            parts.append(arm.coords.tobytes())
+        self.keyframe_offsets.append(self._record(KEYFRAME, b''.join(parts)))
+        self.keyframe_steps.append(self.step)
+
+    def record(self) -> None:
+        """Records the step which has just been simulated"""
+        simulation = self.grid.simulation
+        self.step += 1
+        moves: bytes = bytes(moves[-1] for moves in simulation.memory_paths)
+
+        # Tasks which changed status since the previous step
+        status: np.ndarray = np.frombuffer(simulation.registry.status, dtype=np.uint8)
+        changed: np.ndarray = np.flatnonzero(status != self.status)
+        events: List[bytes] = []
+        if len(changed):
+            task_ids: List[int] = changed.tolist()
+            owners: Dict[int, int] = {robot.task.id: robot.id for robot in self.grid.robots if robot.task is not None}
+            # A task may be given and completed during the same step
+            if DONE in status[changed]:
+                owners.update((robot.tasks_performed[-1].id, robot.id) for robot in self.grid.robots
+                              if robot.tasks_performed and robot.tasks_performed[-1].id not in owners)
+                # A robot may complete several tasks during the same step: they are written in the order it
+                # performed them, which is the order of the output
+                done: Set[int] = {task_id for task_id in task_ids if status[task_id] == DONE}
+                rank: Dict[int, int] = dict()
+                for robot in self.grid.robots:
+                    for position, task in enumerate(reversed(robot.tasks_performed)):
+                        if task.id not in done:
+                            break
+                        rank[task.id] = -position
+                task_ids.sort(key=lambda task_id: rank.get(task_id, 0))
+            for task_id in task_ids:
+                robot: int = owners.get(task_id, self.owners.get(task_id, NO_ROBOT))
+                events.append(_EVENT.pack(task_id, status[task_id], robot))
+            self.owners = owners
+            self.status = status.copy()
+        self.step_offsets.append(self._record(STEP, struct.pack('<I', self.step) + moves + b''.join(events)))
+        if self.step % self.keyframes == 0:
+            self._keyframe()
+
+    def close(self) -> None:
+        """Writes the index of the steps and keyframes, then the footer"""
+        if self.f.closed:
+            return
+        index: bytes = struct.pack('<II', len(self.step_offsets), len(self.keyframe_steps)) + \
+            np.array(self.step_offsets, dtype='<u8').tobytes() + \
+            np.array(self.keyframe_steps, dtype='<u4').tobytes() + \
+            np.array(self.keyframe_offsets, dtype='<u8').tobytes()
+        offset: int = self._record(INDEX, index)
+        self.f.write(_FOOTER.pack(offset, INDEX_MAGIC))
+        self.f.close()
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "TraceWriter: steps {} to {} and {} keyframes written to {}".format(
+            self.first_step + 1, self.step, len(self.keyframe_steps), self.file_name)
+
+
+class TraceReader:
+    """Reads a trace file, mapped in memory"""
+
+    def __init__(self, file_name: str):
+        self.file_name: str = file_name
+        with open(file_name, 'rb') as f:
+            self.data: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = struct.unpack_from('<4sH', self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a trace file (version {})'.format(file_name, VERSION))
+        _, _, self.width, self.height, self.nb_robots, self.nb_tasks, self.keyframes, self.first_step = \
+            _HEADER.unpack_from(self.data, 0)
+        mounts: np.ndarray = np.frombuffer(self.data, dtype='<i4', count=2 * self.nb_robots, offset=_HEADER.size)
+        self.mount_points: List[Tuple[int, int]] = [(int(x), int(y)) for x, y in mounts.reshape(-1, 2)]
+        self.start: int = _HEADER.size + mounts.nbytes
+
+        footer: Optional[Tuple[int, bytes]] = _FOOTER.unpack_from(self.data, len(self.data) - _FOOTER.size) \
+            if len(self.data) >= self.start + _FOOTER.size else None
+        if footer is not None and footer[1] == INDEX_MAGIC:
+            offset: int = footer[0] + _RECORD.size
+            nb_steps, nb_keyframes = struct.unpack_from('<II', self.data, offset)
+            offset += 8
+            self.step_offsets: np.ndarray = np.frombuffer(self.data, dtype='<u8', count=nb_steps, offset=offset)
+            offset += 8 * nb_steps
+            self.keyframe_steps: np.ndarray = np.frombuffer(self.data, dtype='<u4', count=nb_keyframes, offset=offset)
+            offset += 4 * nb_keyframes
+            self.keyframe_offsets: np.ndarray = np.frombuffer(self.data, dtype='<u8', count=nb_keyframes,
+                                                              offset=offset)
+        else:
+            self._scan()
+
+    def _scan(self) -> None:
+        """Rebuilds the index of a trace which was not closed (the last incomplete record is ignored)"""
+        steps: List[int] = []
+        keyframe_steps: List[int] = []
+        keyframe_offsets: List[int] = []
+        offset: int = self.start
+        while offset + _RECORD.size <= len(self.data):
+            tag, size = _RECORD.unpack_from(self.data, offset)
+            if offset + _RECORD.size + size > len(self.data):
+                break
+            if tag == STEP:
+                steps.append(offset)
+            elif tag == KEYFRAME:
+                keyframe_steps.append(struct.unpack_from('<I', self.data, offset + _RECORD.size)[0])
+                keyframe_offsets.append(offset)
+            offset += _RECORD.size + size
+        self.step_offsets = np.array(steps, dtype=np.uint64)
+        # A keyframe may follow a step which was not written entirely
+        keyframe_steps = [step for step in keyframe_steps if step <= self.first_step + len(steps)]
+        self.keyframe_steps = np.array(keyframe_steps, dtype=np.uint32)
+        self.keyframe_offsets = np.array(keyframe_offsets[:len(keyframe_steps)], dtype=np.uint64)
+
+    @property
+    def nb_steps(self) -> int:
+        """Number of steps recorded"""
+        return len(self.step_offsets)
+
+    @property
+    def last_step(self) -> int:
+        return self.first_step + self.nb_steps
+
+    def _step(self, step: int) -> Tuple[bytes, int]:
+        """
+        Position of the payload of a step record after its step number, and its end
+        (the first step recorded is first_step + 1, 1 for a run which was not resumed)
+        """
+        if not self.first_step < step <= self.last_step:
+            raise IndexError('step {} not in the trace ({} to {})'.format(step, self.first_step + 1, self.last_step))
+        offset: int = int(self.step_offsets[step - self.first_step - 1])
+        size: int = _RECORD.unpack_from(self.data, offset)[1]
+        return offset + _RECORD.size + 4, offset + _RECORD.size + size
+
+    def moves(self, step: int) -> bytes:
+        """Moves of every robot during a step (letters, as bytes)"""
+        start, _ = self._step(step)
+        return self.data[start:start + self.nb_robots]
+
+    def events(self, step: int) -> List[Tuple[int, int, int]]:
+        """Tasks which changed status during a step: (task, new status, robot)"""
+        start, end = self._step(step)
+        return [_EVENT.unpack_from(self.data, offset) for offset in range(start + self.nb_robots, end, _EVENT.size)]
+
+    def _keyframe(self, step: int) -> Tuple[int, np.ndarray, List[Arm]]:
+        """Closest keyframe at or before a step: its step, the statuses of the tasks and the arms"""
+        i: int = int(np.searchsorted(self.keyframe_steps, step, side='right')) - 1
+        offset: int = int(self.keyframe_offsets[i]) + _RECORD.size
+        keyframe_step: int = struct.unpack_from('<I', self.data, offset)[0]
+        offset += 4
+        status: np.ndarray = np.frombuffer(self.data, dtype=np.uint8, count=self.nb_tasks, offset=offset).copy()
+        offset += self.nb_tasks
+        arms: List[Arm] = []
+        for _ in range(self.nb_robots):
+            length: int = struct.unpack_from('<I', self.data, offset)[0]
+            offset += 4
+            arm: Arm = Arm()
+            arm.coords.frombytes(self.data[offset:offset + 8 * length])
+            arm.index = {x << 32 | y: i for i, (x, y) in enumerate(arm)}
+            arms.append(arm)
+            offset += 8 * length
+        return keyframe_step, status, arms
+
+    def arms(self, step: int) -> List[Arm]:
+        """Arms of the robots after a step (first_step is the state when the trace started, 0 the initial state)"""
+        return self.state(step)[1]
+
+    def state(self, step: int) -> Tuple[np.ndarray, List[Arm]]:
+        """Statuses of the tasks and arms of the robots after a step, from the closest keyframe before it"""
+        if not self.first_step <= step <= self.last_step:
+            raise IndexError('step {} not in the trace ({} to {})'.format(step, self.first_step, self.last_step))
+        keyframe_step, status, arms = self._keyframe(step)
+        for current in range(keyframe_step + 1, step + 1):
+            for arm, move in zip(arms, self.moves(current)):
+                if move in _MOVES:
+                    dx, dy = _MOVES[move]
+                    x, y = arm[-1]
+                    arm.replay([(x + dx, y + dy)])
+            for task_id, task_status, _ in self.events(current):
+                status[task_id] = task_status
+        return status, arms
+
+    def output(self) -> str:
+        """
+        Content of the output file of the traced simulation (e.g. for validator.validate_output).
+        Raises ValueError for the trace of a resumed run: the moves and tasks of the steps before are not in it.
+        """
+        if self.first_step != 0:
+            raise ValueError('{} starts at step {} (resumed run), the output needs every step from 0'.format(
+                self.file_name, self.first_step))
+        performed: List[List[int]] = [[] for _ in range(self.nb_robots)]
+        for step in range(1, self.nb_steps + 1):
+            for task_id, status, robot in self.events(step):
+                if status == DONE and robot != NO_ROBOT:
+                    performed[robot].append(task_id)
+        lines: List[str] = [str(sum(1 for tasks in performed if tasks))]
+        for robot, tasks in enumerate(performed):
+            if tasks:
+                moves: str = ' '.join(bytes(self.moves(step)[robot] for step in range(1, self.nb_steps + 1))
+                                      .decode('ascii'))
+                lines += ['{} {} {} {}'.format(*self.mount_points[robot], len(tasks), self.nb_steps),
+                          ' '.join(map(str, tasks)), moves]
+        return '\n'.join(lines)
+
+    def close(self) -> None:
+        self.step_offsets = self.keyframe_steps = self.keyframe_offsets = None
+        self.data.close()
+
+    def __enter__(self) -> 'TraceReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        return "TraceReader: steps {} to {} of {} robots, {} keyframes, in {}".format(
+            self.first_step + 1, self.last_step, self.nb_robots, len(self.keyframe_steps), self.file_name)
+
+
+if __name__ == "__main__":
+    from grid import Grid
+    from polyhio import input_parsing
+    from validator import validate_output
+    test_grid: Grid = Grid('../../input/d_tight_schedule.txt', robot_percent=0.1, task_limit=2, pathfinder=0.1,
+                           trace_file='d_trace.bin')
+    for _ in range(test_grid.step_nb):
+        test_grid.move_robots()
+    test_grid.trace.close()
+    with TraceReader('d_trace.bin') as test_trace:
+        print(test_trace)
+        print([str(arm) for arm in test_trace.arms(150)])
+        print(validate_output(input_parsing('../../input/d_tight_schedule.txt'), test_trace.output()))
@@ -4,56 +4,116 @@
 Creating the Task object.
 A task is assigned to a robot according to its ratio
 (which depends on the list of points to be reached and the task score)
+The TaskRegistry object keeps track of the status of every task.
+The TaskPool object stores the tasks as NumPy arrays in order to rank them all at once.
 """
 
 from __future__ import annotations
-from typing import List, Tuple
+from array import array
+from typing import Dict, List, Tuple, Callable, Optional, ValuesView, TYPE_CHECKING
+import numpy as np
 from distances import manhattan
+from polyhlog import get_logger
 
-__all__ = ['Task']
+if TYPE_CHECKING:
+    from simulation import Simulation
+
+__all__ = ['Task', 'TaskRegistry', 'TaskPool']
+
+# Statuses of the tasks, stored as their index in the registry
+STATUSES: Tuple[str, str, str] = ('na', 'active', 'done')
+NA, ACTIVE, DONE = range(len(STATUSES))
+
+_logger = get_logger('task')
+
+
+class TaskRegistry:
+    """
+    Every task indexed by its id (its position in the input file), along with its status.
+    Tasks of each status are kept in insertion-ordered dicts: status changes are O(1), and the tasks of
+    a status are iterated in the order they got it.
+    """
+
+    def __init__(self):
+        self.tasks: List[Task] = []
+        self.status: array = array('B')
+        self.by_status: Tuple[Dict[int, Task], ...] = tuple(dict() for _ in STATUSES)
+
+    def register(self, task: Task) -> int:
+        """Adds a new task with the status 'na' and returns its id"""
+        task_id: int = len(self.tasks)
+        self.tasks.append(task)
+        self.status.append(NA)
+        self.by_status[NA][task_id] = task
+        return task_id
+
+    def set_status(self, task_id: int, status: int) -> None:
+        """Changes the status of a task, it becomes the last task of its new status"""
+        del self.by_status[self.status[task_id]][task_id]
+        self.by_status[status][task_id] = self.tasks[task_id]
+        self.status[task_id] = status
+
+    def count(self, status: int) -> int:
+        """Returns the number of tasks having a status"""
+        return len(self.by_status[status])
+
+    def of_status(self, status: int) -> ValuesView[Task]:
+        """Returns a view (no copy) of the tasks having a status"""
+        return self.by_status[status].values()
+
+    def ids(self, status: int) -> np.ndarray:
+        """Returns the ids of the tasks having a status, in the order they got it"""
+        tasks: Dict[int, Task] = self.by_status[status]
+        return np.fromiter(tasks.keys(), dtype=np.int64, count=len(tasks))
+
+    def __len__(self) -> int:
+        return len(self.tasks)
 
 
 class Task:
 
-    performed: List[Task] = []
-    remaining: List[Task] = []
-    current: List[Task] = []
+    __slots__ = ('simulation', 'path', 'target_points', 'score', 'ratio', 'id')
 
-    def __init__(self, path: List[Tuple[int, int]], score):
+    def __init__(self, path: List[Tuple[int, int]], score, simulation: Simulation):
         """
-        Initiating a task with a list of its assembly points and its score
+        Initiating a task with a list of its assembly points and its score.
+        The task is registered in the simulation it belongs to.
         """
-        self.status: str = 'na'  # task's status (na,active,done)
+        self.simulation: Simulation = simulation
         self.path: List[Tuple[int, int]] = path
         self.target_points: List[Tuple[int, int]] = path.copy()
         self.score: int = score
         self.ratio: int = 0
 
-        Task.remaining.append(self)
-        self.id: int = Task.remaining.index(self)
+        self.id: int = simulation.registry.register(self)
+
+        _logger.debug('%s', self)
 
-        print(self)
+    @property
+    def status(self) -> str:
+        """Task's status (na, active, done)"""
+        return STATUSES[self.simulation.registry.status[self.id]]
 
     def change_status(self, new_status: str) -> None:
         """
         Changes the status of the task. Moves the task in and out of the global lists according to new_status.
         new_status can take the values ["na", "active", "done"]
         """
+        simulation: Simulation = self.simulation
         if new_status == 'active':
-            Task.remaining.remove(self)
-            Task.current.append(self)
+            simulation.registry.set_status(self.id, ACTIVE)
+            if simulation.index is not None:
+                simulation.index.remove(self)
         elif new_status == 'done':
-            Task.current.remove(self)
-            Task.performed.append(self)
+            simulation.registry.set_status(self.id, DONE)
         elif new_status == 'na':
-            Task.remaining.append(self)
-            Task.current.remove(self)
+            simulation.registry.set_status(self.id, NA)
             self.target_points = self.path.copy()
+            if simulation.index is not None:
+                simulation.index.insert(self)
         else:
             raise NameError('Invalid Status')
 
-        self.status = new_status
-
     def next_position(self, position) -> None:
         """
         Finds the next point of the task when the robot reached one assembly point.
@@ -66,40 +126,110 @@ class Task:
                 # If there are no assembly point left, the task is done. Hence, the status is changed.
                 self.target_points = None
                 self.change_status('done')
-                print("Task n°{} is completed, adding {} more point(s) to the score".format(self.id, self.score))
+                _logger.debug('Task n°%d is completed, adding %d more point(s) to the score', self.id, self.score)
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purpose"""
+        return "Task n°{}, score={}, assembly_pts={}".format(self.id, self.score, self.path)
+
 
-    def compute_ratio(self, points: List[Tuple[int, int]], g_height: int,
-                      g_width: int, ratio_type: str = 'ratio') -> None:
+class TaskPool:
+    """
+    Arrays describing the tasks (indexed by task id) used to rank them in a vectorized way.
+    The distance of a task is the one covered from the gripper through all its assembly points, and its ratio is
+    score / distance**0.865 (the score if the distance is 0).
+    """
+
+    def __init__(self, tasks: List[Task], fields=None):
+        """
+        tasks : every task, sorted by id
+        fields : DistanceFields giving obstacle-aware distances (manhattan distances are used if None)
+        """
+        self.tasks: List[Task] = tasks
+        self.fields = fields
+        distance: Callable[[Tuple[int, int], Tuple[int, int]], Optional[int]] = \
+            manhattan if fields is None else fields.distance
+
+        self.scores: np.ndarray = np.array([task.score for task in tasks], dtype=np.float64)
+        self.first_x: np.ndarray = np.array([task.path[0][0] for task in tasks], dtype=np.int64)
+        self.first_y: np.ndarray = np.array([task.path[0][1] for task in tasks], dtype=np.int64)
+        # Distance covered between the first and the last assembly points (-1 if they cannot be linked)
+        self.internal: np.ndarray = np.array([_internal_distance(task.path, distance) for task in tasks],
+                                             dtype=np.int64)
+        # Rows of the distance fields of the first assembly points (-1 without field)
+        self.first_rows: Optional[np.ndarray] = None
+        if fields is not None:
+            self.first_rows = np.array([fields.rows.get(task.path[0], -1) for task in tasks], dtype=np.int64)
+
+        # Table of the powers of the distances (distance**0.865), extended when a longer distance is met
+        self._powers: np.ndarray = np.zeros(0)
+
+    def distances(self, ids: np.ndarray, position: Tuple[int, int]) -> np.ndarray:
         """
-        Computes the ratio of the task
+        Returns the distances from a position to the last assembly point of the given tasks,
+        going through all their assembly points (-1 for unreachable tasks)
         """
-        # Moving cost of a possible path to achieve the task
-        dist: int = 0
-        # Additional calculations for the ratio
-        # bord = 0
-        # # Sum/Average of distances between the arm's mount point and each assembly point of the task
-        # dist_mp_ap: int = 0
-        # for i, point in enumerate(self.path):
-        #     dist_mp_ap += manhattan(points[0], point)
-        #     bord += min(point[0], point[1], abs(g_height - point[1]), abs(g_width - point[0]))
-        #
-        #     bord /= (i + 1)
-        # bord = 1 / bord if bord != 0 else 1
-        #
-        # dist_average = dist_mp_ap / (i + 1)
-
-        for (src, target) in zip([points[1]] + self.path[:len(self.path) - 1], self.path):
-            dist += manhattan(src, target)
+        first_x: np.ndarray = self.first_x[ids]
+        first_y: np.ndarray = self.first_y[ids]
+        if self.fields is None:
+            to_first: np.ndarray = np.abs(first_x - position[0]) + np.abs(first_y - position[1])
+        else:
+            to_first = self.fields.distances(position, first_x, first_y, self.first_rows[ids])
+
+        internal: np.ndarray = self.internal[ids]
+        return np.where((to_first < 0) | (internal < 0), -1, to_first + internal)
 
+    def ratios(self, distances: np.ndarray, ids: np.ndarray, ratio_type: str = 'ratio') -> np.ndarray:
+        """
+        Returns the ratios of reachable tasks from their distances
+        ratio_type : 'ratio' (score / distance**0.865), 'score' or 'distance'
+        """
         if ratio_type == 'ratio':
-            self.ratio = (self.score / dist**0.865) if dist > 0 else self.score
+            if distances.size and distances.max() >= self._powers.size:
+                self._powers = np.array([dist ** 0.865 if dist > 0 else 1.0
+                                         for dist in range(2 * int(distances.max()) + 1)])
+            return self.scores[ids] / self._powers[distances]
         elif ratio_type == 'score':
-            self.ratio = self.score
+            return self.scores[ids]
         elif ratio_type == 'distance':
-            self.ratio = dist
+            return distances.astype(np.float64)
         else:
             raise ValueError('ratio_type \"{}\" not in {}'.format(ratio_type, ['ratio', 'score', 'distance']))
 
-    def __str__(self) -> str:
-        """str representation of the object for debugging purpose"""
-        return "Task n°{}, score={}, assembly_pts={}".format(self.id, self.score, self.path)
+    def rank(self, ids: np.ndarray, position: Tuple[int, int], limit: int, ratio_type: str = 'ratio') -> List[Task]:
+        """
+        Returns the limit reachable tasks having the best ratio from a position, best first, among the given ids.
+        Tasks with the same ratio keep the order of the ids. The ratio of the returned tasks is updated.
+        """
+        distances: np.ndarray = self.distances(ids, position)
+        reachable: np.ndarray = np.flatnonzero(distances >= 0)
+        ratios: np.ndarray = self.ratios(distances[reachable], ids[reachable], ratio_type)
+
+        # Keeping the limit best ratios (and the ties with the last one), then sorting them
+        limit = min(limit, reachable.size)
+        if limit <= 0:
+            return []
+        selection: np.ndarray = np.arange(reachable.size)
+        if limit < reachable.size:
+            kth: float = np.partition(ratios, reachable.size - limit)[reachable.size - limit]
+            selection = np.flatnonzero(ratios >= kth)
+        selection = selection[np.lexsort((selection, -ratios[selection]))][:limit]
+
+        best_tasks: List[Task] = []
+        for i in selection:
+            task: Task = self.tasks[ids[reachable[i]]]
+            task.ratio = float(ratios[i])
+            best_tasks.append(task)
+        return best_tasks
+
+
+def _internal_distance(path: List[Tuple[int, int]],
+                       distance: Callable[[Tuple[int, int], Tuple[int, int]], Optional[int]]) -> int:
+    """Returns the distance covered along the assembly points of a task, -1 if two of them cannot be linked"""
+    dist: int = 0
+    for src, target in zip(path[:-1], path[1:]):
+        step: Optional[int] = distance(src, target)
+        if step is None:
+            return -1
+        dist += step
+    return dist
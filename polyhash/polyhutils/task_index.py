@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Creating the TaskIndex object: a spatial index over the first assembly point of the tasks.
+The grid is split into square buckets, and the nearest tasks of a point are found by exploring
+the rings of buckets around it, closest first.
+"""
+
+from __future__ import annotations
+from math import ceil, sqrt
+from typing import Dict, Iterable, List, Set, Tuple, TYPE_CHECKING
+from distances import manhattan
+
+if TYPE_CHECKING:
+    from task import Task
+
+__all__ = ['TaskIndex']
+
+
+class TaskIndex:
+    """
+    Uniform bucket grid indexing tasks by their first assembly point.
+    Tasks are inserted and removed as they become available or are taken by a robot.
+    """
+
+    def __init__(self, width: int, height: int, tasks: Iterable[Task] = (), bucket_size: int = 0):
+        """
+        Index initialisation with the size of the grid and the tasks to insert.
+        bucket_size : side of the buckets, by default chosen to hold about one task per bucket.
+        """
+        tasks = list(tasks)
+        if bucket_size <= 0:
+            bucket_size = max(1, int(sqrt(width * height / max(1, len(tasks)))))
+        self.bucket_size: int = bucket_size
+        self.columns: int = ceil(width / bucket_size)
+        self.rows: int = ceil(height / bucket_size)
+        self.buckets: List[Set[int]] = [set() for _ in range(self.columns * self.rows)]
+        self.tasks: Dict[int, Task] = dict()
+
+        for task in tasks:
+            self.insert(task)
+
+    def _bucket(self, point: Tuple[int, int]) -> Set[int]:
+        """Returns the bucket holding a point"""
+        return self.buckets[(point[1] // self.bucket_size) * self.columns + point[0] // self.bucket_size]
+
+    def insert(self, task: Task) -> None:
+        """Adds a task to the index"""
+        self.tasks[task.id] = task
+        self._bucket(task.path[0]).add(task.id)
+
+    def remove(self, task: Task) -> None:
+        """Removes a task from the index"""
+        if self.tasks.pop(task.id, None) is not None:
+            self._bucket(task.path[0]).discard(task.id)
+
+    def nearest(self, point: Tuple[int, int], k: int) -> List[Task]:
+        """
+        Returns the k tasks whose first assembly point is the closest to point (manhattan distance),
+        sorted by id. Fewer tasks are returned if the index holds less than k tasks.
+        """
+        if k <= 0:
+            return []
+        size: int = self.bucket_size
+        column, row = point[0] // size, point[1] // size
+        found: List[Tuple[int, int]] = []  # (distance, id)
+        ring: int = 0
+        while len(self.tasks) > len(found):
+            # Buckets at a Chebyshev distance of ring from the bucket of point
+            for j in range(max(0, row - ring), min(self.rows, row + ring + 1)):
+                on_edge: bool = abs(j - row) == ring
+                step: int = 1 if on_edge else 2 * ring
+                for i in range(column - ring, column + ring + 1, max(1, step)):
+                    if 0 <= i < self.columns:
+                        for task_id in self.buckets[j * self.columns + i]:
+                            found.append((manhattan(point, self.tasks[task_id].path[0]), task_id))
+
+            # Any task of the next rings is at least ring * size + 1 cells away
+            if len(found) >= k and sorted(found)[k - 1][0] <= ring * size:
+                break
+            ring += 1
+            if ring > max(self.columns, self.rows):
+                break
+
+        found.sort()
+        return [self.tasks[task_id] for task_id in sorted(task_id for _, task_id in found[:k])]
+
+    def __len__(self) -> int:
+        return len(self.tasks)
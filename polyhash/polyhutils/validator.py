@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module checking an output file against its input file, independently from the solver.
+The output is replayed step by step following the rules of the problem (every arm moves at the same time):
+- an arm may only expand into a free cell of the grid, which is not a mount point (a cell freed by a gripper
+retracting during the same step is free),
+- retracting moves the gripper back to the previous cell of the arm,
+- every arm completes the tasks it is given, in order (the assembly points of a task are visited in order),
+- no task is given to two arms, no mount point is used twice,
+- at least one arm is used, and at most the number of arms available.
+Cells are stored in an array (robot owning each cell), so every move costs a few array accesses.
+The score is the sum of the scores of the completed tasks. Replaying stops at the first violation.
+
+Usage:
+# >>> from validator import validate_file
+# >>> print(validate_file('../../input/a_example.txt', 'a_1_1_0.5_output_11.txt'))
+"""
+
+import gzip
+import sys
+from array import array
+from typing import List, Optional, Tuple
+from polyhio import input_parsing
+
+__all__ = ['ValidationReport', 'validate_output', 'validate_file']
+
+# Move of the gripper (dx, dy) for each instruction
+_MOVES: dict = {'R': (1, 0), 'L': (-1, 0), 'U': (0, 1), 'D': (0, -1), 'W': (0, 0)}
+
+
+class ValidationReport:
+    """Result of the validation: score of the completed tasks and first violation (None if the output is valid)"""
+
+    def __init__(self, score: int, completed: int, violation: Optional[str] = None, step: Optional[int] = None):
+        self.score: int = score
+        self.completed: int = completed
+        self.violation: Optional[str] = violation
+        self.step: Optional[int] = step
+
+    @property
+    def valid(self) -> bool:
+        return self.violation is None
+
+    def __str__(self) -> str:
+        """str representation of the object for debugging purposes"""
+        if self.valid:
+            return "Valid output: score = {} ({} tasks completed)".format(self.score, self.completed)
+        where: str = " at step {}".format(self.step) if self.step is not None else ""
+        return "Invalid output{}: {} (score of the completed tasks = {})".format(where, self.violation, self.score)
+
+
+def _parse_output(text: str) -> List[Tuple[Tuple[int, int], List[int], List[str]]]:
+    """Returns the mount point, the tasks and the instructions of every arm of an output file"""
+    lines: List[str] = text.split('\n')
+    nb_arms: int = int(lines[0])
+    if len(lines) < 1 + 3 * nb_arms:
+        raise ValueError('{} arms announced, {} lines found'.format(nb_arms, len(lines)))
+    arms: List[Tuple[Tuple[int, int], List[int], List[str]]] = []
+    for i in range(1, 1 + 3 * nb_arms, 3):
+        x, y, nb_tasks, nb_moves = map(int, lines[i].split())
+        tasks: List[int] = [int(task) for task in lines[i + 1].split()]
+        moves: List[str] = lines[i + 2].split()
+        if len(tasks) != nb_tasks or len(moves) != nb_moves:
+            raise ValueError('arm mounted at {}: {} tasks and {} instructions announced, {} and {} found'.format(
+                (x, y), nb_tasks, nb_moves, len(tasks), len(moves)))
+        arms.append(((x, y), tasks, moves))
+    return arms
+
+
+def validate_output(parsed_input: Tuple[List, List], text: str) -> ValidationReport:
+    """
+    Replays an output (content of the output file) against the result of input_parsing.
+    Returns the score and the first violation of the rules.
+    """
+    (width, height, arms_nb, step_nb, mount_points), (scores, assembly_points) = parsed_input
+    try:
+        arms = _parse_output(text)
+    except ValueError as error:
+        return ValidationReport(0, 0, 'malformed output ({})'.format(error))
+
+    # Robot (id + 1) occupying each cell, and mount points
+    owner: array = array('i', [0]) * (width * height)
+    mounts: bytearray = bytearray(width * height)
+    for x, y in mount_points:
+        mounts[y * width + x] = 1
+
+    # Statement, "Submissions - File format": "The submission file must start with a line containing the number
+    # A (0 < A <= R) of robotic arms you want to use", so the judge rejects an output using no arm
+    if not 0 < len(arms) <= arms_nb:
+        return ValidationReport(0, 0, '{} arms used, {} available (0 < A <= R)'.format(len(arms), arms_nb))
+    given: set = set()
+    stacks: List[List[int]] = []
+    for robot, ((x, y), tasks, moves) in enumerate(arms):
+        if not (0 <= x < width and 0 <= y < height) or not mounts[y * width + x]:
+            return ValidationReport(0, 0, 'arm {} is not mounted on a mount point ({})'.format(robot, (x, y)))
+        if owner[y * width + x]:
+            return ValidationReport(0, 0, 'arm {} is mounted on the mount point of another arm'.format(robot))
+        if len(moves) > step_nb:
+            return ValidationReport(0, 0, 'arm {} has {} instructions, {} steps available'.format(
+                robot, len(moves), step_nb))
+        for task in tasks:
+            if not 0 <= task < len(scores) or task in given:
+                return ValidationReport(0, 0, 'task {} of arm {} does not exist or is given twice'.format(task, robot))
+            given.add(task)
+        if any(move not in _MOVES for move in moves):
+            return ValidationReport(0, 0, 'arm {} has an unknown instruction'.format(robot))
+        owner[y * width + x] = robot + 1
+        stacks.append([y * width + x])
+
+    # Tasks: assembly points of every task as cells, and progress of every arm (current task, next point)
+    points: List[List[int]] = [[y * width + x for x, y in task] for task in assembly_points]
+    progress: List[List[int]] = [[0, 0] for _ in arms]
+    score: int = 0
+    completed: int = 0
+
+    def advance(robot: int, cell: int) -> None:
+        """Validates the assembly points (and tasks) reached by the gripper of an arm"""
+        nonlocal score, completed
+        tasks: List[int] = arms[robot][1]
+        state: List[int] = progress[robot]
+        while state[0] < len(tasks):
+            task: int = tasks[state[0]]
+            task_points: List[int] = points[task]
+            while state[1] < len(task_points) and task_points[state[1]] == cell:
+                state[1] += 1
+            if state[1] < len(task_points):
+                return
+            score += scores[task]
+            completed += 1
+            state[0] += 1
+            state[1] = 0
+
+    for robot in range(len(arms)):
+        advance(robot, stacks[robot][-1])
+
+    for step in range(max(len(moves) for _, _, moves in arms)):
+        # Retractions first: the freed cells can be taken during the same step
+        expansions: List[Tuple[int, int]] = []
+        for robot, (_, _, moves) in enumerate(arms):
+            if step >= len(moves) or moves[step] == 'W':
+                continue
+            stack: List[int] = stacks[robot]
+            dx, dy = _MOVES[moves[step]]
+            x, y = stack[-1] % width + dx, stack[-1] // width + dy
+            if not (0 <= x < width and 0 <= y < height):
+                return ValidationReport(score, completed, 'arm {} leaves the grid'.format(robot), step)
+            cell: int = y * width + x
+            if len(stack) >= 2 and stack[-2] == cell:
+                owner[stack.pop()] = 0
+            else:
+                expansions.append((robot, cell))
+
+        for robot, cell in expansions:
+            if mounts[cell]:
+                return ValidationReport(score, completed, 'arm {} expands into a mount point ({})'.format(
+                    robot, (cell % width, cell // width)), step)
+            if owner[cell]:
+                other: int = owner[cell] - 1
+                violation: str = 'arm {} crosses itself'.format(robot) if other == robot else \
+                    'arm {} collides with arm {}'.format(robot, other)
+                return ValidationReport(score, completed, '{} in {}'.format(
+                    violation, (cell % width, cell // width)), step)
+            owner[cell] = robot + 1
+            stacks[robot].append(cell)
+
+        for robot, (_, _, moves) in enumerate(arms):
+            if step < len(moves) and moves[step] != 'W':
+                advance(robot, stacks[robot][-1])
+
+    for robot, (_, tasks, _) in enumerate(arms):
+        if progress[robot][0] < len(tasks):
+            return ValidationReport(score, completed, 'arm {} does not complete task {}'.format(
+                robot, tasks[progress[robot][0]]))
+
+    return ValidationReport(score, completed)
+
+
+def validate_file(grid_file: str, output_file: str) -> ValidationReport:
+    """Checks an output file (possibly compressed with gzip) against its input file"""
+    opener = gzip.open if output_file.endswith('.gz') else open
+    with opener(output_file, 'rt') as f:
+        text: str = f.read()
+    return validate_output(input_parsing(grid_file), text)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        print(validate_file(sys.argv[1], sys.argv[2]))
+    else:
+        print(validate_output(input_parsing('../../input/a_example.txt'), '1\n1 1 1 3\n0\nU R R'))
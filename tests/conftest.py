@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""The modules of the solver import each other by their name: both source directories are put on the path"""
+
+import os
+import sys
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INPUT_DIR: str = os.path.join(ROOT, 'input')
+
+sys.path[:0] = [os.path.join(ROOT, 'polyhash', 'polyhutils'), os.path.join(ROOT, 'polyhash')]
+
+# Parameters of the runs of main_model (robot_percent 1 for the files having very few arms)
+PARAMETERS: dict = {'robot_percent': 0.1, 'task_limit': 2, 'pathfinder': 0.1}
+
+
+def input_file(name: str) -> str:
+    """Path of a bundled input file"""
+    return os.path.join(INPUT_DIR, name + '.txt')
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import os
+import pytest
+from conftest import PARAMETERS, input_file
+from checkpoint import Checkpointer, checkpoint_info, latest_checkpoint, load_checkpoint, save_checkpoint, \
+    steps_done
+from grid import Grid
+
+
+def _grid():
+    return Grid(input_file('d_tight_schedule'), **PARAMETERS)
+
+
+def _finish(grid):
+    for _ in range(steps_done(grid), grid.step_nb):
+        grid.move_robots()
+    return grid.output()
+
+
+def test_resumed_run_gives_the_same_output(tmp_path):
+    expected = _finish(_grid())
+
+    grid = _grid()
+    for _ in range(137):
+        grid.move_robots()
+    file_name = str(tmp_path / 'd.ckpt')
+    save_checkpoint(grid, file_name)
+    assert checkpoint_info(file_name)['step'] == 137
+    assert os.listdir(str(tmp_path)) == ['d.ckpt']
+
+    resumed = load_checkpoint(file_name)
+    assert steps_done(resumed) == 137
+    assert _finish(resumed) == expected
+    # The original grid is not affected by the checkpoint
+    assert _finish(grid) == expected
+
+
+def test_derived_caches_are_left_out(tmp_path):
+    parameters = dict(PARAMETERS, distance_fields=True)
+    expected = _finish(Grid(input_file('d_tight_schedule'), **parameters))
+
+    grid = Grid(input_file('d_tight_schedule'), **parameters)
+    for _ in range(100):
+        grid.move_robots()
+    assert len(grid.finder.memory) > 0
+    file_name = str(tmp_path / 'd.ckpt')
+    save_checkpoint(grid, file_name)
+    # Far less than the distance fields alone
+    assert os.path.getsize(file_name) < grid.fields.fields.nbytes // 100
+
+    resumed = load_checkpoint(file_name)
+    assert len(resumed.finder.memory) == 0
+    assert (resumed.fields.fields == grid.fields.fields).all()
+    assert resumed.simulation.pool.fields is resumed.fields
+    assert _finish(resumed) == expected
+
+
+def test_checkpointer_keeps_the_last_checkpoints(tmp_path):
+    grid = _grid()
+    directory = str(tmp_path / 'checkpoints')
+    checkpoints = Checkpointer(grid, directory, 'd', every=50, keep=2)
+    for _ in range(220):
+        grid.move_robots()
+        checkpoints.step()
+    assert sorted(os.listdir(directory)) == ['d_000150.ckpt', 'd_000200.ckpt']
+    assert latest_checkpoint(directory, 'd') == os.path.join(directory, 'd_000200.ckpt')
+    assert latest_checkpoint(directory, 'other') is None
+
+
+def test_failed_save_leaves_no_file(tmp_path):
+    file_name = str(tmp_path / 'missing' / 'd.ckpt')
+    # The error is the one of the missing directory, not the one of the removal of the temporary file
+    with pytest.raises(FileNotFoundError):
+        save_checkpoint(_grid(), file_name)
+    assert not os.path.exists(str(tmp_path / 'missing'))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import random
+from collections import Counter
+from conftest import PARAMETERS, input_file
+from grid import Grid
+from occupancy import ObstacleTracker
+
+
+def test_reference_counts():
+    tracker = ObstacleTracker(4, 4, [(0, 0)])
+    assert tracker.pop_changes() == [(0, 0)]
+    tracker.claim([(1, 1), (1, 1)])
+    tracker.release([(1, 1)])
+    assert (1, 1) in tracker and len(tracker) == 2
+    tracker.release([(1, 1)])
+    assert (1, 1) not in tracker and len(tracker) == 1
+    # Claimed then released before the changes are collected: no change
+    assert tracker.pop_changes() == []
+    tracker.discard((0, 0))
+    assert tracker.pop_changes() == [(0, 0)] and len(tracker) == 0
+
+
+def test_same_cells_as_counter():
+    rng = random.Random(0)
+    tracker = ObstacleTracker(6, 5)
+    counts = Counter()
+    before = set()
+    for _ in range(500):
+        if rng.random() < 0.5:
+            # A cell may be claimed several times
+            cells = [(rng.randrange(6), rng.randrange(5)) for _ in range(rng.randint(1, 4))]
+            tracker.claim(cells)
+            counts.update(cells)
+        else:
+            cells = rng.sample(sorted(+counts), min(2, len(+counts)))
+            tracker.release(cells)
+            counts.subtract(cells)
+        occupied = {cell for cell, count in counts.items() if count > 0}
+        assert set(tracker) == occupied and len(tracker) == len(occupied)
+        if rng.random() < 0.2:
+            assert set(tracker.pop_changes()) == occupied ^ before
+            before = occupied
+
+
+def test_obstacles_of_the_simulation():
+    # The obstacles are updated incrementally: they must be those the first version of the solver rebuilt at each
+    # step (mount points, planned paths and arms of the robots)
+    grid = Grid(input_file('d_tight_schedule'), **PARAMETERS)
+    for _ in range(grid.step_nb):
+        grid.move_robots()
+        expected = set(grid.mount_points)
+        for robot in grid.robots:
+            expected.update(robot.planned_path)
+            expected.update(robot.arm[1:])
+        assert set(grid) == expected
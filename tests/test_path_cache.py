@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from occupancy import Occupancy
+from pathfinding import PathFinder
+
+# Arms having the same mounting point and gripper, which only differ far from the searched cells
+ARM = [(0, 5), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)]
+OTHER_ARM = [(0, 5), (1, 5), (1, 4), (1, 3), (0, 3), (0, 2), (0, 1), (0, 0)]
+
+
+def _uncached_path(obstacles, arm, targets):
+    return PathFinder(obstacles.copy(), (10, 10, 100)).path(arm, targets)
+
+
+def test_entry_checked_against_its_region():
+    obstacles = Occupancy(10, 10, ARM)
+    finder = PathFinder(obstacles, (10, 10, 100))
+    path = finder.path(ARM, [(3, 0)])
+    assert path == [(1, 0), (2, 0), (3, 0)]
+
+    # A cell far from the search changes
+    obstacles.add((8, 8))
+    assert finder.path(ARM, [(3, 0)]) == path and finder.memory.hits == 1
+    # A cell next to the expanded cells changes, then comes back to its state (an arm going by)
+    obstacles.add((1, 1))
+    obstacles.discard((1, 1))
+    assert finder.path(ARM, [(3, 0)]) == path and finder.memory.hits == 2
+    # The same arm, but the cells the search depends on changed
+    obstacles.add((1, 1))
+    obstacles.add((2, 0))
+    assert finder.path(ARM, [(3, 0)]) == _uncached_path(obstacles, ARM, [(3, 0)]) and finder.memory.hits == 2
+
+
+def test_entry_shared_by_arms_of_the_same_robot():
+    obstacles = Occupancy(10, 10, ARM)
+    finder = PathFinder(obstacles, (10, 10, 100))
+    path = finder.path(ARM, [(3, 0)])
+    for cell in ARM:
+        obstacles.discard(cell)
+    obstacles.update(OTHER_ARM)
+    assert finder.path(OTHER_ARM, [(3, 0)]) == path == _uncached_path(obstacles, OTHER_ARM, [(3, 0)])
+    assert finder.memory.hits == 1
+    # Another gripper: another search
+    assert finder.path(OTHER_ARM[:-1], [(3, 0)]) == _uncached_path(obstacles, OTHER_ARM[:-1], [(3, 0)])
+    assert finder.memory.hits == 1
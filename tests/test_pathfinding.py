@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import random
+from collections import deque
+import pytest
+from conftest import input_file
+from arm import Arm, Trail
+from incremental import IncrementalSearch
+from occupancy import Occupancy
+from pathfinding import PathFinder
+from polyhbench import _astar_queries, _legacy_find_path
+from polyhio import input_parsing
+
+
+@pytest.mark.parametrize('name', ['b_single_arm', 'c_few_arms', 'd_tight_schedule', 'e_dense_workspace',
+                                  'f_decentralized'])
+def test_same_paths_as_the_legacy_search(name):
+    # The paths found must stay those of the former linear scan of the open set, tie order included
+    (width, height, _, step_nb, mount_points), (_, missions) = input_parsing(input_file(name))
+    finder = PathFinder(Occupancy(width, height, mount_points), (width, height, step_nb), limit=0.1)
+    for start, end in _astar_queries(mount_points, missions, 10, 0):
+        finder.arm = Trail([start])
+        assert finder._find_path(start, end) == _legacy_find_path(finder, start, end)
+
+
+def test_same_paths_as_the_legacy_search_along_an_arm():
+    rng = random.Random(1)
+    for _ in range(200):
+        width, height = rng.randint(2, 12), rng.randint(2, 12)
+        cells = [(x, y) for x in range(width) for y in range(height)]
+        obstacles = Occupancy(width, height, rng.sample(cells, len(cells) // 5))
+        arm = [rng.choice(cells)]
+        for _ in range(rng.randint(0, 8)):
+            x, y = arm[-1]
+            free = [cell for cell in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+                    if cell in cells and cell not in arm]
+            if free:
+                arm.append(rng.choice(free))
+        obstacles.update(arm)
+        finder = PathFinder(obstacles, (width, height, 1000), limit=rng.choice([0.1, 0.5, 1]))
+        finder.arm = Trail(arm)
+        target = rng.choice(cells)
+        assert finder._find_path(arm[-1], target) == _legacy_find_path(finder, arm[-1], target)
+
+
+def test_retracted_cells_stay_part_of_the_arm():
+    # The gripper retracts to (1, 0), then goes back through (2, 0): the cell it left is still held by the arm
+    arm = [(0, 0), (1, 0), (2, 0)]
+    finder = PathFinder(Occupancy(4, 3, arm), (4, 3, 100))
+    assert finder.path(Arm(arm), [(1, 0), (3, 0)]) == [(1, 0), (2, 0), (3, 0)]
+    assert finder.path(arm, [(1, 0), (3, 0)]) == [(1, 0), (2, 0), (3, 0)]
+
+
+def _shortest_distance(obstacles, arm, target):
+    """Breadth-first search from the gripper, cells of the arm only entered by retracting"""
+    retractions = set(zip(arm[1:], arm[:-1]))
+    distances = {arm[-1]: 0}
+    queue = deque([arm[-1]])
+    while queue:
+        cell = queue.popleft()
+        if cell == target:
+            return distances[cell]
+        x, y = cell
+        for neighbour in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if not (0 <= neighbour[0] < obstacles.width and 0 <= neighbour[1] < obstacles.height) \
+                    or neighbour in distances:
+                continue
+            if (neighbour in arm and (cell, neighbour) in retractions) or \
+                    (neighbour not in arm and neighbour not in obstacles):
+                distances[neighbour] = distances[cell] + 1
+                queue.append(neighbour)
+    return None
+
+
+def test_incremental_search_is_repaired():
+    rng = random.Random(0)
+    for _ in range(100):
+        width, height = rng.randint(3, 8), rng.randint(3, 8)
+        cells = [(x, y) for x in range(width) for y in range(height)]
+        obstacles = Occupancy(width, height, rng.sample(cells, len(cells) // 4))
+        arm = [rng.choice([cell for cell in cells if cell not in obstacles] or cells)]
+        obstacles.add(arm[0])
+        target = rng.choice(cells)
+        search = IncrementalSearch(obstacles, (width, height), arm, target)
+        for _ in range(6):
+            path = search.compute(float('inf'))
+            distance = _shortest_distance(obstacles, arm, target)
+            assert (len(path) - 1 if path else None) == distance
+            # Some obstacles change and the gripper moves
+            changes = [cell for cell in rng.sample(cells, 3) if cell not in arm]
+            for cell in changes:
+                (obstacles.discard if cell in obstacles else obstacles.add)(cell)
+            x, y = arm[-1]
+            free = [cell for cell in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+                    if cell in cells and cell not in obstacles]
+            if len(arm) > 1 and rng.random() < 0.3:
+                changes.append(arm.pop())
+                obstacles.discard(changes[-1])
+            elif free:
+                arm.append(rng.choice(free))
+                obstacles.add(arm[-1])
+                changes.append(arm[-1])
+            search.move(arm)
+            search.update(changes)
+
+
+def test_incremental_limit_applies_to_each_call():
+    finder = PathFinder(Occupancy(20, 20, [(0, 0)]), (20, 20, 1000), limit=0.05, incremental=True)
+    for _ in range(3):
+        # 20 cells may be expanded by each call, far from enough: the search is dropped every time
+        assert finder.path([(0, 0)], [(19, 19)]) == []
+        assert len(finder.searches) == 0
+    finder.limit = 1
+    assert len(finder.path([(0, 0)], [(19, 19)])) == 38
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import os
+import pytest
+from conftest import input_file
+from polyhio import input_parsing
+
+INPUTS = ['a_example', 'a_arm_blocking_another', 'b_single_arm', 'c_few_arms', 'd_tight_schedule',
+          'e_dense_workspace', 'f_decentralized']
+
+
+def _line_parsing(data):
+    """Parser of the first version of the solver (one line after the other), the reference of input_parsing"""
+    with open(data, 'r') as f:
+        text_input = [[int(j) for j in line.replace('\n', '').split(' ')] for line in f]
+    width, height, arms_nb, mount_points_nb, task_nb, step_nb = text_input[0]
+    mount_points = [tuple(a) for a in text_input[1:mount_points_nb + 1]]
+    scores = [text_input[i][0] for i in range(mount_points_nb + 1, len(text_input) - 1, 2)]
+    assembly_points = [[(a[i], a[i + 1]) for i in range(0, len(a) - 1, 2)]
+                       for a in text_input[mount_points_nb + 2:len(text_input):2]]
+    return [width, height, arms_nb, step_nb, mount_points], [scores, assembly_points]
+
+
+@pytest.mark.parametrize('name', INPUTS)
+def test_same_result_as_line_parsing(name):
+    assert input_parsing(input_file(name)) == _line_parsing(input_file(name))
+
+
+def test_cache(tmp_path):
+    data = str(tmp_path / 'd_tight_schedule.txt')
+    with open(input_file('d_tight_schedule'), 'rb') as f:
+        content = f.read()
+    with open(data, 'wb') as f:
+        f.write(content)
+    cache_dir = str(tmp_path / 'cache')
+
+    expected = _line_parsing(data)
+    assert input_parsing(data, cache_dir) == expected
+    assert len(os.listdir(cache_dir)) == 1
+    # Cache hit
+    assert input_parsing(data, cache_dir) == expected
+    # Same content, another modification time: the hash of the content validates the cache
+    os.utime(data, ns=(0, 0))
+    assert input_parsing(data, cache_dir) == expected
+
+    # The content changes (same size, another modification time): the cache is not used
+    with open(data, 'wb') as f:
+        f.write(content.replace(b'100 100 100', b'100 101 100', 1))
+    os.utime(data, ns=(10**9, 10**9))
+    assert input_parsing(data, cache_dir) == _line_parsing(data)
+    assert input_parsing(data, cache_dir)[0][1] == 101
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import shutil
+import pytest
+from checkpoint import load_checkpoint, save_checkpoint
+from conftest import PARAMETERS, input_file
+from grid import Grid
+from step_trace import TraceReader, TraceWriter
+
+
+def _traced_run(trace_file, keyframes=50):
+    """Runs d_tight_schedule with a trace, and returns the grid and the arms after every step"""
+    grid = Grid(input_file('d_tight_schedule'), **PARAMETERS)
+    grid.trace = TraceWriter(trace_file, grid, keyframes)
+    # Arms in the order of the robot ids, as in the trace
+    arms = [[list(arm) for arm in grid.simulation.arms]]
+    for _ in range(grid.step_nb):
+        grid.move_robots()
+        arms.append([list(arm) for arm in grid.simulation.arms])
+    return grid, arms
+
+
+def _sections(text):
+    """Sections of an output file (one per arm: mount point and numbers, tasks, instructions)"""
+    lines = text.split('\n')
+    return lines[0], sorted(zip(lines[1::3], lines[2::3], lines[3::3]))
+
+
+def test_round_trip(tmp_path):
+    trace_file = str(tmp_path / 'd.trace')
+    grid, arms = _traced_run(trace_file)
+    grid.trace.close()
+    with TraceReader(trace_file) as trace:
+        assert trace.nb_steps == grid.step_nb
+        # The trace lists the arms in the order of the robot ids
+        assert _sections(trace.output()) == _sections(grid.output()[0])
+        for step in (0, 1, 49, 50, 51, 137, grid.step_nb):
+            assert [list(arm) for arm in trace.arms(step)] == arms[step]
+
+
+def test_unfinished_trace(tmp_path):
+    # A trace which was not closed (interrupted run) is still readable up to its last complete step
+    trace_file = str(tmp_path / 'd.trace')
+    grid, arms = _traced_run(trace_file)
+    grid.trace.f.flush()
+    cut_file = str(tmp_path / 'cut.trace')
+    shutil.copyfile(trace_file, cut_file)
+    with open(cut_file, 'r+b') as f:
+        f.truncate(f.seek(0, 2) // 2)
+    with TraceReader(cut_file) as trace:
+        assert 0 < trace.nb_steps < grid.step_nb
+        assert [list(arm) for arm in trace.arms(trace.nb_steps)] == arms[trace.nb_steps]
+
+
+def test_trace_of_a_resumed_run(tmp_path):
+    _, arms = _traced_run(str(tmp_path / 'd.trace'))
+    grid = Grid(input_file('d_tight_schedule'), **PARAMETERS)
+    for _ in range(137):
+        grid.move_robots()
+    checkpoint_file = str(tmp_path / 'd.ckpt')
+    save_checkpoint(grid, checkpoint_file)
+
+    trace_file = str(tmp_path / 'resumed.trace')
+    resumed = load_checkpoint(checkpoint_file)
+    resumed.trace = TraceWriter(trace_file, resumed, 50)
+    for _ in range(137, resumed.step_nb):
+        resumed.move_robots()
+    resumed.trace.close()
+    with TraceReader(trace_file) as trace:
+        # Steps keep their number in the whole run
+        assert (trace.first_step, trace.last_step) == (137, grid.step_nb)
+        for step in (137, 138, 150, 151, grid.step_nb):
+            assert [list(arm) for arm in trace.arms(step)] == arms[step]
+        with pytest.raises(IndexError):
+            trace.arms(136)
+        # The moves and tasks of the first 137 steps are missing
+        with pytest.raises(ValueError):
+            trace.output()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import pytest
+from conftest import PARAMETERS, input_file
+from grid import Grid
+from polyhio import input_parsing
+from validator import validate_output
+
+# Example submission of the statement, for a_example: 2 arms, score 11
+EXAMPLE = '2\n1 1 1 5\n0\nU R W U R\n1 3 1 4\n2\nR R L L'
+
+
+def _report(text, name='a_example'):
+    return validate_output(input_parsing(input_file(name)), text)
+
+
+def test_example_of_the_statement():
+    report = _report(EXAMPLE)
+    assert report.valid and report.score == 11 and report.completed == 2
+
+
+@pytest.mark.parametrize('name, robot_percent', [('a_example', 1), ('a_arm_blocking_another', 1),
+                                                 ('d_tight_schedule', 0.1)])
+def test_same_score_as_the_solver(name, robot_percent):
+    grid = Grid(input_file(name), **dict(PARAMETERS, robot_percent=robot_percent))
+    for _ in range(grid.step_nb):
+        grid.move_robots()
+    text, score = grid.output()
+    report = _report(text, name)
+    assert report.valid and report.score == score
+
+
+@pytest.mark.parametrize('text, violation', [
+    # The statement requires 0 < A <= R arms
+    ('0', '0 arms used'),
+    ('2\n1 1 1 1\n0\nU\n1 1 1 1\n2\nR', 'mount point of another arm'),
+    ('2\n1 1 1 1\n0\nU\n1 3 1 1\n0\nR', 'given twice'),
+    ('1\n1 1 1 1\n0\nL L', 'malformed'),
+    ('1\n1 1 1 2\n0\nD D', 'leaves the grid'),
+    ('1\n1 1 1 2\n0\nU U', 'mount point'),
+    ('1\n1 1 1 5\n0\nR R D L U', 'crosses itself'),
+    ('2\n1 1 1 1\n0\nU\n1 3 1 1\n2\nD', 'collides with arm 0'),
+    ('1\n1 1 1 1\n0\nU', 'does not complete task 0'),
+])
+def test_violations(text, violation):
+    report = _report(text)
+    assert not report.valid and violation in report.violation